@@ -11,20 +11,52 @@ Supports:
 - Local testing mode (no cluster required)
 """
 import os
+import codecs
 import json
+import math
 import subprocess
 import socket
 import secrets
+import shlex
 import sqlite3
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from werkzeug.security import generate_password_hash
 from werkzeug.security import check_password_hash
 from config.demo_seed import DEMO_USERS
 from flask import session
-from config.dashboard import DASHBOARD_CONFIG
-from datetime import datetime
+from config.dashboard import DASHBOARD_CONFIG, ROLES
+from models.db import ConnectionPool
+from services.principals import PrincipalCache, resolve_permissions
+from services.fragments import FragmentCache, fingerprint
+from services.response_cache import ResponseCache
+from services.ssh_pool import SSHPool, SSH_CONNECTION_ERROR
+from services.node_metrics import METRICS_SCRIPT, NodeMetricsParser
+from services.metrics_store import MetricsStore, extract_metrics
+from services.stream import StreamBroker, sse_frame
+from services.adsb import ADSBIngestService
+from services.spatial import AircraftQuery
+from services.tracks import TrackStore
+from services import triangulation
+from services.triangulation import TriangulationService
+from services import mesh_topology
+from services.mesh_topology import MeshTopologyService
+from services.mqtt_bridge import FakeBroker, MQTTBridge
+from services.node_registry import NodeRegistry
+from services.jobs import JobManager
+from services.command_stream import CommandStream, TailBuffer
+from services.broadcast import broadcast, MODES, BEST_EFFORT
+from services.tool_status import ToolStatusCache
+from services.shared_state import LeaderLock, SharedState
+from services.circuit_breaker import BreakerBoard, CircuitOpenError
+from services.instrumentation import Registry, merge, render, timed
+from datetime import datetime, timezone
 from functools import wraps
 from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+from flask import Response, stream_with_context, g, has_app_context
+from flask import before_render_template, template_rendered
 from flask_cors import CORS
 # web/app.py
 from flask import Flask, render_template
@@ -32,107 +64,201 @@ from flask import Flask, render_template
 DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 DEMO_MODE = os.getenv('DEMO_MODE', 'True').lower() == 'true'
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "data", "dashboard.db")
-# Cluster node definitions with tool categories
-NODES = {
-    'boot': {
-        'ip': '192.168.1.10',
-        'name': 'Boot',
-        'type': 'command',
-        'purpose': 'Centralized control and command of the cluster infrastructure.',
-        'tools': {
-            'services': ['NTP', 'NFS', 'DHCP', 'TFTP', 'flask' ],
-        }
-    },
-    'isr': {
-        'ip': '192.168.1.20',
-        'name': 'SigInt',
-        'type': 'isr',
-        'purpose': 'Airspace and RF spectrum monitoring using software defined radios.',
-        'tools': {
-            'services': ['dump1090', 'readsb', 'rtl-sdr', 'dump978', 'pyaware', 'fldigi', 'aprs'],
-        }
-    },
-    'mesh': {
-        'ip': '192.168.1.30',
-        'name': 'Mesh',
-        'type': 'mesh',
-        'purpose': 'Centralized support and coordinating for ad hoc 915mHz LoRa mesh networks.',
-        'tools': {
-            'services': ['Batman-adv', 'Reticulm', 'freeTAKserver', 'meshtastic', 'mosquito'],
-        }
-    },
-    'vhf': {
-        'ip': '192.168.1.40',
-        'name': 'RF',
-        'type': 'radio',
-        'purpose': 'HF/VHF/UHF voice and data communications via analog or digital RF transmitters with CAT Control.',
-        'tools': {
-            'services': ['gqrx', 'satscape', 'winlink', 'fldigi', 'js8', ''],
-        }
-    }
-}
+DB_PATH = os.getenv('DASHBOARD_DB', os.path.join(BASE_DIR, "data", "dashboard.db"))
+METRICS_DB_PATH = os.getenv('METRICS_DB', os.path.join(BASE_DIR, "data", "metrics.db"))
+# Per-node reachability deadline (seconds) for concurrent probes
+PROBE_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', '3'))
+# Background collector refresh interval and snapshot freshness window (seconds)
+COLLECTOR_INTERVAL = float(os.getenv('COLLECTOR_INTERVAL', '5'))
+SNAPSHOT_TTL = float(os.getenv('SNAPSHOT_TTL', '15'))
+# Multiplexed SSH sessions to the nodes
+SSH_CONTROL_DIR = os.getenv('SSH_CONTROL_DIR', '/tmp/cluster-ssh')
+SSH_MAX_CHANNELS = int(os.getenv('SSH_MAX_CHANNELS', '4'))
+# Background jobs for deploy/update/reboot/backup/health-check operations
+JOBS_DB_PATH = os.getenv('JOBS_DB', os.path.join(BASE_DIR, "data", "jobs.db"))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_TIMEOUT = float(os.getenv('JOB_TIMEOUT', '3600'))
+JOB_LOG_LIMIT = int(os.getenv('JOB_LOG_LIMIT', '262144'))
+# Output kept by execute_command (newest bytes win)
+EXEC_OUTPUT_LIMIT = int(os.getenv('EXEC_OUTPUT_LIMIT', '65536'))
+# Seconds a node's batched tool/service status is reused
+TOOL_STATUS_TTL = float(os.getenv('TOOL_STATUS_TTL', '10'))
+# State shared between worker processes; tmpfs keeps 1 Hz updates off the SD card
+SHARED_STATE_DB = os.getenv('SHARED_STATE_DB', '/dev/shm/cluster-dashboard-state.db'
+                            if os.path.isdir('/dev/shm') else os.path.join(BASE_DIR, "data", "state.db"))
+SHARED_SYNC_INTERVAL = float(os.getenv('SHARED_SYNC_INTERVAL', '1'))
+# Per-node circuit breakers: consecutive failures before fast-failing, and the
+# first/maximum seconds before an unreachable node is probed again
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', '3'))
+BREAKER_BACKOFF = float(os.getenv('BREAKER_BACKOFF', '5'))
+BREAKER_MAX_BACKOFF = float(os.getenv('BREAKER_MAX_BACKOFF', '120'))
+# Bearer token that lets a Prometheus scraper read /api/metrics without a session
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# Direction-finding: seconds a receiver's bearings stay valid, and the
+# minimum seconds between re-solves
+TRIANGULATION_MAX_AGE = float(os.getenv('TRIANGULATION_MAX_AGE', '30'))
+TRIANGULATION_INTERVAL = float(os.getenv('TRIANGULATION_INTERVAL', '1'))
+# Mesh topology polling (batctl/meshtastic on the mesh node); a fixture
+# directory replaces the live tools, and demo mode uses the bundled one
+MESH_TOPOLOGY_INTERVAL = float(os.getenv('MESH_TOPOLOGY_INTERVAL', '15'))
+MESH_TOPOLOGY_FIXTURES = os.getenv('MESH_TOPOLOGY_FIXTURES') or (
+    os.path.join(BASE_DIR, 'data', 'fixtures', 'mesh') if DEMO_MODE else None)
+# MQTT telemetry from mesh assets (host[:port]); demo mode uses an in-process broker
+MQTT_BROKER = os.getenv('MQTT_BROKER')
+MQTT_TOPICS = [t for t in os.getenv('MQTT_TOPICS', 'msh/+/2/json/#,cluster/assets/#').split(',') if t]
+MQTT_USERNAME = os.getenv('MQTT_USERNAME')
+MQTT_PASSWORD = os.getenv('MQTT_PASSWORD')
+MQTT_QUEUE_SIZE = int(os.getenv('MQTT_QUEUE_SIZE', '1024'))
+MQTT_DROP_POLICY = os.getenv('MQTT_DROP_POLICY', 'drop_oldest')
+MQTT_ASSET_EXPIRY = float(os.getenv('MQTT_ASSET_EXPIRY', '3600'))
+# Cluster node definitions (config/nodes.json), re-read when the file changes
+NODES_CONFIG = os.getenv('NODES_CONFIG', os.path.join(BASE_DIR, 'config', 'nodes.json'))
+NODES = NodeRegistry(NODES_CONFIG)
 
 # Initialize Flask app
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = os.getenv('SECRET_KEY', 'tactical-ops-default-key')
 CORS(app)
+# Request, subsystem and subprocess instrumentation; see /api/metrics
+TELEMETRY = Registry()
+REQUEST_LATENCY = TELEMETRY.histogram(
+    'dashboard_request_duration_seconds', 'Time to produce a response', ('route', 'method'))
+REQUESTS = TELEMETRY.counter(
+    'dashboard_requests_total', 'Responses by route and status', ('route', 'method', 'status'))
+IN_FLIGHT = TELEMETRY.gauge(
+    'dashboard_requests_in_flight', 'Requests being handled, including open streams')
+SUBSYSTEM_LATENCY = TELEMETRY.histogram(
+    'dashboard_subsystem_duration_seconds', 'Time spent in SQLite, node calls and templates',
+    ('subsystem', 'operation'))
+SUBPROCESSES = TELEMETRY.counter(
+    'dashboard_subprocesses_total', 'Child processes started', ('command',))
+@app.before_request
+def start_request_timer():
+    # Registered ahead of require_login so redirected requests are timed too
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+@app.after_request
+def record_status(response):
+    g.response_status = response.status_code
+    return response
+@app.teardown_request
+def observe_request(exc):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    IN_FLIGHT.dec()
+    # The URL rule, not the path, so node ids and job ids share one series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(time.perf_counter() - started, route, request.method)
+    REQUESTS.inc(route, request.method, str(g.get('response_status', 500)))
+def start_render_timer(sender, template, context, **extra):
+    g.setdefault('render_started', []).append(time.perf_counter())
+def observe_render(sender, template, context, **extra):
+    started = g.get('render_started')
+    if started:
+        SUBSYSTEM_LATENCY.observe(time.perf_counter() - started.pop(), 'template', template.name)
+before_render_template.connect(start_render_timer, app)
+template_rendered.connect(observe_render, app)
+# Pooled, WAL-mode connections to the dashboard database
+DB_POOL = ConnectionPool(DB_PATH)
+def get_db():
+    """Connection for the current request, returned to the pool at teardown"""
+    if 'db' not in g:
+        g.db = DB_POOL.acquire()
+    return g.db
+# Resolved current-user principals, so page renders skip SQLite
+PRINCIPAL_CACHE = PrincipalCache(
+    maxsize=int(os.getenv('PRINCIPAL_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('PRINCIPAL_CACHE_TTL', '300'))
+)
+# Pre-rendered header/footer/page fragments
+FRAGMENTS = FragmentCache()
+# Pre-encoded (and pre-compressed) bodies of slow-changing responses
+RESPONSES = ResponseCache()
+# Leader election and state hand-off between worker processes
+SHARED_STATE = SharedState(SHARED_STATE_DB)
+LEADER_LOCK = LeaderLock(SHARED_STATE_DB + '.lock')
+def fragment_response(html, etag, cache_control='private, no-cache'):
+    """HTML response with a weak ETag; answers If-None-Match with 304"""
+    response = app.response_class(html, mimetype='text/html')
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+def cached_response(key, version, build, mimetype='application/json',
+                    cache_control='private, no-cache'):
+    """Response served from RESPONSES; answers If-None-Match with 304
+
+    version must change whenever build() would produce a different payload.
+    The client gets the brotli or gzip variant if it accepts one.
+    """
+    entry = RESPONSES.get(key, version, build, mimetype)
+    if request.if_none_match.contains_weak(entry.etag):
+        RESPONSES.stats['not_modified'] += 1
+        response = app.response_class(status=304)
+    else:
+        encoding, body = entry.select(lambda coding: request.accept_encodings[coding])
+        response = app.response_class(body, mimetype=entry.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(entry.etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop('db', None)
+    if conn is not None:
+        DB_POOL.release(conn)
 ################################################################################
 # AUTHENTICATION AND BOOT LANDING PAGE
 ################################################################################
 def seed_demo_users():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    # Abort if users already exist
-    c.execute("SELECT COUNT(*) FROM users")
-    if c.fetchone()[0] > 0:
-        conn.close()
-        return
+    with DB_POOL.connection() as conn, conn:
+        c = conn.cursor()
 
-    for user in DEMO_USERS:
-        c.execute("""
-            INSERT INTO users (username, callsign, password_hash, role, active, created_at)
-            VALUES (?, ?, ?, ?, 1, ?)
-        """, (
-            user["username"],
-            user["callsign"],
-            generate_password_hash(user["password"]),
-            user["role"],
-            datetime.utcnow().isoformat()
-        ))
+        # Abort if users already exist
+        c.execute("SELECT COUNT(*) FROM users")
+        if c.fetchone()[0] > 0:
+            return
 
-        user_id = c.lastrowid
+        for user in DEMO_USERS:
+            c.execute("""
+                INSERT INTO users (username, callsign, password_hash, role, active, created_at)
+                VALUES (?, ?, ?, ?, 1, ?)
+            """, (
+                user["username"],
+                user["callsign"],
+                generate_password_hash(user["password"]),
+                user["role"],
+                datetime.utcnow().isoformat()
+            ))
 
-        for group in user["groups"]:
-            c.execute("INSERT OR IGNORE INTO groups (name) VALUES (?)", (group,))
-            c.execute("SELECT id FROM groups WHERE name=?", (group,))
-            group_id = c.fetchone()[0]
-            c.execute(
-                "INSERT OR IGNORE INTO user_groups (user_id, group_id) VALUES (?, ?)",
-                (user_id, group_id)
-            )
+            user_id = c.lastrowid
 
-        for team in user["teams"]:
-            c.execute("INSERT OR IGNORE INTO teams (name) VALUES (?)", (team,))
-            c.execute("SELECT id FROM teams WHERE name=?", (team,))
-            team_id = c.fetchone()[0]
-            c.execute(
-                "INSERT OR IGNORE INTO user_teams (user_id, team_id) VALUES (?, ?)",
-                (user_id, team_id)
-            )
+            for group in user["groups"]:
+                c.execute("INSERT OR IGNORE INTO groups (name) VALUES (?)", (group,))
+                c.execute("SELECT id FROM groups WHERE name=?", (group,))
+                group_id = c.fetchone()[0]
+                c.execute(
+                    "INSERT OR IGNORE INTO user_groups (user_id, group_id) VALUES (?, ?)",
+                    (user_id, group_id)
+                )
 
-    conn.commit()
-    conn.close()
+            for team in user["teams"]:
+                c.execute("INSERT OR IGNORE INTO teams (name) VALUES (?)", (team,))
+                c.execute("SELECT id FROM teams WHERE name=?", (team,))
+                team_id = c.fetchone()[0]
+                c.execute(
+                    "INSERT OR IGNORE INTO user_teams (user_id, team_id) VALUES (?, ?)",
+                    (user_id, team_id)
+                )
+    invalidate_principal()
+@timed(SUBSYSTEM_LATENCY, 'sqlite', 'authenticate')
 def authenticate(username, password):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    row = get_db().execute("""
         SELECT id, password_hash FROM users
         WHERE username=? AND active=1
-    """, (username,))
-    row = c.fetchone()
-    conn.close()
+    """, (username,)).fetchone()
 
     if not row:
         return None
@@ -161,6 +287,7 @@ def login():
 
         if user_id:
             session["user_id"] = user_id
+            invalidate_principal(user_id)
 
             # >>> STEP 5: CREATE AUDIT SESSION <<<
             audit_session_id = create_user_session(user_id)
@@ -175,6 +302,7 @@ def login():
 @app.route('/logout')
 def logout():
     close_user_session()
+    invalidate_principal(session.get("user_id"))
     session.clear()
     return redirect(url_for('login'))
 
@@ -187,6 +315,9 @@ def require_login():
 
     if request.path.startswith(allowed_paths):
         return
+    if (request.path == '/api/metrics' and METRICS_TOKEN and secrets.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}')):
+        return
 
     if "user_id" not in session:
         return redirect(url_for("login"))
@@ -195,41 +326,48 @@ def get_current_user():
     if not user_id:
         return None
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
+    principal = PRINCIPAL_CACHE.get(user_id)
+    if principal is None:
+        principal = load_principal(user_id)
+        if principal is not None:
+            PRINCIPAL_CACHE.put(user_id, principal)
+    return principal
+def invalidate_principal(user_id=None):
+    """Call after role or group/team membership changes, and on logout"""
+    PRINCIPAL_CACHE.invalidate(user_id)
+    if COORDINATOR.active:
+        # Other workers drop their cached principals on their next sync
+        SHARED_STATE.bump('principals')
+@timed(SUBSYSTEM_LATENCY, 'sqlite', 'load_principal')
+def load_principal(user_id):
+    conn = get_db()
 
     # Base user record
-    c.execute("""
+    user = conn.execute("""
         SELECT id, username, callsign, role
         FROM users
         WHERE id=? AND active=1
-    """, (user_id,))
-    user = c.fetchone()
+    """, (user_id,)).fetchone()
 
     if not user:
-        conn.close()
         return None
 
-    # Groups
-    c.execute("""
-        SELECT g.name
+    # Groups and teams in one round trip
+    groups, teams = [], []
+    for row in conn.execute("""
+        SELECT 'group' AS kind, g.name
         FROM groups g
         JOIN user_groups ug ON ug.group_id = g.id
         WHERE ug.user_id=?
-    """, (user_id,))
-    groups = [row["name"].strip() for row in c.fetchall() if row["name"].strip()]
-
-    # Teams
-    c.execute("""
-        SELECT t.name
+        UNION ALL
+        SELECT 'team' AS kind, t.name
         FROM teams t
         JOIN user_teams ut ON ut.team_id = t.id
         WHERE ut.user_id=?
-    """, (user_id,))
-    teams = [row["name"].strip() for row in c.fetchall() if row["name"].strip()]
-
-    conn.close()
+    """, (user_id, user_id)):
+        name = row["name"].strip()
+        if name:
+            (groups if row["kind"] == 'group' else teams).append(name)
 
     return {
         "id": user["id"],
@@ -238,6 +376,7 @@ def get_current_user():
         "role": user["role"],
         "groups": groups,
         "teams": teams,
+        "permissions": resolve_permissions(user["role"], ROLES),
     }
 @app.context_processor
 def inject_current_user():
@@ -245,52 +384,65 @@ def inject_current_user():
         "current_user": get_current_user()
     }
 
+@timed(SUBSYSTEM_LATENCY, 'sqlite', 'create_user_session')
 def create_user_session(user_id):
     session_id = uuid.uuid4().hex[:12].upper()
     now = datetime.utcnow().isoformat() + "Z"
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO user_sessions (
+    conn = get_db()
+    with conn:
+        conn.execute("""
+            INSERT INTO user_sessions (
+                session_id,
+                user_id,
+                login_time,
+                ip_address,
+                user_agent
+            ) VALUES (?, ?, ?, ?, ?)
+        """, (
             session_id,
             user_id,
-            login_time,
-            ip_address,
-            user_agent
-        ) VALUES (?, ?, ?, ?, ?)
-    """, (
-        session_id,
-        user_id,
-        now,
-        request.remote_addr,
-        request.headers.get("User-Agent", "")
-    ))
-    conn.commit()
-    conn.close()
+            now,
+            request.remote_addr,
+            request.headers.get("User-Agent", "")
+        ))
 
     return session_id
+@timed(SUBSYSTEM_LATENCY, 'sqlite', 'close_user_session')
 def close_user_session():
     audit_id = session.get("audit_session_id")
     if not audit_id:
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        UPDATE user_sessions
-        SET logout_time=?
-        WHERE session_id=?
-    """, (
-        datetime.utcnow().isoformat() + "Z",
-        audit_id
-    ))
-    conn.commit()
-    conn.close()
+    conn = get_db()
+    with conn:
+        conn.execute("""
+            UPDATE user_sessions
+            SET logout_time=?
+            WHERE session_id=?
+        """, (
+            datetime.utcnow().isoformat() + "Z",
+            audit_id
+        ))
 
+@app.route('/api/auth/principal-cache')
+def api_principal_cache():
+    """Get current-user principal cache statistics"""
+    return jsonify(PRINCIPAL_CACHE.get_stats())
+@app.route('/api/fragments')
+def api_fragments():
+    """Fragment cache statistics"""
+    return jsonify(FRAGMENTS.get_stats())
+@app.route('/api/response-cache')
+def api_response_cache():
+    """Pre-encoded response cache statistics"""
+    return jsonify(RESPONSES.get_stats())
 @app.route('/header')
 def header():
-    return render_template('components/header.html')
+    fragment = FRAGMENTS.get('components/header.html', None,
+                             lambda **_: render_template('components/header.html'))
+    return cached_response('header', fragment.digest, lambda: fragment.fill({}),
+                           mimetype='text/html', cache_control='private, max-age=60')
 # FOOTER - UPDATED TO INCLUDE DYNAMIC NODE STATUS
 def get_dashboard_build():
     return DASHBOARD_CONFIG.get("BUILD_VERSION")
@@ -313,34 +465,96 @@ def format_uptime_hhmm(seconds):
     return f"{hours:02d}:{minutes:02d}"
 @app.route('/footer')
 def footer():
-    """Dynamic footer component for all pages"""
+    """Dynamic footer component for all pages
+
+    The static part is compiled once per user principal; only the session
+    id and uptime are substituted per request. The weak ETag changes at
+    most once a minute, matching the HH:MM uptime shown. Live seconds are
+    not part of the body: the client derives them from the response's Date
+    header and the embedded start time, so a 304 never leaves them stale.
+    """
     try:
-        uptime_sec = get_uptime_seconds()
-        uptime_hhmm = format_uptime_hhmm(uptime_sec)
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         # Get the server start time from the dashboard config
         server_start = DASHBOARD_CONFIG.get("SERVER_START_TIME", datetime.utcnow())
-        # Format it for display
-        server_start_str = server_start.strftime('%Y-%m-%d %H:%M')
-        return render_template(
+        fragment = FRAGMENTS.get(
             'components/footer.html',
-            dashboard_build=get_dashboard_build(),
-            cluster_id=get_cluster_id(),
-            session_id=get_session_id(),
-            uptime_seconds=uptime_sec,   # raw seconds for JS ticker
-            uptime_hhmm=uptime_hhmm,     # human-readable HH:MM
-            server_start=server_start_str,  # <--- new variable
-            timestamp=timestamp
+            fingerprint(get_current_user()),
+            lambda **placeholders: render_template(
+                'components/footer.html',
+                dashboard_build=get_dashboard_build(),
+                cluster_id=get_cluster_id(),
+                server_start=server_start.strftime('%Y-%m-%d %H:%M'),
+                server_started=int(server_start.replace(tzinfo=timezone.utc).timestamp()),
+                **placeholders
+            ),
+            dynamic=('session_id', 'uptime_hhmm')
         )
+        values = {
+            'session_id': get_session_id(),
+            'uptime_hhmm': format_uptime_hhmm(get_uptime_seconds())  # human-readable HH:MM
+        }
+        etag = fingerprint(fragment.digest, values['session_id'], values['uptime_hhmm'])
+        return fragment_response(fragment.fill(values), etag)
     except Exception as e:
         print("Error rendering footer:", e)
         return jsonify({'error': 'Could not render footer'}), 500
 ################################################################################
 # UTILITIES
 ################################################################################
+class ProbePool:
+    """Thread pool sized to probe every registered node in parallel
+
+    resize() swaps in a new pool when the registry changes size; probes
+    already queued on the old one still run, it just takes no new work.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.workers = 0
+        self._executor = None
+        self.resize()
+    def resize(self):
+        workers = max(4, len(NODES) * 2)
+        with self._lock:
+            if workers == self.workers:
+                return
+            previous, self.workers = self._executor, workers
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe')
+        if previous is not None:
+            previous.shutdown(wait=False)
+    def submit(self, fn, *args):
+        with self._lock:
+            return self._executor.submit(fn, *args)
+# Shared pool so every node in NODES can be probed in parallel
+PROBE_EXECUTOR = ProbePool()
+# One long-lived ControlMaster session per node
+SSH_POOL = SSHPool(control_dir=SSH_CONTROL_DIR, max_channels=SSH_MAX_CHANNELS,
+                   on_spawn=lambda kind: SUBPROCESSES.inc(f'ssh-{kind}'))
+METRICS_PARSER = NodeMetricsParser()
+# All of a node's tools checked in one SSH call, cached for TOOL_STATUS_TTL
+TOOL_STATUS = ToolStatusCache(
+    lambda node_id, script: ClusterAPI.run_script(node_id, script, timeout=10),
+    ttl=TOOL_STATUS_TTL
+)
+def node_tool_names(node_id):
+    return NODES[node_id]['tool_names']
+# Raw / 1-minute / 15-minute performance history for /api/performance
+METRICS_STORE = MetricsStore(METRICS_DB_PATH)
+# Push channel for /api/stream (node state, performance, aircraft)
+STREAM = StreamBroker()
+STREAM_TOPICS = ('nodes', 'performance', 'aircraft', 'assets')
+# dump1090/readsb feed on the ISR node
+# Unset: follow the registry's 'isr' node (see adsb_url)
+ADSB_URL = os.getenv('ADSB_URL')
+ADSB_POLL_INTERVAL = float(os.getenv('ADSB_POLL_INTERVAL', '1'))
+ADSB_EXPIRY = float(os.getenv('ADSB_EXPIRY', '60'))
+ADSB_TRACK_RETENTION = float(os.getenv('ADSB_TRACK_RETENTION', '1800'))
+# Fast-fail for nodes that stopped answering; see ClusterAPI
+BREAKERS = BreakerBoard(threshold=BREAKER_THRESHOLD, base_delay=BREAKER_BACKOFF,
+                        max_delay=BREAKER_MAX_BACKOFF)
 class ClusterAPI:
     """Interface with cluster nodes"""
     @staticmethod
+    @timed(SUBSYSTEM_LATENCY, 'cluster', 'ping_node')
     def ping_node(node_id):
         """Check if node is reachable"""
         if DEMO_MODE:
@@ -348,16 +562,41 @@ class ClusterAPI:
         node_ip = NODES.get(node_id, {}).get('ip')
         if not node_ip:
             return False
+        breaker = BREAKERS.get(node_id)
+        if not breaker.allow():
+            return False
         try:
+            SUBPROCESSES.inc('ping')
             result = subprocess.run(
-                ['ping', '-c', '1', '-W', '2', node_ip],
+                ['ping', '-c', '1', '-W', str(max(1, int(PROBE_TIMEOUT))), node_ip],
                 capture_output=True,
-                timeout=5
+                timeout=PROBE_TIMEOUT + 1
             )
-            return result.returncode == 0
+            online = result.returncode == 0
         except:
-            return False
+            online = False
+        if online:
+            breaker.success()
+        else:
+            breaker.failure('no reply to ping')
+        return online
+    @staticmethod
+    @timed(SUBSYSTEM_LATENCY, 'cluster', 'ping_nodes')
+    def ping_nodes(node_ids=None):
+        """Probe several nodes at once, bounded by the slowest single probe"""
+        node_ids = list(NODES) if node_ids is None else list(node_ids)
+        if DEMO_MODE:
+            return {node_id: True for node_id in node_ids}
+        futures = {node_id: PROBE_EXECUTOR.submit(ClusterAPI.ping_node, node_id)
+                   for node_id in node_ids}
+        wait(futures.values(), timeout=PROBE_TIMEOUT + 2)
+        results = {}
+        for node_id, future in futures.items():
+            # Anything still running past the deadline is reported offline
+            results[node_id] = future.done() and not future.exception() and future.result()
+        return results
     @staticmethod
+    @timed(SUBSYSTEM_LATENCY, 'cluster', 'get_node_health')
     def get_node_health(node_id):
         """Get node health metrics"""
         if DEMO_MODE:
@@ -368,96 +607,337 @@ class ClusterAPI:
                 'memory': {'used': 2048, 'total': 4096, 'percent': 50},
                 'disk': {'used': 25600, 'total': 32768, 'percent': 78},
                 'temperature': 52,
+                'cpu': {'percent': 35.2, 'per_core': [38.1, 31.4, 36.0, 35.3]},
+                'network': {'eth0': {'rx_bytes': 1843200, 'tx_bytes': 921600,
+                                     'rx_bps': 32000.0, 'tx_bps': 13300.0}},
+                'uptime_seconds': 3933296,
                 'last_check': datetime.now().isoformat()
             }
         try:
-            node_ip = NODES.get(node_id, {}).get('ip')
-            result = subprocess.run(
-                ['ssh', '-o', 'StrictHostKeyChecking=no', f'pi@{node_ip}',
-                 'uptime && free && df /'],
-                capture_output=True,
-                timeout=10
-            )
-            return {'status': 'online'} if result.returncode == 0 else {'status': 'offline'}
-        except:
+            result = ClusterAPI.run_script(node_id, METRICS_SCRIPT, timeout=10)
+            if result.returncode != 0:
+                return {'status': 'offline'}
+            return METRICS_PARSER.parse(node_id, result.stdout.decode()).to_dict()
+        except CircuitOpenError:
+            return {'status': 'offline'}
+        except Exception as e:
+            print(f"Health check failed for {node_id}:", e)
             return {'status': 'offline'}
     @staticmethod
-    def execute_command(node_id, command):
-        """Execute command on remote node"""
+    @timed(SUBSYSTEM_LATENCY, 'cluster', 'execute_command')
+    def execute_command(node_id, command, timeout=30, disconnects=False):
+        """Execute command on remote node
+
+        The command is sent once and never re-run. disconnects marks
+        commands that take the node down (reboot, shutdown): their dropped
+        session (exit 255) counts as success, not as a breaker failure.
+        """
         if DEMO_MODE:
-            return {'success': True, 'output': f'[DEMO] Executed: {command}'}
+            return {'success': True, 'exit_code': 0, 'output': f'[DEMO] Executed: {command}'}
+        breaker = BREAKERS.get(node_id)
+        if not breaker.allow():
+            return {'success': False, 'circuit': breaker.state,
+                    'error': str(CircuitOpenError(node_id, breaker.retry_in()))}
         try:
-            node_ip = NODES.get(node_id, {}).get('ip')
-            result = subprocess.run(
-                ['ssh', '-o', 'StrictHostKeyChecking=no', f'pi@{node_ip}', command],
-                capture_output=True,
-                timeout=30
-            )
-            return {
-                'success': result.returncode == 0,
-                'output': result.stdout.decode() if result.stdout else ''
+            output = TailBuffer(EXEC_OUTPUT_LIMIT)
+            stream = ClusterAPI.stream_command(node_id, command, timeout=timeout)
+            for chunk in stream:
+                output.append(chunk)
+            dropped = disconnects and stream.returncode == SSH_CONNECTION_ERROR
+            if dropped:
+                breaker.success()
+            else:
+                ClusterAPI.record_outcome(node_id, stream)
+            result = {
+                'success': (stream.returncode == 0 or dropped) and not stream.timed_out,
+                'exit_code': stream.returncode,
+                'output': output.text()
             }
+            if output.dropped:
+                result['truncated_bytes'] = output.dropped
+            if stream.timed_out:
+                result['error'] = 'Command timed out'
+            return result
         except Exception as e:
+            ClusterAPI.record_outcome(node_id, error=e)
             return {'success': False, 'error': str(e)}
+    @staticmethod
+    def record_outcome(node_id, stream=None, error=None):
+        """Record a finished CommandStream (or the error that ended it) on the node's breaker
+
+        Only failures that say something about the node count: a connection
+        that never produced output, or a timeout with no output at all. A
+        command that ran and exited non-zero still proves the node answers.
+        """
+        if isinstance(error, CircuitOpenError):
+            return
+        breaker = BREAKERS.get(node_id)
+        if error is not None:
+            breaker.failure(error)
+        elif stream.returncode == SSH_CONNECTION_ERROR and not stream.bytes_read:
+            breaker.failure('SSH connection failed')
+        elif stream.timed_out and not stream.bytes_read:
+            breaker.failure('command timed out without output')
+        else:
+            breaker.success()
+    @staticmethod
+    def run_script(node_id, script, timeout=10):
+        """Run script over the node's SSH session, recording the outcome on its breaker
+
+        Returns a subprocess.CompletedProcess; raises CircuitOpenError while
+        the node is being skipped.
+        """
+        breaker = BREAKERS.get(node_id)
+        if not breaker.allow():
+            raise CircuitOpenError(node_id, breaker.retry_in())
+        try:
+            result = SSH_POOL.run(NODES[node_id]['ip'], script, timeout=timeout)
+        except Exception as e:
+            breaker.failure(e)
+            raise
+        if result.returncode == SSH_CONNECTION_ERROR:
+            breaker.failure('SSH connection failed')
+        else:
+            breaker.success()
+        return result
+    @staticmethod
+    def spawn_command(node_id, command):
+        """Start command on remote node; context manager yielding the process
+
+        Raises CircuitOpenError while the node's breaker is open.
+        """
+        BREAKERS.check(node_id)
+        node_ip = NODES.get(node_id, {}).get('ip')
+        return SSH_POOL.popen(node_ip, command)
+    @staticmethod
+    def stream_command(node_id, command, timeout=None):
+        """Iterable of command output chunks as they arrive"""
+        return CommandStream(ClusterAPI.spawn_command(node_id, command), timeout=timeout)
+class NodeStateCollector:
+    """Single background thread that keeps a shared snapshot of node state.
+
+    Routes read from the snapshot instead of probing nodes themselves, so the
+    load placed on the Pis is fixed by COLLECTOR_INTERVAL rather than by the
+    number of open dashboards.
+    """
+    def __init__(self, interval=COLLECTOR_INTERVAL, ttl=SNAPSHOT_TTL):
+        self.interval = interval
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = {}
+        self._ready = threading.Event()
+        self._thread = None
+        # Bumped on every refresh so other workers can tell when to resync
+        self.generation = 0
+        # Set in follower workers, which mirror the leader instead of probing
+        self.passive = False
+    def start(self):
+        with self._lock:
+            if self.passive or (self._thread and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='node-collector', daemon=True)
+            self._thread.start()
+    def refresh(self):
+        """Probe every node once and publish the results"""
+        reachable = ClusterAPI.ping_nodes()
+        health_jobs = {node_id: PROBE_EXECUTOR.submit(ClusterAPI.get_node_health, node_id)
+                       for node_id, online in reachable.items() if online}
+        updated = {}
+        for node_id, online in reachable.items():
+            health = {'status': 'offline'}
+            if node_id in health_jobs:
+                try:
+                    health = health_jobs[node_id].result()
+                except Exception as e:
+                    print(f"Health collection failed for {node_id}:", e)
+            updated[node_id] = {
+                'online': online,
+                'health': health,
+                'circuit': BREAKERS.get(node_id).to_dict(),
+                'updated': time.time(),
+                'timestamp': datetime.now().isoformat()
+            }
+        with self._lock:
+            self._snapshot.update(updated)
+            self.generation += 1
+        self._ready.set()
+        try:
+            METRICS_STORE.ingest({node_id: extract_metrics(state['health'])
+                                  for node_id, state in updated.items() if state['online']})
+        except sqlite3.Error as e:
+            print("Metrics store ingest failed:", e)
+        self.publish(updated)
+    def publish(self, updated):
+        """Push node-state and performance changes to stream subscribers"""
+        STREAM.publish('nodes', {
+            node_id: {
+                'name': NODES[node_id]['name'],
+                'type': NODES[node_id]['type'],
+                'ip': NODES[node_id]['ip'],
+                'online': state['online'],
+                'status': 'online' if state['online'] else 'offline'
+            }
+            for node_id, state in updated.items() if node_id in NODES
+        }, partial=True)
+        summary = performance_summary()
+        if summary:
+            summary.pop('timestamp', None)
+            STREAM.publish('performance', {'summary': summary})
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print("Node collector error:", e)
+            time.sleep(self.interval)
+    def snapshot(self):
+        """Return {node_id: state} with age/staleness flags"""
+        self.start()
+        # Before the first pass completes, wait at most about one probe's
+        # worth; after that nodes not collected yet are reported unknown/stale
+        self._ready.wait(timeout=min(self.ttl, PROBE_TIMEOUT))
+        now = time.time()
+        states = {}
+        with self._lock:
+            for node_id, state in self._snapshot.items():
+                age = now - state['updated']
+                # Live breaker state; it may have changed since the last pass
+                states[node_id] = dict(state, age=round(age, 3), stale=age > self.ttl,
+                                       circuit=BREAKERS.get(node_id).to_dict())
+        for node_id in NODES:
+            states.setdefault(node_id, self.unknown(node_id))
+        return states
+    @staticmethod
+    def unknown(node_id):
+        """State for a node not probed yet (new, or registered since the snapshot)"""
+        return {
+            'online': False,
+            'health': {'status': 'unknown'},
+            'circuit': BREAKERS.get(node_id).to_dict(),
+            'timestamp': None,
+            'age': None,
+            'stale': True
+        }
+    def get(self, node_id):
+        return self.snapshot().get(node_id) or self.unknown(node_id)
+    def export(self):
+        with self._lock:
+            return dict(self._snapshot)
+    def load(self, states):
+        """Adopt a snapshot exported by the leader worker"""
+        for node_id, state in states.items():
+            # Fast-fail (and recover) along with the leader's probes
+            if 'circuit' in state:
+                BREAKERS.get(node_id).adopt(state['circuit'])
+        with self._lock:
+            self._snapshot = states
+            self.generation += 1
+        self._ready.set()
+        self.publish(states)
+NODE_COLLECTOR = NodeStateCollector()
+# Long-running operations; see /api/jobs
+JOBS = JobManager(
+    JOBS_DB_PATH,
+    ClusterAPI.spawn_command,
+    workers=JOB_WORKERS,
+    log_limit=JOB_LOG_LIMIT,
+    timeout=JOB_TIMEOUT,
+    # Jobs count towards the node's breaker like execute_command does
+    on_finish=ClusterAPI.record_outcome
+)
+def start_job(kind, node_id, command):
+    """Queue command as a background job and answer 202 with its id"""
+    job = JOBS.submit(kind, node_id, command)
+    job.update(
+        success=True,
+        status_url=url_for('api_job', job_id=job['job_id']),
+        log_url=url_for('api_job_log', job_id=job['job_id'])
+    )
+    return jsonify(job), 202
 ################################################################################
 # ROUTES - PAGES
 ################################################################################
+def render_page(template):
+    """Render a page from the shared NODES config, cached per user principal"""
+    variant = (DEMO_MODE, fingerprint(get_current_user()))
+    fragment = FRAGMENTS.get(template, variant, lambda **_: render_template(
+        template, nodes=NODES, demo_mode=DEMO_MODE))
+    return cached_response(('page', template, variant), fragment.digest,
+                           lambda: fragment.fill({}), mimetype='text/html')
 @app.route('/')
 def index():
     """Main dashboard"""
-    return render_template('index.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('index.html')
 @app.route('/monitor')
 def monitor():
     """Node monitoring page"""
-    return render_template('monitor.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('monitor.html')
 @app.route('/control')
 def control():
     """Cluster control page"""
-    return render_template('control.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('control.html')
 @app.route('/tools')
 def tools():
     """Node tools and integration page"""
-    return render_template('tools.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('tools.html')
 @app.route('/isr')
 def adsb():
     """ADSB/UAT aircraft tracking page"""
-    return render_template('isr.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('isr.html')
 @app.route('/mesh')
 def mesh():
     """Mesh network topology page"""
-    return render_template('mesh.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('mesh.html')
 @app.route('/vhf')
 def vhf():
     """VHF/SDR frequency control page"""
-    return render_template('vhf.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('vhf.html')
 @app.route('/manage-users')
 def performance():
     """Manage users page"""
-    return render_template('manage-users.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('manage-users.html')
 @app.route('/backup')
 def backup():
     """Backup management page"""
-    return render_template('backup.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('backup.html')
 @app.route('/settings')
 def settings():
     """Settings page"""
-    return render_template('settings.html', nodes=NODES, demo_mode=DEMO_MODE)
+    return render_page('settings.html')
 ################################################################################
 # API - NODE STATUS
 ################################################################################
 @app.route('/api/nodes/list')
 def api_nodes_list():
-    """Get list of all nodes"""
+    """Get list of all nodes
+
+    ?type=<node type> or ?ip=<address> narrows the list using the
+    registry's indexes.
+    """
+    if 'ip' in request.args:
+        node_ids = [n for n in [NODES.by_ip(request.args['ip'])] if n]
+    elif 'type' in request.args:
+        node_ids = NODES.of_type(request.args['type'])
+    else:
+        node_ids = list(NODES)
     nodes_data = []
-    for node_id, node_info in NODES.items():
-        online = ClusterAPI.ping_node(node_id)
+    states = NODE_COLLECTOR.snapshot()
+    for node_id in node_ids:
+        # The registry may have reloaded since the list and snapshot were taken
+        node_info = NODES.get(node_id)
+        if node_info is None:
+            continue
+        state = states.get(node_id) or NODE_COLLECTOR.unknown(node_id)
+        online = state['online']
         nodes_data.append({
             'id': node_id,
             'name': node_info['name'],
             'type': node_info['type'],
             'ip': node_info['ip'],
             'online': online,
-            'status': 'online' if online else 'offline'
+            'status': 'online' if online else 'offline',
+            'circuit': state['circuit']['state'],
+            'stale': state['stale']
         })
     return jsonify(nodes_data)
 @app.route('/api/nodes/<node_id>/health')
@@ -465,7 +945,9 @@ def api_node_health(node_id):
     """Get health metrics for specific node"""
     if node_id not in NODES:
         return jsonify({'error': 'Node not found'}), 404
-    health = ClusterAPI.get_node_health(node_id)
+    state = NODE_COLLECTOR.get(node_id)
+    health = dict(state['health'], stale=state['stale'], age=state['age'],
+                  circuit=state['circuit'])
     return jsonify(health)
 @app.route('/api/nodes/<node_id>/status')
 def api_node_status(node_id):
@@ -473,7 +955,8 @@ def api_node_status(node_id):
     if node_id not in NODES:
         return jsonify({'error': 'Node not found'}), 404
     node = NODES[node_id]
-    online = ClusterAPI.ping_node(node_id)
+    state = NODE_COLLECTOR.get(node_id)
+    online = state['online']
     return jsonify({
         'id': node_id,
         'name': node['name'],
@@ -481,7 +964,9 @@ def api_node_status(node_id):
         'ip': node['ip'],
         'online': online,
         'status': 'online' if online else 'offline',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': state['timestamp'],
+        'circuit': state['circuit'],
+        'stale': state['stale']
     })
 @app.route('/api/cluster/status')
 def api_cluster_status():
@@ -493,18 +978,62 @@ def api_cluster_status():
         'offline_count': 0,
         'total_count': len(NODES)
     }
+    states = NODE_COLLECTOR.snapshot()
     for node_id, node_info in NODES.items():
-        online = ClusterAPI.ping_node(node_id)
+        state = states.get(node_id) or NODE_COLLECTOR.unknown(node_id)
+        online = state['online']
         cluster_status['nodes'][node_id] = {
             'name': node_info['name'],
             'online': online,
-            'ip': node_info['ip']
+            'ip': node_info['ip'],
+            'circuit': state['circuit']['state'],
+            'stale': state['stale']
         }
         if online:
             cluster_status['online_count'] += 1
         else:
             cluster_status['offline_count'] += 1
     return jsonify(cluster_status)
+@app.route('/api/cluster/ssh-pool')
+def api_ssh_pool():
+    """Get SSH connection pool statistics"""
+    return jsonify(SSH_POOL.get_stats())
+@app.route('/api/cluster/registry')
+def api_node_registry():
+    """Get node registry version and reload state"""
+    return jsonify(NODES.get_stats())
+@app.route('/api/cluster/circuits')
+def api_circuits():
+    """Get per-node circuit breaker state in this worker"""
+    return jsonify(BREAKERS.get_stats())
+@app.route('/api/cluster/tool-status-cache')
+def api_tool_status_cache():
+    """Get batched tool status cache statistics"""
+    return jsonify(TOOL_STATUS.get_stats())
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events stream of node, performance, aircraft and asset changes
+
+    ?topics=nodes,performance limits the subscription. The first event is a
+    full snapshot; every later event carries only changed/removed keys.
+    """
+    requested = [t for t in request.args.get('topics', '').split(',') if t]
+    topics = [t for t in requested if t in STREAM_TOPICS] or list(STREAM_TOPICS)
+    # Make sure there is something producing node/performance state
+    NODE_COLLECTOR.start()
+    subscription = STREAM.subscribe(topics)
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            for frame in subscription.events():
+                yield frame
+        finally:
+            STREAM.unsubscribe(subscription)
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 ################################################################################
 # API - OPERATIONS
 ################################################################################
@@ -521,9 +1050,8 @@ def api_deploy_cluster():
     """Deploy entire cluster"""
     if DEMO_MODE:
         return jsonify({'success': True, 'message': 'Full cluster deployment started (DEMO)'})
-    result = ClusterAPI.execute_command('boot',
+    return start_job('deploy-cluster', 'boot',
         'sudo /home/pi/Portable-Pi-5-Cluster-Server/scripts/deployment-coordinator.sh full')
-    return jsonify(result)
 @app.route('/api/health-check', methods=['POST'])
 def api_health_check():
     """Run health check on cluster"""
@@ -535,9 +1063,8 @@ def api_health_check():
             'checks_failed': 2,
             'health_percent': 88
         })
-    result = ClusterAPI.execute_command('boot',
+    return start_job('health-check', 'boot',
         '/home/pi/Portable-Pi-5-Cluster-Server/scripts/health-check-all.sh')
-    return jsonify(result)
 @app.route('/api/validate-config', methods=['POST'])
 def api_validate_config():
     """Validate cluster configuration"""
@@ -549,6 +1076,101 @@ def api_validate_config():
     result = ClusterAPI.execute_command('boot',
         '/home/pi/Portable-Pi-5-Cluster-Server/scripts/validate-all-configs.sh')
     return jsonify(result)
+# Boot-node operations whose output can be followed live
+STREAMED_OPERATIONS = {
+    'health-check': '/home/pi/Portable-Pi-5-Cluster-Server/scripts/health-check-all.sh',
+    'validate-config': '/home/pi/Portable-Pi-5-Cluster-Server/scripts/validate-all-configs.sh',
+    'cluster-status': '/home/pi/Portable-Pi-5-Cluster-Server/scripts/cluster-orchestrator.sh status',
+    'cluster-report': '/home/pi/Portable-Pi-5-Cluster-Server/scripts/cluster-orchestrator.sh report',
+    'collect-logs': '/home/pi/Portable-Pi-5-Cluster-Server/scripts/cluster-orchestrator.sh collect-logs system',
+}
+@app.route('/api/operations/<operation>/stream')
+def api_operation_stream(operation):
+    """Run an operation on the boot node and stream its output
+
+    Sends SSE 'output' events followed by one 'exit' event when the client
+    accepts text/event-stream (close the EventSource on 'exit', or it will
+    reconnect and run the operation again); otherwise the raw output is sent
+    as a chunked text/plain body.
+    """
+    command = STREAMED_OPERATIONS.get(operation)
+    if command is None:
+        return jsonify({'error': 'Unknown operation'}), 404
+    # A GET that runs scripts: hold it to the same permission as raw commands
+    user = get_current_user()
+    if 'deploy' not in (user or {}).get('permissions', []):
+        return jsonify({'error': "'deploy' permission required"}), 403
+    try:
+        stream = None if DEMO_MODE else ClusterAPI.stream_command('boot', command, timeout=JOB_TIMEOUT)
+    except CircuitOpenError as e:
+        return jsonify({'error': str(e), 'retry_in': round(e.retry_in, 1)}), 503
+    except Exception as e:
+        ClusterAPI.record_outcome('boot', error=e)
+        print(f"Operation {operation} failed to start:", e)
+        return jsonify({'error': str(e)}), 500
+    def chunks():
+        if stream is None:
+            yield f'[DEMO] Executed: {command}\n'.encode()
+            return
+        try:
+            yield from stream
+        except Exception as e:
+            ClusterAPI.record_outcome('boot', error=e)
+            raise
+        # Not reached when the client disconnects; that says nothing about the node
+        ClusterAPI.record_outcome('boot', stream)
+    if 'text/event-stream' not in request.headers.get('Accept', ''):
+        return Response(chunks(), mimetype='text/plain', headers={'X-Accel-Buffering': 'no'})
+    def generate():
+        # Chunks can split multi-byte characters; decode across boundaries
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        try:
+            for chunk in chunks():
+                text = decoder.decode(chunk)
+                if text:
+                    yield sse_frame('output', {'data': text})
+            yield sse_frame('exit', {
+                'exit_code': stream.returncode if stream else 0,
+                'bytes': stream.bytes_read if stream else 0,
+                'timed_out': stream.timed_out if stream else False
+            })
+        except Exception as e:
+            print(f"Operation stream {operation} failed:", e)
+            yield sse_frame('exit', {'exit_code': None, 'error': str(e)})
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+################################################################################
+# API - JOBS
+################################################################################
+@app.route('/api/jobs')
+def api_jobs():
+    """List recent jobs, newest first; ?limit= up to 200"""
+    limit = request.args.get('limit', 50, type=int)
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    return jsonify({'jobs': JOBS.list(limit=min(limit, 200))})
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """Get job state"""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+@app.route('/api/jobs/<job_id>/log')
+def api_job_log(job_id):
+    """Get job output from ?offset= on; poll again with next_offset"""
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 65536, type=int)
+    if offset < 0 or limit < 1:
+        return jsonify({'error': 'offset must not be negative and limit must be positive'}), 400
+    # No read can return more than a job retains
+    log = JOBS.read_log(job_id, offset=offset, limit=min(limit, JOB_LOG_LIMIT))
+    if log is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(log)
 ################################################################################
 # API - NODE CONTROL
 ################################################################################
@@ -559,7 +1181,7 @@ def api_node_reboot(node_id):
         return jsonify({'error': 'Node not found'}), 404
     if DEMO_MODE:
         return jsonify({'success': True, 'message': f'{node_id} reboot initiated (DEMO)'})
-    result = ClusterAPI.execute_command(node_id, 'sudo reboot')
+    result = ClusterAPI.execute_command(node_id, 'sudo reboot', disconnects=True)
     return jsonify(result)
 @app.route('/api/nodes/<node_id>/shutdown', methods=['POST'])
 def api_node_shutdown(node_id):
@@ -568,24 +1190,95 @@ def api_node_shutdown(node_id):
         return jsonify({'error': 'Node not found'}), 404
     if DEMO_MODE:
         return jsonify({'success': True, 'message': f'{node_id} shutdown initiated (DEMO)'})
-    result = ClusterAPI.execute_command(node_id, 'sudo shutdown -h now')
+    result = ClusterAPI.execute_command(node_id, 'sudo shutdown -h now', disconnects=True)
     return jsonify(result)
 @app.route('/api/cluster/reboot-all', methods=['POST'])
 def api_reboot_all():
     """Reboot all nodes"""
     if DEMO_MODE:
         return jsonify({'success': True, 'message': 'Cluster reboot initiated (DEMO)'})
-    result = ClusterAPI.execute_command('boot',
+    return start_job('reboot-all', 'boot',
         '/home/pi/Portable-Pi-5-Cluster-Server/scripts/cluster-orchestrator.sh reboot-all')
-    return jsonify(result)
 @app.route('/api/cluster/update-all', methods=['POST'])
 def api_update_all():
     """Update all nodes"""
     if DEMO_MODE:
         return jsonify({'success': True, 'message': 'Cluster update initiated (DEMO)'})
-    result = ClusterAPI.execute_command('boot',
+    return start_job('update-all', 'boot',
         '/home/pi/Portable-Pi-5-Cluster-Server/scripts/cluster-orchestrator.sh update-all')
-    return jsonify(result)
+# Named actions for /api/cluster/exec: command and the permission it needs
+# (None = any signed-in user)
+NODE_ACTIONS = {
+    'uptime': ('uptime', None),
+    'disk-usage': ('df -h /', None),
+    'failed-services': ('systemctl --failed --no-legend', None),
+    'update': ('sudo apt-get update && sudo apt-get upgrade -y', 'update'),
+    'time-sync': ('sudo systemctl restart systemd-timesyncd', 'update'),
+    'clean-packages': ('sudo apt-get clean && sudo apt-get autoclean', 'update'),
+    'rotate-logs': ('sudo logrotate -f /etc/logrotate.conf', 'update'),
+    'reboot': ('sudo reboot', 'reboot'),
+}
+# Actions that end by dropping the SSH session
+DISCONNECTING_ACTIONS = {'reboot'}
+@app.route('/api/cluster/exec', methods=['POST'])
+def api_cluster_exec():
+    """Run an action or command on several nodes concurrently
+
+    JSON body: nodes (default all), action or command, concurrency,
+    timeout (per node, seconds), mode ('best-effort' or 'fail-fast').
+    Raw commands need the 'deploy' permission.
+    """
+    data = request.get_json(silent=True) or {}
+    node_ids = data.get('nodes') or list(NODES)
+    if not isinstance(node_ids, list) or not all(isinstance(n, str) for n in node_ids):
+        return jsonify({'error': 'nodes must be a list of node ids'}), 400
+    # Each node runs the command once, however often it was listed
+    node_ids = list(dict.fromkeys(node_ids))
+    unknown = [n for n in node_ids if n not in NODES]
+    if unknown:
+        return jsonify({'error': f"Unknown nodes: {', '.join(map(str, unknown))}"}), 400
+    if bool(data.get('action')) == bool(data.get('command')):
+        return jsonify({'error': 'Specify exactly one of action or command'}), 400
+    if data.get('action'):
+        if data['action'] not in NODE_ACTIONS:
+            return jsonify({'error': 'Unknown action', 'actions': sorted(NODE_ACTIONS)}), 400
+        command, permission = NODE_ACTIONS[data['action']]
+    else:
+        command, permission = str(data['command']), 'deploy'
+    mode = data.get('mode', BEST_EFFORT)
+    if mode not in MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(MODES)}"}), 400
+    try:
+        concurrency = int(data.get('concurrency', len(node_ids)))
+        timeout = min(float(data.get('timeout', 60)), JOB_TIMEOUT)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency and timeout must be numbers'}), 400
+    if concurrency < 1 or not timeout > 0:
+        return jsonify({'error': 'concurrency and timeout must be positive'}), 400
+    user = get_current_user()
+    if permission and permission not in (user or {}).get('permissions', []):
+        return jsonify({'error': f"'{permission}' permission required"}), 403
+    disconnects = data.get('action') in DISCONNECTING_ACTIONS
+    start = time.monotonic()
+    results, aborted = broadcast(
+        node_ids,
+        lambda node_id: ClusterAPI.execute_command(node_id, command, timeout=timeout,
+                                                   disconnects=disconnects),
+        concurrency=concurrency,
+        mode=mode
+    )
+    return jsonify({
+        'success': all(r.get('success') for r in results.values()),
+        'action': data.get('action'),
+        'command': command,
+        'mode': mode,
+        'aborted': aborted,
+        'duration': round(time.monotonic() - start, 3),
+        'succeeded': sorted(n for n, r in results.items() if r.get('success')),
+        'failed': sorted(n for n, r in results.items() if not r.get('success') and not r.get('skipped')),
+        'skipped': sorted(n for n, r in results.items() if r.get('skipped')),
+        'results': results
+    })
 ################################################################################
 # API - BACKUP/RESTORE
 ################################################################################
@@ -599,9 +1292,8 @@ def api_backup_create():
             'size_mb': 2456,
             'message': 'Backup created (DEMO)'
         })
-    result = ClusterAPI.execute_command('boot',
+    return start_job('backup-create', 'boot',
         '/home/pi/Portable-Pi-5-Cluster-Server/operations/backups/backup-restore-manager.sh create')
-    return jsonify(result)
 @app.route('/api/backup/list')
 def api_backup_list():
     """List available backups"""
@@ -630,24 +1322,62 @@ def api_backup_restore(backup_id):
 ################################################################################
 # API - PERFORMANCE
 ################################################################################
-@app.route('/api/performance/summary')
-def api_performance_summary():
-    """Get performance summary"""
+def _average(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 1) if values else None
+def performance_summary():
+    """Cluster-wide performance averages, or None when no data is available"""
     if DEMO_MODE:
-        return jsonify({
+        return {
             'cpu_avg': 35.2,
             'memory_avg': 62.1,
             'disk_usage': 78.5,
             'network_throughput_mbps': 45.3,
             'temperature_avg': 51.2,
             'timestamp': datetime.now().isoformat()
-        })
-    return jsonify({'error': 'Performance data not available'}), 503
+        }
+    latest = METRICS_STORE.latest()
+    if not latest:
+        return None
+    samples = latest.values()
+    return {
+        'cpu_avg': _average(m.get('cpu') for m in samples),
+        'memory_avg': _average(m.get('memory') for m in samples),
+        'disk_usage': _average(m.get('disk') for m in samples),
+        'network_throughput_mbps': round(sum(m.get('network', 0) for m in samples), 3),
+        'temperature_avg': _average(m.get('temperature') for m in samples),
+        'nodes_reporting': len(latest),
+        'timestamp': datetime.fromtimestamp(max(m['ts'] for m in samples)).isoformat()
+    }
+@app.route('/api/performance/summary')
+def api_performance_summary():
+    """Get performance summary"""
+    summary = performance_summary()
+    if not summary:
+        return jsonify({'error': 'Performance data not available'}), 503
+    return jsonify(summary)
 @app.route('/api/performance/<node_id>')
 def api_performance_node(node_id):
-    """Get performance metrics for node"""
+    """Get performance metrics for node
+
+    With ?from=&to=[&step=&metric=] (epoch seconds) returns min/avg/max
+    series from the pre-aggregated tiers instead of the latest sample.
+    """
     if node_id not in NODES:
         return jsonify({'error': 'Node not found'}), 404
+    if 'from' in request.args or 'to' in request.args:
+        try:
+            end = int(request.args.get('to', time.time()))
+            start = int(request.args.get('from', end - 3600))
+            step = int(request.args.get('step', 0))
+        except ValueError:
+            return jsonify({'error': 'from, to and step must be epoch seconds'}), 400
+        if start >= end:
+            return jsonify({'error': 'from must be earlier than to'}), 400
+        metrics = [m for m in request.args.get('metric', '').split(',') if m]
+        result = METRICS_STORE.query(node_id, start, end, step=step, metrics=metrics)
+        result.update({'node_id': node_id, 'from': start, 'to': end})
+        return jsonify(result)
     if DEMO_MODE:
         return jsonify({
             'cpu': 32.5,
@@ -657,39 +1387,275 @@ def api_performance_node(node_id):
             'temperature': 52.3,
             'timestamp': datetime.now().isoformat()
         })
-    return jsonify({'error': 'Performance data not available'}), 503
+    latest = METRICS_STORE.latest(node_id).get(node_id)
+    if not latest:
+        return jsonify({'error': 'Performance data not available'}), 503
+    return jsonify({
+        'cpu': latest.get('cpu'),
+        'memory': latest.get('memory'),
+        'disk': latest.get('disk'),
+        'network': latest.get('network'),
+        'temperature': latest.get('temperature'),
+        'load': latest.get('load'),
+        'timestamp': datetime.fromtimestamp(latest['ts']).isoformat()
+    })
+@app.route('/api/metrics')
+def api_metrics():
+    """Prometheus text exposition of request, subsystem and subprocess metrics
+
+    Under gunicorn the series of all live workers are summed. Requires a
+    session or, when METRICS_TOKEN is set, "Authorization: Bearer <token>".
+    """
+    exports = COORDINATOR.telemetry() if COORDINATOR.active else [TELEMETRY.export()]
+    return Response(render(merge(exports)),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
 ################################################################################
 # API - TOOL-SPECIFIC ENDPOINTS
 ################################################################################
+def demo_aircraft_document():
+    """Simulated aircraft.json in dump1090 format"""
+    import random
+    aircraft = []
+    callsigns = ['AAL123', 'UAL456', 'DAL789', 'SWA101', 'JBU202', 'SKW303', 'ASA404']
+    for i, cs in enumerate(callsigns):
+        aircraft.append({
+            'hex': f'A{i:05X}',
+            'flight': cs,
+            'lat': 37.7749 + random.uniform(-0.5, 0.5),
+            'lon': -122.4194 + random.uniform(-0.5, 0.5),
+            'alt_baro': random.randint(5000, 40000),
+            'gs': random.randint(300, 500),
+            'track': random.randint(0, 360),
+            'seen': 0
+        })
+    return {'now': time.time(), 'aircraft': aircraft}
+TRACKS = TrackStore(retention=ADSB_TRACK_RETENTION)
+def publish_aircraft(changed, removed):
+    TRACKS.record(changed.values())
+    STREAM.publish('aircraft', changed, partial=True, removed=removed)
+def adsb_url():
+    """dump1090/readsb feed URL; None while the registry has no 'isr' node"""
+    if ADSB_URL:
+        return ADSB_URL
+    isr = NODES.get('isr')
+    return f"http://{isr['ip']}:8080/data/aircraft.json" if isr else None
+ADSB = ADSBIngestService(
+    adsb_url(),
+    interval=5 if DEMO_MODE else ADSB_POLL_INTERVAL,
+    expiry=ADSB_EXPIRY,
+    source=demo_aircraft_document if DEMO_MODE else None,
+    on_update=publish_aircraft
+)
 @app.route('/api/nodes/isr/adsb/aircraft')
 def api_isr_adsb_aircraft():
-    """Get list of currently tracked aircraft (ADSB)"""
-    if DEMO_MODE:
-        import random
-        aircraft = []
-        callsigns = ['AAL123', 'UAL456', 'DAL789', 'SWA101', 'JBU202', 'SKW303', 'ASA404']
-        for i, cs in enumerate(callsigns):
-            aircraft.append({
-                'icao': f'A{i:05X}',
-                'callsign': cs,
-                'latitude': 37.7749 + random.uniform(-0.5, 0.5),
-                'longitude': -122.4194 + random.uniform(-0.5, 0.5),
-                'altitude': random.randint(5000, 40000),
-                'speed': random.randint(300, 500),
-                'heading': random.randint(0, 360)
-            })
-        return jsonify({'aircraft': aircraft})
+    """Get list of currently tracked aircraft (ADSB)
+
+    ?since=<seq> returns only aircraft changed after that sequence number
+    plus the ICAO codes of contacts that expired.
+
+    Server-side filters: bbox=min_lat,min_lon,max_lat,max_lon,
+    lat=&lon=&radius=<km>, alt_min=, alt_max=, callsign=<prefix>,
+    plus fields=<comma list>, offset= and limit=.
+    """
     try:
-        result = subprocess.run(
-            ['curl', '-s', 'http://192.168.1.20:8080/data/aircraft.json'],
-            capture_output=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            return jsonify(json.loads(result.stdout))
-    except:
-        pass
-    return jsonify({'aircraft': []}), 503
+        query = AircraftQuery.from_args(request.args)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid aircraft query: {e}'}), 400
+    COORDINATOR.request_adsb()
+    if ADSB.last_success is None:
+        # Retries belong to the background poller; fetching here would queue
+        # every client behind the connect timeout of a dead feed
+        return jsonify({'aircraft': [], 'stale': True, 'error': 'ADS-B feed starting'}), 503
+    since = request.args.get('since', type=int)
+    if query.is_filtered:
+        payload = ADSB.table.search(query, since=since)
+    elif since is None:
+        payload = ADSB.table.snapshot()
+    else:
+        payload = ADSB.table.since(since)
+    payload['stale'] = ADSB.is_stale()
+    return jsonify(payload)
+@app.route('/api/nodes/isr/adsb/tracks')
+def api_isr_adsb_tracks():
+    """Get track history storage statistics"""
+    return jsonify(TRACKS.get_stats())
+@app.route('/api/nodes/isr/adsb/tracks/<icao>')
+def api_isr_adsb_track(icao):
+    """Get position history for one aircraft
+
+    ?since=<epoch> limits the window; ?tolerance=<metres> applies
+    Douglas-Peucker simplification to the returned points.
+    """
+    since = request.args.get('since', type=float)
+    tolerance = request.args.get('tolerance', type=float)
+    track = TRACKS.query(icao, since=since, tolerance_m=tolerance)
+    if track is None:
+        return jsonify({'error': 'No track history for aircraft'}), 404
+    return jsonify(track)
+# Bearing reports from the direction-finding receivers, solved on this node
+TRIANGULATION = TriangulationService(
+    positions={node_id: node['position'] for node_id, node in NODES.items() if 'position' in node},
+    max_age=TRIANGULATION_MAX_AGE,
+    interval=TRIANGULATION_INTERVAL
+)
+# Simulated emitters for demo mode: id -> (lat, lon)
+DEMO_EMITTERS = {'146.520MHz': (37.7812, -122.4065), '462.5625MHz': (37.7702, -122.4268)}
+def demo_bearing_reports(every=3):
+    """Noisy bearings from every receiver to the simulated emitters"""
+    import random
+    if time.time() - (TRIANGULATION.last_report or 0) < every:
+        return
+    for receiver, (lat, lon) in TRIANGULATION.positions.items():
+        TRIANGULATION.report(receiver, [{
+            'emitter': emitter,
+            'bearing': triangulation.bearing_to(lat, lon, *position) + random.gauss(0, 2),
+            'sigma': 3,
+            'rssi': random.randint(-75, -55)
+        } for emitter, position in DEMO_EMITTERS.items()])
+@app.route('/api/nodes/isr/triangulation')
+def api_isr_triangulation():
+    """Estimated emitter positions with 95% confidence ellipses
+
+    Solved here from the receivers' latest bearings at most once per
+    TRIANGULATION_INTERVAL, however many operators are watching.
+    """
+    if not triangulation.AVAILABLE:
+        return jsonify({'error': 'Triangulation requires numpy'}), 503
+    if DEMO_MODE and not COORDINATOR.active:
+        demo_bearing_reports()
+    return jsonify(TRIANGULATION.snapshot())
+@app.route('/api/nodes/isr/triangulation/bearings', methods=['POST'])
+def api_isr_triangulation_bearings():
+    """Submit a receiver's current bearings
+
+    Body: {"receiver": "vhf", "latitude": ..., "longitude": ..., "bearings":
+    [{"emitter": "146.520MHz", "bearing": 74.0, "sigma": 4, "rssi": -64}]}.
+    latitude/longitude are optional for receivers with a configured position.
+    """
+    data = request.get_json(silent=True) or {}
+    receiver = data.get('receiver')
+    bearings = data.get('bearings')
+    if not isinstance(receiver, str) or not receiver or not isinstance(bearings, list):
+        return jsonify({'error': 'receiver and a bearings list are required'}), 400
+    position = None
+    try:
+        if 'latitude' in data or 'longitude' in data:
+            position = (float(data['latitude']), float(data['longitude']))
+        for b in bearings:
+            if not b.get('emitter') or not math.isfinite(float(b['bearing'])):
+                raise ValueError('each bearing needs an emitter and a numeric bearing')
+            if float(b.get('sigma') or triangulation.DEFAULT_SIGMA) <= 0:
+                raise ValueError('sigma must be positive')
+        entry = TRIANGULATION.report(receiver, bearings, position)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': f'Invalid bearing report: {e}'}), 400
+    if COORDINATOR.active:
+        # The leader solves; hand it this receiver's reports
+        SHARED_STATE.put(f'bearings:{receiver}', entry)
+        SHARED_STATE.bump('bearings')
+    return jsonify({'success': True, 'receiver': receiver, 'bearings': len(entry['bearings'])})
+def mesh_topology_source(command, fixture, parse):
+    """Fetch callable for MESH_TOPOLOGY: command's output on the mesh node, or a fixture file"""
+    def fetch():
+        if MESH_TOPOLOGY_FIXTURES:
+            with open(os.path.join(MESH_TOPOLOGY_FIXTURES, fixture)) as f:
+                nodes, edges = parse(f.read())
+            if DEMO_MODE:
+                import random
+                for edge in edges.values():
+                    edge['quality'] = round(min(max(edge['quality'] + random.uniform(-0.08, 0.08), 0), 1), 3)
+            return nodes, edges
+        result = ClusterAPI.run_script('mesh', command, timeout=10)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode().strip() or f'{command} exited with {result.returncode}')
+        return parse(result.stdout.decode())
+    return fetch
+MESH_TOPOLOGY = MeshTopologyService({
+    'batman': mesh_topology_source('batctl o', 'batman-originators.txt',
+                                   mesh_topology.parse_batman_originators),
+    'meshtastic': mesh_topology_source('meshtastic --info', 'meshtastic-info.txt',
+                                       mesh_topology.parse_meshtastic_info),
+}, interval=MESH_TOPOLOGY_INTERVAL)
+@app.route('/api/nodes/mesh/topology')
+def api_mesh_topology():
+    """Mesh graph from batman-adv originators and meshtastic node info
+
+    ?since=<version> returns only nodes and links changed after that version
+    plus the ids of removed ones; "full": true means the version was too old
+    (or unknown) and the whole graph was sent instead.
+    """
+    COORDINATOR.request_mesh()
+    # Never poll inline: that would run batctl/meshtastic over SSH in the
+    # request. Until the poller's first pass the graph is empty and stale.
+    payload = MESH_TOPOLOGY.graph.since(request.args.get('since', type=int))
+    payload['sources'] = MESH_TOPOLOGY.status
+    payload['stale'] = MESH_TOPOLOGY.is_stale()
+    return jsonify(payload)
+def publish_assets(changed, removed):
+    STREAM.publish('assets', changed, partial=True, removed=removed)
+MQTT = MQTTBridge(
+    MQTT_BROKER or FakeBroker(),
+    MQTT_TOPICS,
+    queue_size=MQTT_QUEUE_SIZE,
+    policy=MQTT_DROP_POLICY,
+    expiry=MQTT_ASSET_EXPIRY,
+    username=MQTT_USERNAME,
+    password=MQTT_PASSWORD,
+    on_update=publish_assets
+)
+MQTT_ENABLED = bool(MQTT_BROKER) or DEMO_MODE
+def demo_mqtt_publisher(interval=5):
+    """Meshtastic JSON uplinks for the fixture radios, wandering and draining"""
+    import random
+    with open(os.path.join(BASE_DIR, 'data', 'fixtures', 'mesh', 'meshtastic-info.txt')) as f:
+        radios, _ = mesh_topology.parse_meshtastic_info(f.read())
+    radios = {int(node_id[4:], 16): node for node_id, node in radios.items()
+              if node['latitude'] is not None and not node.get('local')}
+    while True:
+        for num, node in radios.items():
+            node['latitude'] += random.uniform(-0.0002, 0.0002)
+            node['longitude'] += random.uniform(-0.0002, 0.0002)
+            node['battery'] = max((node['battery'] or 100) - random.choice((0, 0, 1)), 5)
+            uplink = {'from': num, 'snr': node['snr'], 'rssi': random.randint(-110, -70)}
+            MQTT.broker.publish('msh/US/2/json/LongFast/!abcd0001', dict(uplink, type='position', payload={
+                'latitude_i': int(node['latitude'] * 1e7), 'longitude_i': int(node['longitude'] * 1e7),
+                'altitude': node['altitude']}))
+            MQTT.broker.publish('msh/US/2/json/LongFast/!abcd0001', dict(uplink, type='telemetry', payload={
+                'battery_level': node['battery'], 'voltage': round(3.3 + node['battery'] / 100, 2)}))
+        time.sleep(interval)
+def start_mqtt():
+    """Start the MQTT bridge (and the demo publisher) in this process"""
+    if not MQTT_ENABLED:
+        return
+    try:
+        MQTT.start()
+    except RuntimeError as e:
+        print("MQTT bridge not started:", e)
+        return
+    if isinstance(MQTT.broker, FakeBroker) and DEMO_MODE:
+        threading.Thread(target=demo_mqtt_publisher, name='mqtt-demo', daemon=True).start()
+@app.route('/api/nodes/mesh/assets')
+def api_mesh_assets():
+    """Latest position and telemetry of mesh assets reported over MQTT
+
+    ?since=<seq> returns only assets changed after that sequence number
+    plus the ids of assets that expired.
+    """
+    if not MQTT_ENABLED:
+        return jsonify({'assets': [], 'error': 'MQTT bridge not configured'}), 503
+    since = request.args.get('since', type=int)
+    payload = MQTT.table.snapshot() if since is None else MQTT.table.since(since)
+    payload['connected'] = MQTT.connected
+    return jsonify(payload)
+@app.route('/api/nodes/mesh/mqtt')
+def api_mesh_mqtt():
+    """Get MQTT bridge counters (messages, coalesced and dropped updates)"""
+    stats = MQTT.get_stats()
+    if COORDINATOR.following:
+        # The bridge runs in the leader worker
+        assets, _, _ = SHARED_STATE.get('assets')
+        stats = assets['stats'] if assets else stats
+    return jsonify(dict(stats, enabled=MQTT_ENABLED))
 ################################################################################
 # API - NODE-SPECIFIC TOOLS
 ################################################################################
@@ -699,13 +1665,13 @@ def api_node_tools(node_id):
     if node_id not in NODES:
         return jsonify({'error': 'Node not found'}), 404
     node = NODES[node_id]
-    return jsonify({
+    return cached_response(('node-tools', node_id), NODES.version, lambda: {
         'node_id': node_id,
         'node_name': node['name'],
         'node_type': node['type'],
         'purpose': node['purpose'],
         'tools': node['tools'],
-        'available_tools_count': sum(len(tools) for tools in node['tools'].values())
+        'available_tools_count': node['tool_count']
     })
 @app.route('/api/nodes/<node_id>/tool-status')
 def api_node_tool_status(node_id):
@@ -735,7 +1701,19 @@ def api_node_tool_status(node_id):
             'timestamp': datetime.now().isoformat(),
             'tools_status': tools_status
         })
-    return jsonify({'error': 'Tool status not available in production'}), 503
+    statuses, age = TOOL_STATUS.get(node_id, node_tool_names(node_id))
+    if statuses is None:
+        return jsonify({'error': f'{node_id} unreachable', 'node_id': node_id}), 503
+    unknown = {'installed': False, 'running': False, 'status': 'unknown'}
+    return jsonify({
+        'node_id': node_id,
+        'timestamp': datetime.now().isoformat(),
+        'age': age,
+        'tools_status': {
+            category: {tool: statuses.get(tool, unknown) for tool in tools}
+            for category, tools in NODES[node_id]['tools'].items()
+        }
+    })
 @app.route('/api/nodes/<node_id>/tool/<tool_name>', methods=['GET', 'POST'])
 def api_node_tool_action(node_id, tool_name):
     """Interact with a specific tool on a node"""
@@ -751,45 +1729,249 @@ def api_node_tool_action(node_id, tool_name):
             'message': f'{action.capitalize()} on {tool_name}',
             'timestamp': datetime.now().isoformat()
         })
-    result = ClusterAPI.execute_command(node_id, f'which {tool_name}')
+    tools = node_tool_names(node_id)
+    if tool_name in tools:
+        # Known tools come from the node's batched status probe
+        statuses, age = TOOL_STATUS.get(node_id, tools)
+        if statuses is None:
+            return jsonify({'error': f'{node_id} unreachable'}), 503
+        status = statuses.get(tool_name)
+        if not status or not status['installed']:
+            return jsonify({'error': f'{tool_name} not found on {node_id}'}), 404
+        return jsonify(dict(status, node_id=node_id, tool=tool_name, action=action, age=age,
+                            timestamp=datetime.now().isoformat()))
+    result = ClusterAPI.execute_command(node_id, f'which {shlex.quote(tool_name)}')
     return jsonify(result) if result.get('success') else \
            jsonify({'error': f'{tool_name} not found on {node_id}'}), 404
 @app.route('/api/cluster/node-summary')
 def api_cluster_node_summary():
-    """Get detailed summary of all nodes with their purposes and tools"""
+    """Get detailed summary of all nodes with their purposes and tools
+
+    Encoded once per node registry version (and, outside demo mode, per
+    combination of online nodes).
+    """
     if DEMO_MODE:
-        summary = []
-        for node_id, node_info in NODES.items():
-            summary.append({
-                'id': node_id,
-                'name': node_info['name'],
-                'type': node_info['type'],
-                'purpose': node_info['purpose'],
-                'ip': node_info['ip'],
-                'online': True,
-                'tools': {
-                    'total': sum(len(tools) for tools in node_info['tools'].values()),
-                    'categories': list(node_info['tools'].keys()),
-                    'available': node_info['tools']
-                }
-            })
-        return jsonify(summary)
-    summary = []
-    for node_id, node_info in NODES.items():
-        online = ClusterAPI.ping_node(node_id)
-        summary.append({
+        return cached_response('node-summary-demo', NODES.version, lambda: [{
             'id': node_id,
             'name': node_info['name'],
             'type': node_info['type'],
             'purpose': node_info['purpose'],
             'ip': node_info['ip'],
-            'online': online,
+            'online': True,
             'tools': {
-                'total': sum(len(tools) for tools in node_info['tools'].values()),
-                'categories': list(node_info['tools'].keys())
+                'total': node_info['tool_count'],
+                'categories': node_info['categories'],
+                'available': node_info['tools']
             }
-        })
-    return jsonify(summary)
+        } for node_id, node_info in NODES.items()])
+    states = NODE_COLLECTOR.snapshot()
+    online = {node_id: states.get(node_id, {}).get('online', False) for node_id in NODES}
+    return cached_response('node-summary', (NODES.version, tuple(online.values())), lambda: [{
+        'id': node_id,
+        'name': node_info['name'],
+        'type': node_info['type'],
+        'purpose': node_info['purpose'],
+        'ip': node_info['ip'],
+        'online': online.get(node_id, False),
+        'tools': {
+            'total': node_info['tool_count'],
+            'categories': node_info['categories']
+        }
+    } for node_id, node_info in NODES.items()])
+################################################################################
+# BACKGROUND SERVICES
+################################################################################
+def nodes_reloaded(registry):
+    """Drop state derived from the previous node definitions"""
+    print(f"Node registry reloaded: version {registry.version}, {len(registry)} nodes")
+    FRAGMENTS.invalidate()
+    RESPONSES.invalidate()
+    # A larger cluster must not leave probes queued past ping_nodes' deadline
+    PROBE_EXECUTOR.resize()
+    ADSB.set_url(adsb_url())
+    TRIANGULATION.positions = {node_id: node['position'] for node_id, node in registry.items()
+                               if 'position' in node}
+    gone = [node_id for node_id in NODE_COLLECTOR.export() if node_id not in registry]
+    if gone:
+        STREAM.publish('nodes', {}, partial=True, removed=gone)
+NODES.on_reload(nodes_reloaded)
+SHARED_KEYS = ('nodes', 'aircraft', 'adsb-wanted', 'principals', 'bearings', 'triangulation',
+               'mesh', 'mesh-wanted', 'assets')
+class WorkerCoordinator:
+    """Elects one worker process to run the collectors; the rest follow it
+
+    The leader (holder of LEADER_LOCK) runs the node collector, the
+    MQTT bridge, the triangulation solver and, once any worker has been asked for them, the
+    ADS-B and mesh topology pollers, and mirrors their state into SHARED_STATE. Followers load those snapshots every interval and
+    feed them to their own stream subscribers. A single-process server
+    simply becomes the leader. Every worker also publishes its TELEMETRY
+    so /api/metrics can report the whole server.
+    """
+    def __init__(self, interval=SHARED_SYNC_INTERVAL, recover_interval=60):
+        self.interval = interval
+        self.recover_interval = recover_interval
+        self.active = False
+        self.leader = False
+        self._pid = None
+        self._lock = threading.Lock()
+        self._versions = None
+        self._published = {}
+        self._recovered = 0
+    @property
+    def following(self):
+        return self.active and not self.leader
+    def start(self):
+        """Settle this process's role, then keep syncing in the background"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.active = True
+            self.leader = False
+            self._versions = None
+        self.tick()
+        threading.Thread(target=self._run, name='coordinator', daemon=True).start()
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception as e:
+                print("Worker coordinator error:", e)
+    def tick(self):
+        # Every worker watches the node definitions file itself
+        NODES.refresh()
+        if not self.leader and LEADER_LOCK.acquire():
+            self.promote()
+        NODE_COLLECTOR.passive = not self.leader
+        TRIANGULATION.passive = not self.leader
+        versions = SHARED_STATE.versions(SHARED_KEYS)
+        if self.leader:
+            self.publish(versions)
+        else:
+            self.follow(versions)
+        if self._versions is not None and versions.get('principals') != self._versions.get('principals'):
+            PRINCIPAL_CACHE.invalidate()
+        self._versions = versions
+        if TELEMETRY.generation != self._published.get('telemetry'):
+            self._published['telemetry'] = TELEMETRY.generation
+            SHARED_STATE.put(f'telemetry:{os.getpid()}', TELEMETRY.export())
+    def promote(self):
+        """Take over collection, continuing from the previous leader's state"""
+        print(f"Worker {os.getpid()} is collecting for the cluster")
+        aircraft, _, _ = SHARED_STATE.get('aircraft')
+        if aircraft:
+            ADSB.table.load(aircraft['table'])
+        topology, _, _ = SHARED_STATE.get('mesh')
+        if topology:
+            # Clients hold versions from the old leader's graph
+            MESH_TOPOLOGY.graph.load(topology['graph'])
+        assets, _, _ = SHARED_STATE.get('assets')
+        if assets:
+            MQTT.table.load(assets['table'])
+        self.leader = True
+        NODE_COLLECTOR.passive = False
+        NODE_COLLECTOR.start()
+        start_mqtt()
+    def publish(self, versions):
+        if versions.get('adsb-wanted'):
+            ADSB.start()
+        if versions.get('mesh-wanted'):
+            MESH_TOPOLOGY.start()
+        if NODE_COLLECTOR.generation != self._published.get('nodes'):
+            self._published['nodes'] = NODE_COLLECTOR.generation
+            SHARED_STATE.put('nodes', NODE_COLLECTOR.export())
+        if ADSB.last_success != self._published.get('aircraft'):
+            self._published['aircraft'] = ADSB.last_success
+            SHARED_STATE.put('aircraft', {'table': ADSB.table.export(),
+                                          'last_success': ADSB.last_success})
+        if MESH_TOPOLOGY.last_success != self._published.get('mesh'):
+            self._published['mesh'] = MESH_TOPOLOGY.last_success
+            SHARED_STATE.put('mesh', {'graph': MESH_TOPOLOGY.graph.export(),
+                                      'status': MESH_TOPOLOGY.status,
+                                      'last_success': MESH_TOPOLOGY.last_success})
+        if MQTT.table.seq != self._published.get('assets'):
+            self._published['assets'] = MQTT.table.seq
+            SHARED_STATE.put('assets', {'table': MQTT.table.export(), 'stats': MQTT.get_stats()})
+        if versions.get('bearings') != self._published.get('bearings'):
+            # Bearing reports may have been posted to any worker
+            self._published['bearings'] = versions.get('bearings')
+            TRIANGULATION.load({key.split(':', 1)[1]: entry for key, entry
+                                in SHARED_STATE.prefixed('bearings:').items()})
+        if DEMO_MODE:
+            demo_bearing_reports()
+        if triangulation.AVAILABLE:
+            TRIANGULATION.solve()
+        if TRIANGULATION.generation != self._published.get('triangulation'):
+            self._published['triangulation'] = TRIANGULATION.generation
+            SHARED_STATE.put('triangulation', TRIANGULATION.export())
+        if time.monotonic() - self._recovered > self.recover_interval:
+            # Jobs owned by workers that died are reported as interrupted
+            JOBS.recover()
+            self._recovered = time.monotonic()
+    def follow(self, versions):
+        previous = self._versions or {}
+        if versions.get('nodes') != previous.get('nodes'):
+            states, _, _ = SHARED_STATE.get('nodes')
+            if states:
+                NODE_COLLECTOR.load(states)
+        if versions.get('aircraft') != previous.get('aircraft'):
+            aircraft, _, _ = SHARED_STATE.get('aircraft')
+            if aircraft:
+                changed, removed = ADSB.table.load(aircraft['table'])
+                ADSB.last_success = aircraft['last_success']
+                if changed or removed:
+                    publish_aircraft(changed, removed)
+        if versions.get('mesh') != previous.get('mesh'):
+            topology, _, _ = SHARED_STATE.get('mesh')
+            if topology:
+                MESH_TOPOLOGY.graph.load(topology['graph'])
+                MESH_TOPOLOGY.status = topology['status']
+                MESH_TOPOLOGY.last_success = topology['last_success']
+        if versions.get('assets') != previous.get('assets'):
+            assets, _, _ = SHARED_STATE.get('assets')
+            if assets:
+                changed, removed = MQTT.table.load(assets['table'])
+                MQTT.connected = assets['stats']['connected']
+                if changed or removed:
+                    publish_assets(changed, removed)
+        if versions.get('triangulation') != previous.get('triangulation'):
+            solutions, _, _ = SHARED_STATE.get('triangulation')
+            if solutions:
+                TRIANGULATION.adopt(solutions)
+    def telemetry(self):
+        """Exported TELEMETRY of every live worker, this one freshly taken"""
+        exports = [TELEMETRY.export()]
+        for key, export in SHARED_STATE.prefixed('telemetry:').items():
+            pid = int(key.split(':', 1)[1])
+            if pid == os.getpid():
+                continue
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                # Worker exited; its series leave the totals
+                SHARED_STATE.delete(key)
+                continue
+            except PermissionError:
+                pass
+            exports.append(export)
+        return exports
+    def request_adsb(self):
+        """Start ADS-B ingest here, or ask the leader to"""
+        if not self.following:
+            ADSB.start()
+        elif not (self._versions or {}).get('adsb-wanted'):
+            SHARED_STATE.bump('adsb-wanted')
+    def request_mesh(self):
+        """Start mesh topology polling here, or ask the leader to"""
+        if not self.following:
+            MESH_TOPOLOGY.start()
+        elif not (self._versions or {}).get('mesh-wanted'):
+            SHARED_STATE.bump('mesh-wanted')
+COORDINATOR = WorkerCoordinator()
+def start_background():
+    """Start per-process background services; call once in each worker"""
+    COORDINATOR.start()
 ################################################################################
 # ERROR HANDLERS
 ################################################################################
@@ -803,8 +1985,12 @@ def server_error(e):
 # MAIN
 ################################################################################
 if __name__ == '__main__':
+    DB_POOL.ensure_indexes()
     if DEMO_MODE:
         seed_demo_users()
+    # With the debug reloader only the child process serves requests
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
 
     port = int(os.getenv('PORT', 5000))
     host = os.getenv('HOST', '127.0.0.1')
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+HTTP load and latency benchmark for the dashboard API
+
+Starts the dashboard as a separate process (development server or gunicorn)
+against either DEMO_MODE or stand-in nodes: the ssh/ping stubs in
+benchmarks/stubs and a local dump1090-style aircraft.json server, each with
+configurable artificial latency. Every endpoint is driven at each
+concurrency level by keep-alive clients; the report gives throughput,
+p50/p95/p99 latency and peak server RSS, and can be saved as a JSON
+baseline or checked against one.
+
+    python3 benchmarks/bench.py                       # demo mode, dev server
+    python3 benchmarks/bench.py --nodes stub --server gunicorn
+    python3 benchmarks/bench.py --save-baseline pi5-stub
+    python3 benchmarks/bench.py --baseline pi5-stub   # exit 1 on regression
+"""
+import argparse
+import http.client
+import http.server
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.dirname(BENCH_DIR)
+STUB_DIR = os.path.join(BENCH_DIR, 'stubs')
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+
+# name -> path; names key the baselines, so keep them stable
+ENDPOINTS = {
+    'cluster-status': '/api/cluster/status',
+    'nodes-list': '/api/nodes/list',
+    'node-health': '/api/nodes/isr/health',
+    'performance-summary': '/api/performance/summary',
+    'aircraft': '/api/nodes/isr/adsb/aircraft',
+    'aircraft-bbox': '/api/nodes/isr/adsb/aircraft?bbox=38.5,-77.5,39.5,-76.5&fields=callsign,altitude',
+    'tool-status': '/api/nodes/isr/tool-status',
+    'node-tools': '/api/nodes/isr/tools',
+    'node-summary': '/api/cluster/node-summary',
+    'footer': '/footer',
+}
+
+
+class StubADSBHandler(http.server.BaseHTTPRequestHandler):
+    """dump1090-style aircraft.json with slowly moving contacts"""
+
+    protocol_version = 'HTTP/1.1'
+    aircraft = 200
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        now = time.time()
+        rng = random.Random(1)
+        aircraft = []
+        for i in range(self.aircraft):
+            heading = rng.uniform(0, 2 * math.pi)
+            drift = (now % 3600) * 0.0002
+            aircraft.append({
+                'hex': f'{0xA00000 + i:06X}',
+                'flight': f'BNC{i:04d}',
+                'lat': 39.0 + rng.uniform(-2, 2) + drift * math.cos(heading),
+                'lon': -77.0 + rng.uniform(-2, 2) + drift * math.sin(heading),
+                'alt_baro': rng.randrange(1000, 40000, 100),
+                'gs': rng.randint(120, 480),
+                'track': round(math.degrees(heading) % 360, 1),
+                'seen': 0,
+            })
+        body = json.dumps({'now': now, 'aircraft': aircraft}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def process_tree_rss(pid):
+    """Resident set size in bytes of pid and all of its descendants"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class DashboardServer:
+    """The dashboard in a child process with an isolated data directory"""
+
+    def __init__(self, args):
+        self.args = args
+        self.port = free_port()
+        self.workdir = tempfile.mkdtemp(prefix='dashboard-bench-')
+        self.proc = None
+        self.adsb = None
+
+    def __enter__(self):
+        env = dict(os.environ)
+        shutil.copy(os.path.join(WEB_DIR, 'data', 'dashboard.db'), self.workdir)
+        env.update({
+            'HOST': '127.0.0.1',
+            'PORT': str(self.port),
+            'DEBUG': 'False',
+            'DEMO_MODE': 'True' if self.args.nodes == 'demo' else 'False',
+            'DASHBOARD_DB': os.path.join(self.workdir, 'dashboard.db'),
+            'METRICS_DB': os.path.join(self.workdir, 'metrics.db'),
+            'JOBS_DB': os.path.join(self.workdir, 'jobs.db'),
+            'SHARED_STATE_DB': os.path.join(self.workdir, 'state.db'),
+            'SSH_CONTROL_DIR': os.path.join(self.workdir, 'ssh'),
+        })
+        if self.args.nodes == 'stub':
+            StubADSBHandler.aircraft = self.args.aircraft
+            StubADSBHandler.latency = self.args.adsb_latency
+            self.adsb = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubADSBHandler)
+            threading.Thread(target=self.adsb.serve_forever, daemon=True).start()
+            env.update({
+                'PATH': STUB_DIR + os.pathsep + env.get('PATH', ''),
+                'BENCH_SSH_LATENCY': str(self.args.ssh_latency),
+                'BENCH_PING_LATENCY': str(self.args.ping_latency),
+                'ADSB_URL': f'http://127.0.0.1:{self.adsb.server_port}/data/aircraft.json',
+            })
+        if self.args.server == 'gunicorn':
+            env['WEB_WORKERS'] = str(self.args.workers)
+            command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application']
+        else:
+            command = [sys.executable, 'app.py']
+        self.log = open(os.path.join(self.workdir, 'server.log'), 'w')
+        self.proc = subprocess.Popen(command, cwd=WEB_DIR, env=env, stdout=self.log,
+                                     stderr=subprocess.STDOUT, start_new_session=True)
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f'server exited; see {self.log.name}')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                conn.request('GET', '/login')
+                conn.getresponse().read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError('server did not start in time')
+
+    def rss(self):
+        return process_tree_rss(self.proc.pid)
+
+    def __exit__(self, *exc):
+        if self.proc and self.proc.poll() is None:
+            os.killpg(self.proc.pid, signal.SIGTERM)
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+        if self.adsb:
+            self.adsb.shutdown()
+        self.log.close()
+        if not self.args.keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def login(port):
+    sys.path.insert(0, WEB_DIR)
+    from config.demo_seed import DEMO_USERS
+    user = DEMO_USERS[0]
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('POST', '/login',
+                  urllib.parse.urlencode({'username': user['username'], 'password': user['password']}),
+                  {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie')
+    if response.status != 302 or not cookie:
+        raise RuntimeError(f'login failed with HTTP {response.status}')
+    return cookie.split(';')[0]
+
+
+def drive(port, cookie, path, concurrency, duration):
+    """Run concurrency keep-alive clients against path for duration seconds"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    start_gate = threading.Barrier(concurrency + 1)
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine, failed = [], 0
+        start_gate.wait()
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            began = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={'Cookie': cookie})
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    mine.append(time.perf_counter() - began)
+                else:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    start_gate.wait()
+    began = time.perf_counter()
+    for t in threads:
+        t.join()
+    return sorted(latencies), errors[0], time.perf_counter() - began
+
+
+def run(args):
+    names = args.endpoints or list(ENDPOINTS)
+    results = []
+    with DashboardServer(args) as server:
+        cookie = login(server.port)
+        for name in names:
+            # Warm caches, collectors and pooled SSH sessions
+            drive(server.port, cookie, ENDPOINTS[name], 1, 0.2)
+        time.sleep(args.settle)
+        for name in names:
+            for concurrency in args.concurrency:
+                peak = [server.rss()]
+                done = threading.Event()
+
+                def sample():
+                    while not done.wait(0.2):
+                        peak[0] = max(peak[0], server.rss())
+
+                sampler = threading.Thread(target=sample, daemon=True)
+                sampler.start()
+                latencies, errors, elapsed = drive(server.port, cookie, ENDPOINTS[name],
+                                                   concurrency, args.duration)
+                done.set()
+                sampler.join()
+                ms = lambda v: round(v * 1000, 2) if v is not None else None
+                result = {
+                    'endpoint': name,
+                    'path': ENDPOINTS[name],
+                    'concurrency': concurrency,
+                    'requests': len(latencies),
+                    'errors': errors,
+                    'rps': round(len(latencies) / elapsed, 1),
+                    'p50_ms': ms(percentile(latencies, 50)),
+                    'p95_ms': ms(percentile(latencies, 95)),
+                    'p99_ms': ms(percentile(latencies, 99)),
+                    'max_ms': ms(latencies[-1] if latencies else None),
+                    'rss_mb': round(peak[0] / 1048576, 1),
+                }
+                results.append(result)
+                print(f"{name:<22} c={concurrency:<4} {result['rps']:>8} req/s  "
+                      f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  "
+                      f"p99 {result['p99_ms']} ms  err {errors}  rss {result['rss_mb']} MB",
+                      flush=True)
+    return results
+
+
+def metadata(args):
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=WEB_DIR,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': revision,
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'server': args.server,
+        'workers': args.workers if args.server == 'gunicorn' else 1,
+        'threads': int(os.getenv('WEB_THREADS', '8')) if args.server == 'gunicorn' else None,
+        'nodes': args.nodes,
+        'ssh_latency': args.ssh_latency,
+        'ping_latency': args.ping_latency,
+        'adsb_latency': args.adsb_latency,
+        'aircraft': args.aircraft,
+        'duration': args.duration,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of p95 latency or throughput beyond tolerance"""
+    previous = {(r['endpoint'], r['concurrency']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        base = previous.get((r['endpoint'], r['concurrency']))
+        if not base or r['p95_ms'] is None or base['p95_ms'] is None:
+            continue
+        # 1 ms of slack keeps sub-millisecond endpoints from flapping
+        if r['p95_ms'] > base['p95_ms'] * (1 + tolerance) + 1:
+            regressions.append(f"{r['endpoint']} c={r['concurrency']}: p95 "
+                               f"{base['p95_ms']} -> {r['p95_ms']} ms")
+        if r['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{r['endpoint']} c={r['concurrency']}: throughput "
+                               f"{base['rps']} -> {r['rps']} req/s")
+    return regressions
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, name + '.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--server', choices=('dev', 'gunicorn'), default='dev')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--nodes', choices=('demo', 'stub'), default='demo',
+                        help='DEMO_MODE data or stub ssh/ping/ADS-B stand-ins')
+    parser.add_argument('--ssh-latency', type=float, default=0.02, help='seconds per stub ssh call')
+    parser.add_argument('--ping-latency', type=float, default=0.005, help='seconds per stub ping')
+    parser.add_argument('--adsb-latency', type=float, default=0.01, help='seconds per aircraft.json')
+    parser.add_argument('--aircraft', type=int, default=200, help='contacts served by the stub feed')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=5, help='seconds per endpoint and level')
+    parser.add_argument('--settle', type=float, default=3,
+                        help='seconds to let collectors fill before measuring')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS))
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--save-baseline', metavar='NAME', help='store results as baselines/NAME.json')
+    parser.add_argument('--baseline', metavar='NAME', help='compare against baselines/NAME.json')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed fractional p95/throughput regression')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary data directory')
+    args = parser.parse_args()
+
+    report = {'meta': metadata(args), 'results': run(args)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save_baseline), 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline saved to {baseline_path(args.save_baseline)}')
+    if args.baseline:
+        with open(baseline_path(args.baseline)) as f:
+            baseline = json.load(f)
+        regressions = compare(report['results'], baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {args.baseline} (tolerance {args.tolerance:.0%})')
+
+
+if __name__ == '__main__':
+    main()
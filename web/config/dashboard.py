@@ -11,45 +11,6 @@ DASHBOARD_CONFIG = {
     "MISSION_PROFILE": "Low Visibility",
     "DATA_CLASSIFICATION": "Sensitive"
 }
-# Nodes
-NODES = {
-    'boot': {
-        'ip': '192.168.1.10',
-        'name': 'Boot',
-        'type': 'command',
-        'purpose': 'Centralized control and command of the cluster infrastructure.',
-        'tools': {
-            'services': ['NTP', 'NFS', 'DHCP', 'TFTP', 'flask' ],
-        }
-    },
-    'isr': {
-        'ip': '192.168.1.20',
-        'name': 'SigInt',
-        'type': 'isr',
-        'purpose': 'Airspace and RF spectrum monitoring using software defined radios.',
-        'tools': {
-            'services': ['dump1090', 'readsb', 'rtl-sdr', 'dump978', 'pyaware', 'fldigi', 'aprs'],
-        }
-    },
-    'mesh': {
-        'ip': '192.168.1.30',
-        'name': 'Mesh',
-        'type': 'mesh',
-        'purpose': 'Centralized support and coordinating for ad hoc 915mHz LoRa mesh networks.',
-        'tools': {
-            'services': ['Batman-adv', 'Reticulm', 'freeTAKserver', 'meshtastic', 'mosquito'],
-        }
-    },
-    'vhf': {
-        'ip': '192.168.1.40',
-        'name': 'RF',
-        'type': 'radio',
-        'purpose': 'HF/VHF/UHF voice and data communications via analog or digital RF transmitters with CAT Control.',
-        'tools': {
-            'services': ['gqrx', 'satscape', 'winlink', 'fldigi', 'js8', ''],
-        }
-    }
-}
 # Roles
 ROLES = {
     'admin': {
@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for the dashboard on a Raspberry Pi 5 (4 cores)
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Override with WEB_WORKERS / WEB_THREADS, HOST and PORT.
+"""
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8080')}"
+
+# One process per core; threads absorb I/O waits (SSH, SQLite) and the
+# long-lived /api/stream connections, each of which holds a thread
+workers = int(os.getenv('WEB_WORKERS', min(multiprocessing.cpu_count(), 4)))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', '8'))
+
+# Import the app once in the master; workers fork with its pages shared
+preload_app = True
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+accesslog = None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork(), so collectors start in each worker;
+    # only the elected leader actually probes the nodes
+    from wsgi import start_background
+    start_background()
@@ -0,0 +1,82 @@
+"""
+SQLite connection management for the dashboard database
+
+Connections are opened once, tuned (WAL journal, synchronous=NORMAL, busy
+timeout, statement cache) and then recycled through a small pool instead of
+being opened and closed for every query.
+"""
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+# Reverse-membership lookups; (user_id, group_id) / (user_id, team_id) are
+# already covered by the tables' UNIQUE constraints
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_user_groups_group ON user_groups (group_id, user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_teams_team ON user_teams (team_id, user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_sessions_user ON user_sessions (user_id)",
+)
+
+
+class ConnectionPool:
+    """LIFO pool of tuned sqlite3 connections to one database file"""
+
+    def __init__(self, path, size=8, busy_timeout=5000, cached_statements=128):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._pid = os.getpid()
+        self.stats = {'opened': 0, 'reused': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+        self.stats['opened'] += 1
+        return conn
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            # Forked worker: connections opened by the parent must not be
+            # used here, so start from an empty pool
+            self._idle = queue.LifoQueue(maxsize=self.size)
+            self._pid = os.getpid()
+        try:
+            conn = self._idle.get_nowait()
+            self.stats['reused'] += 1
+            return conn
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        if self._pid != os.getpid():
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def ensure_indexes(self):
+        with self.connection() as conn:
+            with conn:
+                for statement in INDEXES:
+                    conn.execute(statement)
@@ -3,12 +3,16 @@
 ################################################################################
 # Cluster Dashboard Launcher
 # Start the tactical operations web interface
+#
+# Usage: ./run.sh               Development server (demo mode, debug)
+#        ./run.sh production    Gunicorn, one worker per core, live data
 ################################################################################
 
 set -e
 
 SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
 VENV_DIR="$SCRIPT_DIR/venv"
+MODE="${1:-development}"
 
 # Colors
 GREEN='\033[0;32m'
@@ -45,16 +49,22 @@ fi
 
 # Export environment variables
 export FLASK_APP="$SCRIPT_DIR/app.py"
-export FLASK_ENV="${FLASK_ENV:-development}"
-export DEBUG="${DEBUG:-True}"
-export DEMO_MODE="${DEMO_MODE:-True}"
-export HOST="127.0.0.1"
 export PORT="${PORT:-8080}"
-export DEMO_MODE="${DEMO_MODE:-True}"
+if [ "$MODE" = "production" ]; then
+    export DEBUG="${DEBUG:-False}"
+    export DEMO_MODE="${DEMO_MODE:-False}"
+    export HOST="${HOST:-0.0.0.0}"
+else
+    export FLASK_ENV="${FLASK_ENV:-development}"
+    export DEBUG="${DEBUG:-True}"
+    export DEMO_MODE="${DEMO_MODE:-True}"
+    export HOST="127.0.0.1"
+fi
 
 # Show configuration
 echo ""
 echo -e "${GREEN}Configuration:${NC}"
+echo "  Mode: $MODE"
 echo "  Host: $HOST"
 echo "  Port: $PORT"
 echo "  Demo Mode: $DEMO_MODE"
@@ -73,6 +83,11 @@ if netstat -tuln 2>/dev/null | grep -q ":$PORT " || lsof -i ":$PORT" 2>/dev/null
     sleep 2
 fi
 
-# Start Flask
 cd "$SCRIPT_DIR"
+if [ "$MODE" = "production" ]; then
+    # Workers/threads sized in gunicorn.conf.py (WEB_WORKERS, WEB_THREADS)
+    exec "$VENV_DIR/bin/gunicorn" -c gunicorn.conf.py wsgi:application
+fi
+
+# Start Flask
 "$VENV_DIR/bin/python3" app.py
@@ -0,0 +1,326 @@
+"""
+ADS-B aircraft ingestion
+
+Polls dump1090/readsb's aircraft.json once per interval over a single
+keep-alive HTTP connection and maintains an aircraft table keyed by ICAO
+address. Every change is stamped with a sequence number so clients can ask
+for "everything since seq N" and receive only changed and expired contacts.
+"""
+import http.client
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from services.spatial import GridIndex
+
+
+def normalize_aircraft(raw, now):
+    """Map a dump1090/readsb record onto the dashboard's aircraft shape"""
+    icao = (raw.get('hex') or raw.get('icao') or '').strip().upper()
+    if not icao:
+        return None
+    altitude = raw.get('alt_baro', raw.get('altitude'))
+    if altitude == 'ground':
+        altitude = 0
+    return {
+        'icao': icao,
+        'callsign': (raw.get('flight') or raw.get('callsign') or '').strip(),
+        'latitude': raw.get('lat', raw.get('latitude')),
+        'longitude': raw.get('lon', raw.get('longitude')),
+        'altitude': altitude,
+        'speed': raw.get('gs', raw.get('speed')),
+        'heading': raw.get('track', raw.get('heading')),
+        'squawk': raw.get('squawk'),
+        'last_seen': round(now - float(raw.get('seen', 0)), 1),
+    }
+
+
+def _same_contact(a, b):
+    return all(a.get(k) == b.get(k) for k in a if k != 'last_seen')
+
+
+class AircraftTable:
+    """ICAO-indexed aircraft with change sequence numbers and expiry
+
+    The last `history` superseded versions of each contact are kept as
+    (from seq, until seq, record) so a filtered delta can tell whether a
+    contact was inside the client's filter at the client's seq.
+    """
+
+    def __init__(self, expiry=60, tombstone_ttl=300, history=32):
+        self.expiry = expiry
+        self.tombstone_ttl = tombstone_ttl
+        self.history = history
+        self._lock = threading.Lock()
+        self._aircraft = {}
+        self._changed_at = {}
+        self._removed = {}
+        self._versions = {}
+        # Seq each contact first appeared at; it was absent before that
+        self._first_seen = {}
+        self._seq = 0
+        # Oldest seq a delta can be computed from; earlier clients get a full reset
+        self._floor = 0
+        self.index = GridIndex()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def _supersede(self, icao, record, start, until):
+        """Remember record as icao's version from seq start until seq until"""
+        versions = self._versions.get(icao)
+        if versions is None:
+            versions = self._versions[icao] = deque(maxlen=self.history)
+        versions.append((start, until, record))
+
+    def _forget(self, icao):
+        self._versions.pop(icao, None)
+        self._first_seen.pop(icao, None)
+
+    def _record_at(self, icao, seq):
+        """(known, record) for icao as of seq; record is None if it was absent"""
+        if self._first_seen.get(icao, 0) > seq:
+            return True, None
+        for start, until, record in self._versions.get(icao, ()):
+            if start <= seq < until:
+                return True, record
+        return False, None
+
+    def update(self, records, now=None):
+        """Merge normalized records; returns (changed, removed_icaos)"""
+        now = now or time.time()
+        changed = {}
+        with self._lock:
+            for record in records:
+                icao = record['icao']
+                current = self._aircraft.get(icao)
+                if current is not None and _same_contact(current, record):
+                    # Only the last-seen time moved; refresh it without a new seq
+                    current['last_seen'] = record['last_seen']
+                    continue
+                self._seq += 1
+                if current is not None:
+                    self._supersede(icao, current, self._changed_at[icao], self._seq)
+                elif icao in self._removed:
+                    # Back after expiring; it was absent since its tombstone
+                    self._supersede(icao, None, self._removed[icao][0], self._seq)
+                else:
+                    self._first_seen[icao] = self._seq
+                self._aircraft[icao] = record
+                self._changed_at[icao] = self._seq
+                self._removed.pop(icao, None)
+                self.index.update(icao, record['latitude'], record['longitude'])
+                changed[icao] = record
+            removed = [icao for icao, ac in self._aircraft.items()
+                       if now - ac['last_seen'] > self.expiry]
+            for icao in removed:
+                self._seq += 1
+                self._supersede(icao, self._aircraft[icao], self._changed_at[icao], self._seq)
+                del self._aircraft[icao]
+                del self._changed_at[icao]
+                self.index.remove(icao)
+                self._removed[icao] = (self._seq, now)
+            for icao, (seq, at) in list(self._removed.items()):
+                if now - at > self.tombstone_ttl:
+                    del self._removed[icao]
+                    self._forget(icao)
+                    self._floor = max(self._floor, seq)
+        return changed, removed
+
+    def snapshot(self):
+        with self._lock:
+            return {'seq': self._seq, 'aircraft': list(self._aircraft.values())}
+
+    def export(self):
+        """Complete table state, including sequence numbers and tombstones"""
+        with self._lock:
+            return {
+                'seq': self._seq,
+                'floor': self._floor,
+                'aircraft': [[ac, self._changed_at[icao]] for icao, ac in self._aircraft.items()],
+                'removed': {icao: list(entry) for icao, entry in self._removed.items()},
+            }
+
+    def load(self, state):
+        """Replace the table with an exported state; returns (changed, removed_icaos)
+
+        Sequence numbers are kept as exported, so ?since= values handed out
+        by any process holding a copy of the table remain valid.
+        """
+        with self._lock:
+            # A lower seq means the exporter restarted; treat everything as new
+            previous = self._seq if state['seq'] >= self._seq else 0
+            if not previous:
+                self._versions, self._first_seen = {}, {}
+            aircraft = {ac['icao']: ac for ac, _ in state['aircraft']}
+            changed = {ac['icao']: ac for ac, seq in state['aircraft'] if seq > previous}
+            removed = [icao for icao in self._aircraft if icao not in aircraft]
+            if previous:
+                # What this copy held was current at least up to seq previous;
+                # versions the exporter went through in between are unknown
+                for icao in removed + [icao for icao in changed if icao in self._aircraft]:
+                    self._supersede(icao, self._aircraft[icao], self._changed_at[icao],
+                                    previous + 1)
+                for icao in changed:
+                    if icao not in self._aircraft and icao not in self._versions:
+                        self._first_seen[icao] = previous + 1
+            for icao in removed:
+                self.index.remove(icao)
+            for icao, ac in changed.items():
+                self.index.update(icao, ac['latitude'], ac['longitude'])
+            self._aircraft = aircraft
+            self._changed_at = {ac['icao']: seq for ac, seq in state['aircraft']}
+            self._removed = {icao: tuple(entry) for icao, entry in state['removed'].items()}
+            for icao in [i for i in self._versions if i not in aircraft and i not in self._removed]:
+                self._forget(icao)
+            self._seq = state['seq']
+            self._floor = state['floor']
+        return changed, removed
+
+    def since(self, seq):
+        """Changes after seq; falls back to a full snapshot if seq is too old"""
+        with self._lock:
+            if seq < self._floor or seq > self._seq:
+                return {'seq': self._seq, 'full': True,
+                        'aircraft': list(self._aircraft.values()), 'removed': []}
+            return {
+                'seq': self._seq,
+                'full': False,
+                'aircraft': [self._aircraft[icao] for icao, s in self._changed_at.items() if s > seq],
+                'removed': [icao for icao, (s, _) in self._removed.items() if s > seq],
+            }
+
+    def search(self, query, since=None):
+        """Filtered, paginated and projected view (see spatial.AircraftQuery)
+
+        With since, only contacts changed after that seq are considered.
+        Contacts that left the filter or expired are reported as removed
+        only if they were inside it at since (or that cannot be told), so a
+        client watching one sector is not sent ids from the whole sky.
+        """
+        with self._lock:
+            keys = query.candidates(self.index)
+            in_scope = lambda icao: ((keys is None or icao in keys)
+                                     and query.matches(self._aircraft[icao]))
+            if since is not None and self._floor <= since <= self._seq:
+                def was_in_scope(icao):
+                    known, record = self._record_at(icao, since)
+                    return not known or (record is not None and query.contains(record))
+                changed = [icao for icao, s in self._changed_at.items() if s > since]
+                matched = [icao for icao in changed if in_scope(icao)]
+                left = set(changed).difference(matched)
+                expired = [icao for icao, (s, _) in self._removed.items() if s > since]
+                return {
+                    'seq': self._seq,
+                    'full': False,
+                    'aircraft': [query.project(self._aircraft[icao]) for icao in matched],
+                    'removed': [icao for icao in [*left, *expired] if was_in_scope(icao)],
+                }
+            pool = self._aircraft if keys is None else keys
+            matched = sorted(icao for icao in pool if in_scope(icao))
+            end = None if query.limit is None else query.offset + query.limit
+            return {
+                'seq': self._seq,
+                'full': True,
+                'total': len(matched),
+                'offset': query.offset,
+                'limit': query.limit,
+                'aircraft': [query.project(self._aircraft[icao])
+                             for icao in matched[query.offset:end]],
+                'removed': [],
+            }
+
+    def __len__(self):
+        return len(self._aircraft)
+
+
+class ADSBIngestService:
+    """Background poller feeding an AircraftTable"""
+
+    def __init__(self, url, interval=1.0, expiry=60, timeout=3, source=None, on_update=None):
+        self.url = None
+        self.interval = interval
+        self.timeout = timeout
+        self.table = AircraftTable(expiry=expiry)
+        self.source = source or self.fetch
+        self.on_update = on_update
+        self.last_success = None
+        self.stats = {'polls': 0, 'errors': 0}
+        self._conn = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # Serialises polls; the HTTP connection is not shareable
+        self._poll_lock = threading.Lock()
+        self._target = None
+        self.set_url(url)
+
+    def set_url(self, url):
+        """Point the poller at a new aircraft.json URL (None: no feed configured)"""
+        with self._poll_lock:
+            if url == self.url and self._target is not None:
+                return
+            self.url = url
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if url:
+                parts = urlsplit(url)
+                self._target = (parts.hostname, parts.port or 80,
+                                parts.path + ('?' + parts.query if parts.query else ''))
+            else:
+                self._target = None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='adsb-ingest', daemon=True)
+            self._thread.start()
+
+    def fetch(self):
+        """GET aircraft.json on the persistent connection"""
+        if self._target is None:
+            raise IOError('no ADS-B feed configured')
+        host, port, path = self._target
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        try:
+            self._conn.request('GET', path, headers={'Connection': 'keep-alive'})
+            response = self._conn.getresponse()
+            body = response.read()
+            if response.status != 200:
+                raise IOError(f'HTTP {response.status} from {self.url}')
+            return json.loads(body)
+        except Exception:
+            # Drop the connection; the next poll opens a fresh one
+            self._conn.close()
+            self._conn = None
+            raise
+
+    def poll(self):
+        with self._poll_lock:
+            document = self.source()
+            now = document.get('now') or time.time()
+            records = [normalize_aircraft(ac, now) for ac in document.get('aircraft', [])]
+            changed, removed = self.table.update([r for r in records if r], now=now)
+            self.last_success = time.time()
+        if self.on_update and (changed or removed):
+            self.on_update(changed, removed)
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            self.stats['polls'] += 1
+            try:
+                self.poll()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print("ADS-B ingest error:", e)
+            time.sleep(max(self.interval - (time.monotonic() - started), 0.1))
+
+    def is_stale(self, max_age=None):
+        max_age = max_age or max(self.interval * 5, 10)
+        return self.last_success is None or time.time() - self.last_success > max_age
@@ -0,0 +1,44 @@
+"""
+Concurrent command broadcast across cluster nodes
+
+Fleet operations used to go through cluster-orchestrator.sh one node at a
+time. broadcast() runs the same per-node call on a set of nodes with a
+bounded number in flight, so a rolling operation takes about as long as the
+slowest node instead of the sum of all of them.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BEST_EFFORT = 'best-effort'
+FAIL_FAST = 'fail-fast'
+MODES = (BEST_EFFORT, FAIL_FAST)
+
+
+def broadcast(node_ids, run, concurrency=4, mode=BEST_EFFORT):
+    """Call run(node_id) -> result dict for every node, concurrency at a time
+
+    Each result gains a 'duration' in seconds. In fail-fast mode, nodes that
+    have not started when another node fails are reported as skipped;
+    commands already running are left to finish rather than being killed
+    mid-way (e.g. during apt-get). Returns (results by node id, aborted).
+    """
+    abort = threading.Event()
+
+    def task(node_id):
+        if abort.is_set():
+            return {'success': False, 'skipped': True, 'duration': 0.0}
+        start = time.monotonic()
+        try:
+            result = dict(run(node_id))
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        result['duration'] = round(time.monotonic() - start, 3)
+        if mode == FAIL_FAST and not result.get('success'):
+            abort.set()
+        return result
+
+    workers = max(1, min(concurrency, len(node_ids)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='broadcast') as pool:
+        results = dict(zip(node_ids, pool.map(task, node_ids)))
+    return results, abort.is_set()
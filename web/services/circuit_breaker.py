@@ -0,0 +1,145 @@
+"""
+Per-node circuit breakers
+
+A node that stops answering would otherwise cost every ping, health check
+and command its full timeout. After a run of consecutive failures the
+node's breaker opens and calls fail immediately; once the backoff delay
+has passed a single call is let through as a probe (half-open). Success
+closes the breaker, failure reopens it with the delay doubled up to a cap.
+"""
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of contacting a node whose breaker is open"""
+
+    def __init__(self, node_id, retry_in):
+        super().__init__(f'{node_id} is unreachable; retrying in {retry_in:.0f}s')
+        self.node_id = node_id
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with exponential backoff re-probing"""
+
+    def __init__(self, name, threshold=3, base_delay=5, max_delay=120):
+        self.name = name
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.delay = base_delay
+        self.retry_at = None
+        self.last_error = None
+        self.trips = 0
+        self._probing = False
+
+    def allow(self):
+        """True if a call may go ahead; in half-open state only one probe is let through"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() >= self.retry_at:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def blocking(self):
+        """True while open and not yet due for a probe; does not take the probe slot"""
+        with self._lock:
+            return self.state == OPEN and time.time() < self.retry_at
+
+    def retry_in(self):
+        with self._lock:
+            return max(self.retry_at - time.time(), 0) if self.retry_at else 0
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.delay = self.base_delay
+            self.retry_at = None
+            self._probing = False
+
+    def failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error else None
+            if self.state == HALF_OPEN:
+                # The probe failed; back off further
+                self.delay = min(self.delay * 2, self.max_delay)
+            elif self.state == OPEN or self.failures < self.threshold:
+                return
+            else:
+                self.delay = self.base_delay
+                self.trips += 1
+            self.state = OPEN
+            self.retry_at = time.time() + self.delay
+            self._probing = False
+
+    def adopt(self, state):
+        """Take over another process's view of the node (see to_dict)"""
+        with self._lock:
+            if state['state'] == CLOSED and self.state == CLOSED:
+                return
+            self.failures = state['failures']
+            self.delay = state['backoff']
+            self.last_error = state['last_error']
+            self._probing = False
+            if state['state'] == CLOSED:
+                self.state, self.retry_at = CLOSED, None
+            else:
+                # A half-open breaker elsewhere is due for a probe here too
+                self.state = OPEN
+                self.retry_at = state['retry_at'] or time.time()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'backoff': self.delay,
+                'retry_at': round(self.retry_at, 3) if self.retry_at else None,
+                'last_error': self.last_error,
+                'trips': self.trips,
+            }
+
+
+class BreakerBoard:
+    """One CircuitBreaker per node, created on first use"""
+
+    def __init__(self, threshold=3, base_delay=5, max_delay=120):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, node_id):
+        with self._lock:
+            breaker = self._breakers.get(node_id)
+            if breaker is None:
+                breaker = self._breakers[node_id] = CircuitBreaker(
+                    node_id, self.threshold, self.base_delay, self.max_delay)
+            return breaker
+
+    def check(self, node_id):
+        """Raise CircuitOpenError if node_id should not be contacted yet"""
+        breaker = self.get(node_id)
+        if breaker.blocking():
+            raise CircuitOpenError(node_id, breaker.retry_in())
+
+    def get_stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.to_dict() for b in breakers}
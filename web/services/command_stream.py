@@ -0,0 +1,67 @@
+"""
+Incremental command output
+
+CommandStream reads a spawned command's stdout chunk by chunk as the caller
+iterates, so nothing beyond the current chunk is held in memory. The pipe
+is only drained as fast as the consumer pulls; a slow HTTP client therefore
+stalls the remote command through the pipe/SSH flow control instead of
+letting output pile up in the dashboard. TailBuffer keeps a bounded copy of
+the newest output for callers that want a result rather than a stream.
+"""
+import threading
+
+
+class TailBuffer:
+    """Keeps only the newest max_bytes appended"""
+
+    def __init__(self, max_bytes=65536):
+        self.max_bytes = max_bytes
+        self._data = bytearray()
+        self.dropped = 0
+
+    def append(self, chunk):
+        self._data += chunk
+        overflow = len(self._data) - self.max_bytes
+        if overflow > 0:
+            del self._data[:overflow]
+            self.dropped += overflow
+
+    def text(self):
+        return self._data.decode(errors='replace')
+
+
+class CommandStream:
+    """Iterable of output chunks from spawn, a context manager yielding a Popen
+
+    After iteration finishes, returncode, bytes_read and timed_out describe
+    the run. Closing the iterator early (client went away) kills the command.
+    """
+
+    def __init__(self, spawn, timeout=None, chunk_size=4096):
+        self.spawn = spawn
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.returncode = None
+        self.bytes_read = 0
+        self.timed_out = False
+
+    def __iter__(self):
+        with self.spawn as proc:
+            timer = None
+            if self.timeout:
+                def expire():
+                    self.timed_out = True
+                    proc.kill()
+                timer = threading.Timer(self.timeout, expire)
+                timer.daemon = True
+                timer.start()
+            try:
+                # read1 returns whatever is available instead of waiting
+                # for a full chunk, so output is passed on as it is written
+                for chunk in iter(lambda: proc.stdout.read1(self.chunk_size), b''):
+                    self.bytes_read += len(chunk)
+                    yield chunk
+                self.returncode = proc.wait()
+            finally:
+                if timer:
+                    timer.cancel()
@@ -0,0 +1,85 @@
+"""
+Server-side fragment cache
+
+A template is rendered once with placeholder markers standing in for its
+per-request fields and split into static segments. Later requests only
+join the segments with the escaped dynamic values, skipping Jinja entirely.
+Compiled fragments are keyed by the caller (template plus whatever the
+static part depends on, e.g. the current user principal).
+"""
+import hashlib
+import json
+import re
+import threading
+
+from markupsafe import escape
+
+MARKER = '@@FRAGMENT:{}@@'
+MARKER_RE = re.compile(r'@@FRAGMENT:(\w+)@@')
+
+
+class Fragment:
+    """Pre-rendered template split around its dynamic fields"""
+
+    __slots__ = ('segments', 'names', 'digest')
+
+    def __init__(self, html):
+        parts = MARKER_RE.split(html)
+        self.segments = parts[0::2]
+        self.names = parts[1::2]
+        # Identifies the static part; combine with dynamic values for ETags
+        self.digest = hashlib.sha1(html.encode()).hexdigest()[:16]
+
+    def fill(self, values):
+        out = [self.segments[0]]
+        for name, segment in zip(self.names, self.segments[1:]):
+            out.append(str(escape(values[name])))
+            out.append(segment)
+        return ''.join(out)
+
+
+def fingerprint(*parts):
+    """Short stable hash of JSON-serialisable parts, for keys and ETags"""
+    blob = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+class FragmentCache:
+    """Compiled fragments keyed by (name, variant)"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._fragments = {}
+        self.version = 0
+        self.stats = {'hits': 0, 'compiles': 0}
+
+    def get(self, name, variant, render, dynamic=()):
+        """Return the Fragment for (name, variant), compiling it on a miss
+
+        render(**placeholders) must produce the template's HTML; each name
+        in dynamic is passed a marker that Fragment.fill() later replaces.
+        """
+        key = (name, variant)
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self.stats['hits'] += 1
+                return fragment
+        fragment = Fragment(render(**{field: MARKER.format(field) for field in dynamic}))
+        with self._lock:
+            if len(self._fragments) >= self.maxsize:
+                self._fragments.clear()
+            self._fragments[key] = fragment
+            self.stats['compiles'] += 1
+        return fragment
+
+    def invalidate(self):
+        """Drop everything, e.g. after NODES or template changes"""
+        with self._lock:
+            self._fragments.clear()
+            self.version += 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._fragments), version=self.version)
@@ -0,0 +1,204 @@
+"""
+In-process request and subsystem instrumentation
+
+Counters, gauges and fixed-bucket latency histograms cheap enough to update
+on every request (a bisect and a dict lookup under a per-metric lock), and
+rendered in the Prometheus text exposition format. Registries can be
+exported as plain JSON and merged, so the workers of a multi-process server
+can report one combined set of series.
+"""
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Seconds; spans a cached JSON response up to a slow SSH round trip
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Metric:
+    """A named family of series, one per tuple of label values"""
+
+    kind = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def export(self):
+        with self._lock:
+            samples = [[list(labels), value] for labels, value in self._series.items()]
+        return {'type': self.kind, 'help': self.help,
+                'labels': list(self.labelnames), 'samples': samples}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+        self.registry.generation += 1
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Per-bucket counts plus sum and count for each series"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # Index len(buckets) is the +Inf bucket; the last two slots hold sum and count
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+        self.registry.generation += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def export(self):
+        with self._lock:
+            samples = [[list(labels), list(value)] for labels, value in self._series.items()]
+        return {'type': self.kind, 'help': self.help, 'labels': list(self.labelnames),
+                'buckets': list(self.buckets), 'samples': samples}
+
+
+class _Timer:
+    """Context manager observing its elapsed time into a histogram"""
+
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+def timed(histogram, *labels):
+    """Decorator observing each call's duration into histogram"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+        return wrapper
+    return decorator
+
+
+class Registry:
+    """The metric families of one process"""
+
+    def __init__(self):
+        self._metrics = {}
+        # Bumped on every update; lets exporters skip publishing an idle registry
+        self.generation = 0
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'metric {metric.name} already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(self, name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, help, labelnames, buckets))
+
+    def export(self):
+        """JSON-serialisable snapshot of every family"""
+        return {name: metric.export() for name, metric in self._metrics.items()}
+
+
+def merge(exports):
+    """Sum several exported registries series by series"""
+    merged = {}
+    for export in exports:
+        for name, family in export.items():
+            target = merged.setdefault(name, dict(family, samples={}))
+            if target['type'] != family['type'] or target.get('buckets') != family.get('buckets'):
+                continue
+            for labels, value in family['samples']:
+                key = tuple(labels)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['samples'][key] = current + value
+    for family in merged.values():
+        family['samples'] = [[list(k), v] for k, v in family['samples'].items()]
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def render(export):
+    """Prometheus text exposition (version 0.0.4) of an exported registry"""
+    lines = []
+    for name, family in sorted(export.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family['labels']
+        for labels, value in sorted(family['samples']):
+            if family['type'] != 'histogram':
+                lines.append(f'{name}{_labels(names, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            bounds = [_number(float(b)) for b in family['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                le = _labels(names, labels, 'le="%s"' % bound)
+                lines.append(f'{name}_bucket{le} {cumulative}')
+            lines.append(f'{name}_sum{_labels(names, labels)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_labels(names, labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
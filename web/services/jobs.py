@@ -0,0 +1,389 @@
+"""
+Background job engine for long-running cluster operations
+
+Deploys, updates, reboots, backups and health checks can run for minutes,
+far longer than a request should hold a worker. A job is queued and its id
+returned immediately; a small worker pool runs the command and copies its
+merged stdout/stderr into a bounded log buffer as it arrives, so clients can
+follow progress by offset. Job state and the retained log are persisted to
+SQLite; jobs whose owning process has exited (dashboard restarted, worker
+died) are marked interrupted.
+
+While a job runs only the output produced since the last flush is written,
+as a row in job_chunks, so SD-card writes follow the output rate rather
+than the retained log size. The log is written into the job's row once,
+when it finishes, and its chunks are deleted.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from services.command_stream import CommandStream
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+INTERRUPTED = 'interrupted'
+FINISHED = (SUCCEEDED, FAILED, INTERRUPTED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    node TEXT NOT NULL,
+    command TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    exit_code INTEGER,
+    error TEXT,
+    log BLOB NOT NULL DEFAULT x'',
+    log_start INTEGER NOT NULL DEFAULT 0,
+    owner TEXT
+)
+"""
+
+CHUNK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (job_id, offset)
+)
+"""
+
+COLUMNS = 'id, kind, node, command, state, created, started, finished, exit_code, error'
+
+INSERT = """
+INSERT INTO jobs (id, kind, node, command, state, created, owner)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE = """
+UPDATE jobs SET state = ?, started = ?, finished = ?, exit_code = ?, error = ?
+WHERE id = ?
+"""
+
+# End of a job's output: its pending chunks if it has any, else the saved log
+LOG_END = """
+COALESCE((SELECT MAX(c.offset + length(c.data)) FROM job_chunks c WHERE c.job_id = jobs.id),
+         log_start + length(log))
+"""
+
+
+def _boot_id():
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+BOOT_ID = _boot_id()
+
+
+def process_owner():
+    """'<boot id>/<pid>' identifying this process across reboots"""
+    return f'{BOOT_ID}/{os.getpid()}'
+
+
+def owner_alive(owner):
+    boot, _, pid = (owner or '').rpartition('/')
+    if not pid.isdigit() or boot != BOOT_ID:
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class LogBuffer:
+    """Append-only byte log that keeps only its newest max_bytes
+
+    Offsets are absolute (bytes since the job started), so a reader that
+    fell behind the retained window is told it was truncated instead of
+    silently skipping output.
+    """
+
+    def __init__(self, max_bytes=262144, data=b'', start=0):
+        self.max_bytes = max_bytes
+        self._data = bytearray(data)
+        self.start = start
+        self._lock = threading.Lock()
+
+    @property
+    def end(self):
+        return self.start + len(self._data)
+
+    def append(self, chunk):
+        with self._lock:
+            self._data += chunk
+            overflow = len(self._data) - self.max_bytes
+            if overflow > 0:
+                del self._data[:overflow]
+                self.start += overflow
+
+    def read(self, offset=0, limit=65536):
+        """(data, start offset of data, truncated) for bytes from offset on"""
+        with self._lock:
+            truncated = offset < self.start
+            begin = max(offset, self.start) - self.start
+            return bytes(self._data[begin:begin + limit]), self.start + begin, truncated
+
+    def dump(self):
+        with self._lock:
+            return bytes(self._data), self.start
+
+
+class Job:
+    """One queued/running/finished operation"""
+
+    def __init__(self, job_id, kind, node, command, state=QUEUED, created=None,
+                 started=None, finished=None, exit_code=None, error=None, log=None,
+                 log_size=0):
+        self.id = job_id
+        self.kind = kind
+        self.node = node
+        self.command = command
+        self.state = state
+        self.created = created or time.time()
+        self.started = started
+        self.finished = finished
+        self.exit_code = exit_code
+        self.error = error
+        self.log = log
+        self.log_size = log_size
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'node': self.node,
+            'state': self.state,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'duration': round((self.finished or time.time()) - self.started, 3) if self.started else None,
+            'exit_code': self.exit_code,
+            'error': self.error,
+            'log_size': self.log.end if self.log else self.log_size,
+        }
+
+
+class JobManager:
+    """Runs jobs on a worker pool and persists them to SQLite
+
+    spawn(node, command) must be a context manager yielding a Popen whose
+    stdout carries the command's merged output. on_finish(node, stream,
+    error), if given, is called after every run with the finished
+    CommandStream or the exception that ended it.
+    """
+
+    def __init__(self, path, spawn, workers=2, log_limit=262144, timeout=3600,
+                 flush_interval=2, keep=200, on_finish=None):
+        self.spawn = spawn
+        self.on_finish = on_finish
+        self.log_limit = log_limit
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.keep = keep
+        self.path = path
+        self._lock = threading.Lock()
+        self._live = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._db = None
+        self._db_pid = None
+        self.recover()
+
+    @property
+    def _conn(self):
+        # Connections must not cross fork(); reopen in each worker process
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.execute(SCHEMA)
+            self._db.execute(CHUNK_SCHEMA)
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]
+            if 'owner' not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def recover(self):
+        """Mark jobs whose owning process is gone as interrupted
+
+        Jobs run in the worker process that accepted them; with several
+        workers only the ones owned by dead processes are stale.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+            dead = [(job_id,) for job_id, owner in rows if not owner_alive(owner)]
+            if dead:
+                self._conn.executemany(
+                    "UPDATE jobs SET state = ?, finished = ?, error = 'dashboard restarted' "
+                    "WHERE id = ?",
+                    [(INTERRUPTED, time.time(), job_id) for (job_id,) in dead]
+                )
+                self._conn.commit()
+        return len(dead)
+
+    def submit(self, kind, node, command):
+        """Queue a job and return its initial state"""
+        job = Job(uuid.uuid4().hex[:12], kind, node, command,
+                  log=LogBuffer(self.log_limit))
+        with self._lock:
+            self._live[job.id] = job
+            self._conn.execute(INSERT, (job.id, job.kind, job.node, job.command, job.state,
+                                        job.created, process_owner()))
+            self._conn.commit()
+        self._executor.submit(self._run, job)
+        return job.to_dict()
+
+    def _run(self, job):
+        job.state = RUNNING
+        job.started = time.time()
+        self._save(job)
+        stream = error = None
+        # Absolute offset up to which output is already in job_chunks
+        flushed = 0
+        try:
+            stream = CommandStream(self.spawn(job.node, job.command), timeout=self.timeout)
+            last_flush = time.monotonic()
+            for chunk in stream:
+                job.log.append(chunk)
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    flushed = self._flush(job, flushed)
+                    last_flush = time.monotonic()
+            job.exit_code = stream.returncode
+            if stream.timed_out:
+                job.state, job.error = FAILED, f'timed out after {self.timeout:g}s'
+            else:
+                job.state = SUCCEEDED if job.exit_code == 0 else FAILED
+        except Exception as e:
+            job.state, job.error = FAILED, str(e)
+            error = e
+        job.finished = time.time()
+        self._finish(job)
+        with self._lock:
+            self._live.pop(job.id, None)
+        if self.on_finish:
+            try:
+                self.on_finish(job.node, stream, error)
+            except Exception as e:
+                print(f"Job {job.id} finish callback failed:", e)
+        self._prune()
+
+    def _save(self, job):
+        with self._lock:
+            self._conn.execute(UPDATE, (job.state, job.started, job.finished, job.exit_code,
+                                        job.error, job.id))
+            self._conn.commit()
+
+    def _flush(self, job, flushed):
+        """Append output after offset flushed to job_chunks; returns the new offset"""
+        data, start, _ = job.log.read(flushed, self.log_limit)
+        if not data:
+            return flushed
+        with self._lock:
+            self._conn.execute("INSERT INTO job_chunks (job_id, offset, data) VALUES (?, ?, ?)",
+                               (job.id, start, data))
+            # Chunks that have wholly scrolled out of the retained window
+            self._conn.execute("DELETE FROM job_chunks WHERE job_id = ? AND offset + length(data) <= ?",
+                               (job.id, job.log.start))
+            self._conn.commit()
+        return start + len(data)
+
+    def _finish(self, job):
+        """Write the final state and retained log in one transaction"""
+        log, log_start = job.log.dump()
+        with self._lock:
+            self._conn.execute(UPDATE, (job.state, job.started, job.finished, job.exit_code,
+                                        job.error, job.id))
+            self._conn.execute("UPDATE jobs SET log = ?, log_start = ? WHERE id = ?",
+                               (log, log_start, job.id))
+            self._conn.execute("DELETE FROM job_chunks WHERE job_id = ?", (job.id,))
+            self._conn.commit()
+
+    def _prune(self):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE id NOT IN "
+                "(SELECT id FROM jobs ORDER BY created DESC LIMIT ?)",
+                (self.keep,)
+            )
+            # Chunks of pruned jobs and of interrupted runs no longer listed
+            self._conn.execute("DELETE FROM job_chunks WHERE job_id NOT IN (SELECT id FROM jobs)")
+            self._conn.commit()
+
+    def _load(self, job_id, with_log=False):
+        log_columns = 'log, log_start' if with_log else f"x'', {LOG_END}"
+        with self._lock:
+            job = self._live.get(job_id)
+            if job is not None:
+                return job
+            row = self._conn.execute(
+                f"SELECT {COLUMNS}, {log_columns} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            chunks = self._conn.execute(
+                "SELECT offset, data FROM job_chunks WHERE job_id = ? ORDER BY offset", (job_id,)
+            ).fetchall() if row is not None and with_log else []
+        if row is None:
+            return None
+        if with_log:
+            log, log_start = row[10], row[11]
+            if chunks:
+                # Running in another worker, or interrupted before it finished
+                log, log_start = b''.join(data for _, data in chunks), chunks[0][0]
+                overflow = len(log) - self.log_limit
+                if overflow > 0:
+                    log, log_start = log[overflow:], log_start + overflow
+            return Job(*row[:10], log=LogBuffer(self.log_limit, log, log_start))
+        return Job(*row[:10], log_size=row[11])
+
+    def get(self, job_id):
+        job = self._load(job_id)
+        return job.to_dict() if job else None
+
+    def read_log(self, job_id, offset=0, limit=65536):
+        """Log bytes from offset on, with the offset to resume from"""
+        job = self._load(job_id, with_log=True)
+        if job is None:
+            return None
+        data, start, truncated = job.log.read(offset, limit)
+        return {
+            'job_id': job.id,
+            'state': job.state,
+            'offset': start,
+            'next_offset': start + len(data),
+            'truncated': truncated,
+            'complete': job.state in FINISHED and start + len(data) >= job.log.end,
+            'data': data.decode(errors='replace'),
+        }
+
+    def list(self, limit=50):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {COLUMNS}, {LOG_END} FROM jobs ORDER BY created DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+            live = dict(self._live)
+        return [(live.get(row[0]) or Job(*row[:10], log_size=row[10])).to_dict() for row in rows]
+
+    def get_stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            counts['active'] = len(self._live)
+            return counts
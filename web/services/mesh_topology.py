@@ -0,0 +1,338 @@
+"""
+Mesh network topology
+
+Builds one graph of the mesh node's networks from batman-adv's originator
+table (`batctl o`) and meshtastic's node database (`meshtastic --info`).
+Each refresh is diffed against the current graph; only nodes and links that
+really changed (link quality moving by less than a step is ignored) get a
+new version number, so clients can ask for "everything since version N"
+and receive a small delta instead of the whole topology.
+"""
+import json
+import re
+import threading
+import time
+
+# Link quality changes smaller than this are jitter, not news
+QUALITY_STEP = 0.03
+# BATMAN_V reports throughput; this rate (Mbit/s) counts as a perfect link
+BATMAN_V_FULL_MBPS = 100.0
+# Meshtastic SNR (dB) mapped linearly onto link quality 0..1
+SNR_FLOOR, SNR_CEILING = -20.0, 10.0
+
+_BATMAN_HEADER = re.compile(r'MainIF/MAC:\s*\S+?/([0-9a-f:]{17})(?:.*?(BATMAN_V|BATMAN_IV))?', re.I)
+_BATMAN_ROW = re.compile(
+    r'^\s*(\*)?\s*([0-9a-f:]{17})\s+([\d.]+)s\s+\(\s*([\d.]+)\)\s+([0-9a-f:]{17})\s+\[\s*([^\]\s]+)\s*\]',
+    re.I)
+
+
+def edge_id(a, b):
+    return '|'.join(sorted((a, b)))
+
+
+def parse_batman_originators(text, now=None):
+    """(nodes, edges) from `batctl o` output (B.A.T.M.A.N. IV or V)
+
+    Direct neighbours (originator == next hop) become links from this node;
+    farther originators become nodes carrying their best next hop.
+    """
+    now = now or time.time()
+    header = _BATMAN_HEADER.search(text)
+    if not header:
+        raise ValueError('not batctl originator output')
+    own = 'bat:' + header.group(1).lower()
+    throughput = (header.group(2) or '').upper() == 'BATMAN_V'
+    nodes = {own: {'id': own, 'kind': 'batman', 'name': header.group(1).lower(),
+                   'local': True, 'last_seen': round(now, 1)}}
+    edges = {}
+    for line in text.splitlines():
+        match = _BATMAN_ROW.match(line)
+        if not match:
+            continue
+        best, originator, seen, metric, nexthop, interface = match.groups()
+        originator, nexthop, metric = originator.lower(), nexthop.lower(), float(metric)
+        quality = min(metric / BATMAN_V_FULL_MBPS, 1.0) if throughput else metric / 255.0
+        node_id = 'bat:' + originator
+        node = nodes.setdefault(node_id, {'id': node_id, 'kind': 'batman', 'name': originator,
+                                          'last_seen': round(now - float(seen), 1)})
+        if best:
+            node['next_hop'] = 'bat:' + nexthop
+            node['route_quality'] = round(quality, 3)
+            node['interface'] = interface
+        if originator == nexthop:
+            key = edge_id(own, node_id)
+            edges[key] = {'id': key, 'source': own, 'target': node_id, 'kind': 'batman',
+                          'quality': round(quality, 3), 'metric': metric, 'interface': interface}
+    return nodes, edges
+
+
+def _snr_quality(snr):
+    return round(min(max((snr - SNR_FLOOR) / (SNR_CEILING - SNR_FLOOR), 0.0), 1.0), 3)
+
+
+def _json_after(text, label):
+    start = text.find(label)
+    if start < 0:
+        return None
+    start = text.index('{', start)
+    return json.JSONDecoder().raw_decode(text, start)[0]
+
+
+def parse_meshtastic_info(text):
+    """(nodes, edges) from `meshtastic --info` output or a JSON node database
+
+    Nodes heard directly (hopsAway 0) are linked to the local radio with a
+    quality derived from their SNR.
+    """
+    stripped = text.lstrip()
+    if stripped.startswith('{'):
+        document = json.loads(stripped)
+        database = document.get('nodes', document)
+        my_num = document.get('myNodeNum')
+    else:
+        database = _json_after(text, 'Nodes in mesh:')
+        if database is None:
+            raise ValueError('no "Nodes in mesh" section in meshtastic output')
+        my_info = _json_after(text, 'My info:') or {}
+        my_num = my_info.get('myNodeNum')
+    nodes, edges, own = {}, {}, None
+    for key, entry in database.items():
+        if not isinstance(entry, dict):
+            continue
+        user = entry.get('user') or {}
+        node_id = 'mt:' + (user.get('id') or key)
+        position = entry.get('position') or {}
+        metrics = entry.get('deviceMetrics') or {}
+        node = {
+            'id': node_id,
+            'kind': 'meshtastic',
+            'name': user.get('longName') or user.get('id') or key,
+            'short_name': user.get('shortName'),
+            'hardware': user.get('hwModel'),
+            'role': user.get('role', 'CLIENT'),
+            'latitude': position.get('latitude'),
+            'longitude': position.get('longitude'),
+            'altitude': position.get('altitude'),
+            'battery': metrics.get('batteryLevel'),
+            'snr': entry.get('snr'),
+            'hops': entry.get('hopsAway'),
+            'last_seen': entry.get('lastHeard'),
+        }
+        if my_num is not None and entry.get('num') == my_num:
+            node['local'] = True
+            own = node_id
+        nodes[node_id] = node
+    if own:
+        for node_id, node in nodes.items():
+            if node_id != own and node['hops'] == 0 and node['snr'] is not None:
+                key = edge_id(own, node_id)
+                edges[key] = {'id': key, 'source': own, 'target': node_id, 'kind': 'lora',
+                              'quality': _snr_quality(node['snr']), 'metric': node['snr']}
+    return nodes, edges
+
+
+def _same(a, b):
+    """Equal apart from last-seen times and sub-step quality jitter"""
+    for key in a.keys() | b.keys():
+        if key == 'last_seen':
+            continue
+        x, y = a.get(key), b.get(key)
+        if key in ('quality', 'route_quality') and x is not None and y is not None:
+            if abs(x - y) >= QUALITY_STEP:
+                return False
+        elif key in ('metric', 'snr'):
+            # Raw values follow quality; they alone do not make a change
+            continue
+        elif x != y:
+            return False
+    return True
+
+
+class TopologyGraph:
+    """Nodes and links per source with change versions and tombstones
+
+    Each source (batman, meshtastic) replaces its own part of the graph on
+    update; items it no longer reports are removed.
+    """
+
+    def __init__(self, tombstone_ttl=900):
+        self.tombstone_ttl = tombstone_ttl
+        self._lock = threading.Lock()
+        self._items = {'nodes': {}, 'edges': {}}
+        self._owner = {}
+        self._changed_at = {}
+        self._removed = {}
+        self._adjacency = {}
+        self._version = 0
+        # Oldest version a delta can be computed from
+        self._floor = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def _link(self, edge, add):
+        for a, b in ((edge['source'], edge['target']), (edge['target'], edge['source'])):
+            neighbours = self._adjacency.setdefault(a, set())
+            if add:
+                neighbours.add(b)
+            else:
+                neighbours.discard(b)
+                if not neighbours:
+                    del self._adjacency[a]
+
+    def update(self, source, nodes, edges, now=None):
+        """Replace source's nodes and edges; returns the number of changed items"""
+        now = now or time.time()
+        changes = 0
+        with self._lock:
+            for kind, incoming in (('nodes', nodes), ('edges', edges)):
+                current = self._items[kind]
+                for key, item in incoming.items():
+                    previous = current.get(key)
+                    if previous is not None and _same(previous, item):
+                        # Keep the announced values so slow drift still adds up
+                        # to a change; only the last-seen time moves silently
+                        if 'last_seen' in item:
+                            previous['last_seen'] = item['last_seen']
+                        continue
+                    self._version += 1
+                    changes += 1
+                    if kind == 'edges' and previous is not None:
+                        self._link(previous, False)
+                    current[key] = item
+                    if kind == 'edges':
+                        self._link(item, True)
+                    self._owner[(kind, key)] = source
+                    self._changed_at[(kind, key)] = self._version
+                    self._removed.pop((kind, key), None)
+                gone = [key for key in current
+                        if self._owner.get((kind, key)) == source and key not in incoming]
+                for key in gone:
+                    self._version += 1
+                    changes += 1
+                    if kind == 'edges':
+                        self._link(current[key], False)
+                    del current[key]
+                    del self._owner[(kind, key)]
+                    del self._changed_at[(kind, key)]
+                    self._removed[(kind, key)] = (self._version, now)
+            for entry, (version, at) in list(self._removed.items()):
+                if now - at > self.tombstone_ttl:
+                    del self._removed[entry]
+                    self._floor = max(self._floor, version)
+        return changes
+
+    def since(self, version=None):
+        """Full graph, or the changes after version if it is recent enough"""
+        with self._lock:
+            if version is None or version < self._floor or version > self._version:
+                return {
+                    'version': self._version, 'full': True,
+                    'nodes': list(self._items['nodes'].values()),
+                    'edges': list(self._items['edges'].values()),
+                    'removed_nodes': [], 'removed_edges': [],
+                }
+            changed = {'nodes': [], 'edges': []}
+            for (kind, key), v in self._changed_at.items():
+                if v > version:
+                    changed[kind].append(self._items[kind][key])
+            removed = {'nodes': [], 'edges': []}
+            for (kind, key), (v, _) in self._removed.items():
+                if v > version:
+                    removed[kind].append(key)
+            return {
+                'version': self._version, 'full': False,
+                'nodes': changed['nodes'], 'edges': changed['edges'],
+                'removed_nodes': removed['nodes'], 'removed_edges': removed['edges'],
+            }
+
+    def neighbours(self, node_id):
+        with self._lock:
+            return sorted(self._adjacency.get(node_id, ()))
+
+    def export(self):
+        """Complete state including versions and tombstones"""
+        with self._lock:
+            return {
+                'version': self._version,
+                'floor': self._floor,
+                'items': [[kind, key, item, self._owner[(kind, key)], self._changed_at[(kind, key)]]
+                          for kind in ('nodes', 'edges') for key, item in self._items[kind].items()],
+                'removed': [[kind, key, v, at] for (kind, key), (v, at) in self._removed.items()],
+            }
+
+    def load(self, state):
+        """Replace the graph with an exported state, keeping its versions"""
+        with self._lock:
+            self._items = {'nodes': {}, 'edges': {}}
+            self._owner, self._changed_at, self._adjacency = {}, {}, {}
+            for kind, key, item, owner, version in state['items']:
+                self._items[kind][key] = item
+                self._owner[(kind, key)] = owner
+                self._changed_at[(kind, key)] = version
+                if kind == 'edges':
+                    self._link(item, True)
+            self._removed = {(kind, key): (v, at) for kind, key, v, at in state['removed']}
+            self._version = state['version']
+            self._floor = state['floor']
+
+    def get_stats(self):
+        with self._lock:
+            return {'version': self._version, 'nodes': len(self._items['nodes']),
+                    'edges': len(self._items['edges']), 'tombstones': len(self._removed)}
+
+
+class MeshTopologyService:
+    """Background poller feeding a TopologyGraph from several sources
+
+    sources maps a source name to a callable returning (nodes, edges). A
+    failing source keeps its last good contribution to the graph.
+    """
+
+    def __init__(self, sources, interval=15):
+        self.sources = sources
+        self.interval = interval
+        self.graph = TopologyGraph()
+        self.status = {name: {'ok': None, 'updated': None, 'error': None} for name in sources}
+        self.last_success = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='mesh-topology', daemon=True)
+            self._thread.start()
+
+    def poll(self):
+        """Refresh every source once; returns the number of changed items"""
+        changes = 0
+        with self._poll_lock:
+            for name, fetch in self.sources.items():
+                try:
+                    nodes, edges = fetch()
+                except Exception as e:
+                    print(f"Mesh topology source {name} failed:", e)
+                    self.status[name] = dict(self.status[name], ok=False, error=str(e))
+                    continue
+                changes += self.graph.update(name, nodes, edges)
+                self.status[name] = {'ok': True, 'updated': time.time(), 'error': None}
+                self.last_success = time.time()
+        return changes
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            self.poll()
+            time.sleep(max(self.interval - (time.monotonic() - started), 1))
+
+    def is_stale(self, max_age=None):
+        max_age = max_age or self.interval * 3
+        return self.last_success is None or time.time() - self.last_success > max_age
+
+    def get_stats(self):
+        return dict(self.graph.get_stats(), sources=self.status, last_success=self.last_success,
+                    stale=self.is_stale())
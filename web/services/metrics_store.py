@@ -0,0 +1,182 @@
+"""
+Embedded time-series store for node performance metrics
+
+Samples are written once into three tiers of a single SQLite table: raw
+(one row per collector sample), 1-minute and 15-minute rollups. Rollups
+keep min/max/sum/count so any range query is answered from the coarsest
+tier that still satisfies the requested step, with one indexed read.
+Each tier has its own retention window, which keeps the database size on
+the boot node's SD card bounded.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+# tier resolution (seconds) -> retention (seconds); 0 is the raw tier
+TIERS = {
+    0: 6 * 3600,
+    60: 48 * 3600,
+    900: 30 * 86400,
+}
+# Limit on points returned when the caller does not pass a step
+MAX_POINTS = 720
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    tier INTEGER NOT NULL,
+    node TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (tier, node, metric, bucket)
+) WITHOUT ROWID
+"""
+
+UPSERT = """
+INSERT INTO samples (tier, node, metric, bucket, min, max, sum, count)
+VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+ON CONFLICT (tier, node, metric, bucket) DO UPDATE SET
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    sum = sum + excluded.sum,
+    count = count + 1
+"""
+
+
+def extract_metrics(health):
+    """Flatten a node health payload into {metric: value}"""
+    metrics = {}
+    if health.get('cpu'):
+        metrics['cpu'] = health['cpu'].get('percent')
+    if health.get('memory'):
+        metrics['memory'] = health['memory'].get('percent')
+    if health.get('disk'):
+        metrics['disk'] = health['disk'].get('percent')
+    if health.get('load'):
+        metrics['load'] = health['load'][0]
+    metrics['temperature'] = health.get('temperature')
+    rates = [(iface.get('rx_bps') or 0) + (iface.get('tx_bps') or 0)
+             for iface in (health.get('network') or {}).values()]
+    if rates:
+        metrics['network'] = round(sum(rates) / 1e6, 3)
+    return {k: float(v) for k, v in metrics.items() if v is not None}
+
+
+class MetricsStore:
+    """SQLite-backed raw + rollup series keyed by (node, metric)"""
+
+    def __init__(self, path, tiers=None, prune_interval=300):
+        self.tiers = dict(tiers or TIERS)
+        self.prune_interval = prune_interval
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        self._db = None
+        self._db_pid = None
+        self._conn.commit()
+
+    @property
+    def _conn(self):
+        # Connections must not cross fork(); reopen in each worker process
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.execute(SCHEMA)
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def ingest(self, samples, ts=None):
+        """Record {node_id: {metric: value}} taken at ts (epoch seconds)"""
+        ts = int(ts if ts is not None else time.time())
+        rows = []
+        for node_id, metrics in samples.items():
+            for metric, value in metrics.items():
+                for tier in self.tiers:
+                    bucket = ts - ts % tier if tier else ts
+                    rows.append((tier, node_id, metric, bucket, value, value, value))
+        if not rows:
+            return
+        with self._lock:
+            # One transaction per collector pass keeps SD-card fsyncs down
+            with self._conn:
+                self._conn.executemany(UPSERT, rows)
+            if ts - self._last_prune >= self.prune_interval:
+                self._prune(ts)
+                self._last_prune = ts
+
+    def _prune(self, now):
+        with self._conn:
+            for tier, retention in self.tiers.items():
+                self._conn.execute(
+                    "DELETE FROM samples WHERE tier=? AND bucket<?",
+                    (tier, now - retention)
+                )
+
+    def pick_tier(self, start, step, now=None):
+        """Coarsest tier no coarser than step whose retention covers start"""
+        now = now or time.time()
+        candidates = [t for t, retention in self.tiers.items()
+                      if t <= step and now - retention <= start]
+        if candidates:
+            return max(candidates)
+        # Nothing covers the whole range; fall back to the longest-lived tier
+        return max(self.tiers, key=lambda t: self.tiers[t])
+
+    def query(self, node_id, start, end, step=None, metrics=None):
+        """Return {metric: [{'t', 'min', 'avg', 'max'}]} bucketed by step"""
+        start, end = int(start), int(end)
+        if not step:
+            step = max(1, (end - start) // MAX_POINTS)
+        step = int(step)
+        tier = self.pick_tier(start, step)
+        step = max(step, tier or 1)
+        sql = """
+            SELECT metric, (bucket / ?) * ? AS t,
+                   MIN(min), SUM(sum) / SUM(count), MAX(max)
+            FROM samples
+            WHERE tier=? AND node=? AND bucket BETWEEN ? AND ?
+        """
+        params = [step, step, tier, node_id, start, end]
+        if metrics:
+            sql += " AND metric IN (%s)" % ','.join('?' * len(metrics))
+            params.extend(metrics)
+        sql += " GROUP BY metric, t ORDER BY metric, t"
+        series = {}
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for metric, t, lo, avg, hi in rows:
+            series.setdefault(metric, []).append({
+                't': t,
+                'min': round(lo, 3),
+                'avg': round(avg, 3),
+                'max': round(hi, 3)
+            })
+        return {'tier': tier, 'step': step, 'series': series}
+
+    def latest(self, node_id=None, window=300):
+        """Most recent raw value per (node, metric) within the last window"""
+        # SQLite returns the bare columns from the row holding MAX(bucket)
+        sql = """
+            SELECT node, metric, MAX(bucket), sum / count FROM samples
+            WHERE tier=0 AND bucket >= ?
+        """
+        params = [int(time.time()) - window]
+        if node_id:
+            sql += " AND node=?"
+            params.append(node_id)
+        sql += " GROUP BY node, metric"
+        latest = {}
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for node, metric, bucket, value in rows:
+            entry = latest.setdefault(node, {'ts': bucket})
+            entry[metric] = round(value, 3)
+            entry['ts'] = max(entry['ts'], bucket)
+        return latest
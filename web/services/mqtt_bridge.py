@@ -0,0 +1,425 @@
+"""
+MQTT telemetry bridge for mesh assets
+
+Subscribes to the mesh node's broker (mosquitto) for meshtastic JSON
+uplinks (msh/<region>/2/json/...) and plain per-asset topics
+(<prefix>/<asset id>/<kind>), and keeps the latest known state of every
+asset. The MQTT network thread only parses and enqueues; a separate
+consumer applies updates in batches, so a slow table update or stream
+fan-out never stalls the broker connection.
+
+The queue between them is bounded and holds at most one pending update per
+asset: a newer message for an asset already waiting is merged into it. Under
+a burst from many distinct assets the drop policy decides what gives way.
+paho-mqtt is optional; FakeBroker delivers messages in-process for demo mode
+and testing.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # optional; only needed for a real broker
+    mqtt = None
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+def topic_matches(pattern, topic):
+    """MQTT subscription matching with + and # wildcards"""
+    parts = topic.split('/')
+    for i, level in enumerate(pattern.split('/')):
+        if level == '#':
+            return True
+        if i >= len(parts) or (level != '+' and level != parts[i]):
+            return False
+    return len(pattern.split('/')) == len(parts)
+
+
+def _number(value, scale=1.0):
+    return None if value is None else round(float(value) * scale, 7)
+
+
+def parse_meshtastic_json(topic, message):
+    """Update from a meshtastic JSON uplink (position, telemetry or nodeinfo)"""
+    sender = message.get('from')
+    kind = message.get('type')
+    payload = message.get('payload')
+    if sender is None or not isinstance(payload, dict):
+        return None
+    update = {'id': 'mt:!%08x' % int(sender), 'source': 'meshtastic'}
+    if kind == 'position':
+        update.update(
+            latitude=_number(payload.get('latitude_i'), 1e-7),
+            longitude=_number(payload.get('longitude_i'), 1e-7),
+            altitude=payload.get('altitude'),
+            speed=payload.get('ground_speed'),
+            heading=payload.get('ground_track'),
+        )
+    elif kind == 'telemetry':
+        update.update(
+            battery=payload.get('battery_level'),
+            voltage=payload.get('voltage'),
+            channel_utilization=payload.get('channel_utilization'),
+        )
+    elif kind == 'nodeinfo':
+        update.update(
+            name=payload.get('longname'),
+            short_name=payload.get('shortname'),
+            hardware=payload.get('hardware'),
+            role=payload.get('role'),
+        )
+    else:
+        return None
+    for key in ('snr', 'rssi'):
+        if message.get(key) is not None:
+            update[key] = message[key]
+    return {k: v for k, v in update.items() if v is not None}
+
+
+# Field aliases accepted on plain <prefix>/<asset id>/<kind> topics
+_ASSET_FIELDS = {
+    'lat': 'latitude', 'latitude': 'latitude', 'lon': 'longitude', 'lng': 'longitude',
+    'longitude': 'longitude', 'alt': 'altitude', 'altitude': 'altitude',
+    'speed': 'speed', 'heading': 'heading', 'course': 'heading',
+    'battery': 'battery', 'voltage': 'voltage', 'status': 'status',
+    'name': 'name', 'callsign': 'name', 'role': 'role', 'snr': 'snr', 'rssi': 'rssi',
+}
+
+
+def parse_asset_message(topic, message):
+    """Update from <prefix>/<asset id>/<position|telemetry|status> JSON"""
+    parts = topic.split('/')
+    if len(parts) < 3 or parts[-1] not in ('position', 'telemetry', 'status'):
+        return None
+    update = {'id': parts[-2], 'source': 'mqtt'}
+    for key, value in message.items():
+        field = _ASSET_FIELDS.get(key)
+        if field and value is not None:
+            update[field] = value
+    return update
+
+
+def parse_message(topic, payload):
+    """Asset update dict for a raw MQTT message, or None if it is not one"""
+    try:
+        message = json.loads(payload)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(message, dict):
+        return None
+    try:
+        if topic.startswith('msh/'):
+            return parse_meshtastic_json(topic, message)
+        return parse_asset_message(topic, message)
+    except (TypeError, ValueError, AttributeError):
+        # A malformed packet from one radio must not reach the network loop
+        return None
+
+
+class CoalescingQueue:
+    """Bounded queue with at most one pending entry per key
+
+    put() merges an update into the entry already waiting for its key, which
+    keeps its place in line. When every slot holds a different key the
+    policy applies: drop_oldest evicts the longest-waiting entry, drop_newest
+    refuses the new one, and block makes the producer wait (pushing back on
+    the broker connection) for up to block_timeout before refusing it.
+    """
+
+    def __init__(self, maxsize=1024, policy=DROP_OLDEST, block_timeout=0.5):
+        if policy not in POLICIES:
+            raise ValueError(f'unknown drop policy {policy!r}')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self.stats = {'enqueued': 0, 'coalesced': 0, 'dropped': 0, 'high_water': 0}
+
+    def put(self, key, update):
+        """Queue or merge update; returns False if it was dropped"""
+        with self._cond:
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending.update(update)
+                self.stats['coalesced'] += 1
+                return True
+            if len(self._pending) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self._pending.popitem(last=False)
+                    self.stats['dropped'] += 1
+                elif self.policy == DROP_NEWEST or not self._cond.wait_for(
+                        lambda: key in self._pending or len(self._pending) < self.maxsize,
+                        self.block_timeout):
+                    self.stats['dropped'] += 1
+                    return False
+                else:
+                    # Another producer may have queued this key while we waited
+                    pending = self._pending.get(key)
+                    if pending is not None:
+                        pending.update(update)
+                        self.stats['coalesced'] += 1
+                        return True
+            self._pending[key] = dict(update)
+            self.stats['enqueued'] += 1
+            self.stats['high_water'] = max(self.stats['high_water'], len(self._pending))
+            self._cond.notify_all()
+            return True
+
+    def drain(self, max_items=None, timeout=None):
+        """Take up to max_items entries as [(key, update)], waiting up to timeout for one"""
+        with self._cond:
+            if not self._pending and timeout:
+                self._cond.wait_for(lambda: self._pending, timeout)
+            batch = []
+            while self._pending and (max_items is None or len(batch) < max_items):
+                batch.append(self._pending.popitem(last=False))
+            if batch:
+                self._cond.notify_all()
+            return batch
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def get_stats(self):
+        with self._cond:
+            return dict(self.stats, pending=len(self._pending), maxsize=self.maxsize,
+                        policy=self.policy)
+
+
+def _same_asset(a, b):
+    return all(a.get(k) == b.get(k) for k in a.keys() | b.keys() if k != 'last_seen')
+
+
+class AssetTable:
+    """Latest merged state per asset with change sequence numbers and expiry"""
+
+    def __init__(self, expiry=3600, tombstone_ttl=900):
+        self.expiry = expiry
+        self.tombstone_ttl = tombstone_ttl
+        self._lock = threading.Lock()
+        self._assets = {}
+        self._changed_at = {}
+        self._removed = {}
+        self._seq = 0
+        self._floor = 0
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def update(self, updates, now=None):
+        """Merge {asset_id: fields} updates; returns (changed, removed_ids)"""
+        now = now or time.time()
+        changed = {}
+        with self._lock:
+            for asset_id, fields in updates.items():
+                current = self._assets.get(asset_id)
+                record = dict(current or {}, **fields)
+                record['last_seen'] = round(fields.get('received', now), 1)
+                record.pop('received', None)
+                if current is not None and _same_asset(current, record):
+                    current['last_seen'] = record['last_seen']
+                    continue
+                self._seq += 1
+                self._assets[asset_id] = record
+                self._changed_at[asset_id] = self._seq
+                self._removed.pop(asset_id, None)
+                changed[asset_id] = record
+            removed = [a for a, record in self._assets.items()
+                       if now - record['last_seen'] > self.expiry]
+            for asset_id in removed:
+                self._seq += 1
+                del self._assets[asset_id]
+                del self._changed_at[asset_id]
+                self._removed[asset_id] = (self._seq, now)
+            for asset_id, (seq, at) in list(self._removed.items()):
+                if now - at > self.tombstone_ttl:
+                    del self._removed[asset_id]
+                    self._floor = max(self._floor, seq)
+        return changed, removed
+
+    def snapshot(self):
+        with self._lock:
+            return {'seq': self._seq, 'full': True, 'assets': list(self._assets.values()),
+                    'removed': []}
+
+    def since(self, seq):
+        """Changes after seq; falls back to a full snapshot if seq is too old"""
+        with self._lock:
+            if seq < self._floor or seq > self._seq:
+                return {'seq': self._seq, 'full': True,
+                        'assets': list(self._assets.values()), 'removed': []}
+            return {
+                'seq': self._seq,
+                'full': False,
+                'assets': [self._assets[a] for a, s in self._changed_at.items() if s > seq],
+                'removed': [a for a, (s, _) in self._removed.items() if s > seq],
+            }
+
+    def export(self):
+        """Complete table state, including sequence numbers and tombstones"""
+        with self._lock:
+            return {
+                'seq': self._seq,
+                'floor': self._floor,
+                'assets': [[record, self._changed_at[a]] for a, record in self._assets.items()],
+                'removed': {a: list(entry) for a, entry in self._removed.items()},
+            }
+
+    def load(self, state):
+        """Replace the table with an exported state; returns (changed, removed_ids)"""
+        with self._lock:
+            # A lower seq means the exporter restarted; treat everything as new
+            previous = self._seq if state['seq'] >= self._seq else 0
+            assets = {record['id']: record for record, _ in state['assets']}
+            changed = {record['id']: record for record, seq in state['assets'] if seq > previous}
+            removed = [a for a in self._assets if a not in assets]
+            self._assets = assets
+            self._changed_at = {record['id']: seq for record, seq in state['assets']}
+            self._removed = {a: tuple(entry) for a, entry in state['removed'].items()}
+            self._seq = state['seq']
+            self._floor = state['floor']
+        return changed, removed
+
+    def __len__(self):
+        return len(self._assets)
+
+
+class FakeBroker:
+    """In-process stand-in for an MQTT broker (demo mode and tests)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []
+
+    def subscribe(self, pattern, callback):
+        with self._lock:
+            self._subscriptions.append((pattern, callback))
+
+    def publish(self, topic, payload):
+        if not isinstance(payload, (str, bytes)):
+            payload = json.dumps(payload)
+        with self._lock:
+            callbacks = [cb for pattern, cb in self._subscriptions if topic_matches(pattern, topic)]
+        for callback in callbacks:
+            callback(topic, payload)
+
+
+class MQTTBridge:
+    """Broker subscription -> CoalescingQueue -> AssetTable
+
+    broker is 'host[:port]' for a real broker (requires paho-mqtt) or a
+    FakeBroker. on_update(changed, removed) is called from the consumer
+    thread after each applied batch.
+    """
+
+    def __init__(self, broker, topics, queue_size=1024, policy=DROP_OLDEST, expiry=3600,
+                 username=None, password=None, batch_size=256, on_update=None):
+        self.broker = broker
+        self.topics = list(topics)
+        self.username = username
+        self.password = password
+        self.batch_size = batch_size
+        self.on_update = on_update
+        self.queue = CoalescingQueue(queue_size, policy)
+        self.table = AssetTable(expiry=expiry)
+        self.connected = False
+        self.connect_error = None
+        self.last_message = None
+        self.stats = {'messages': 0, 'ignored': 0, 'batches': 0, 'applied': 0}
+        self._client = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            if isinstance(self.broker, FakeBroker):
+                for topic in self.topics:
+                    self.broker.subscribe(topic, self.handle)
+                self.connected = True
+            else:
+                self._connect()
+            self._thread = threading.Thread(target=self._consume, name='mqtt-bridge', daemon=True)
+            self._thread.start()
+
+    def _connect(self):
+        if mqtt is None:
+            raise RuntimeError('paho-mqtt is required to connect to an MQTT broker')
+        host, _, port = self.broker.partition(':')
+        if hasattr(mqtt, 'CallbackAPIVersion'):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        else:
+            client = mqtt.Client()
+        if self.username:
+            client.username_pw_set(self.username, self.password)
+
+        def on_disconnect(client, *args):
+            self.connected = False
+
+        client.on_connect = self._on_connect
+        client.on_disconnect = on_disconnect
+        client.on_message = lambda client, userdata, msg: self.handle(msg.topic, msg.payload)
+        client.reconnect_delay_set(min_delay=1, max_delay=60)
+        client.connect_async(host, int(port or 1883), keepalive=60)
+        client.loop_start()
+        self._client = client
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        """CONNACK handler; reason_code is a ReasonCode (paho 2) or an int (paho 1)"""
+        failed = getattr(reason_code, 'is_failure', reason_code != 0)
+        if failed:
+            # Refused (bad credentials, not authorized); paho keeps retrying
+            self.connected = False
+            if str(reason_code) != self.connect_error:
+                print(f"MQTT broker {self.broker} refused connection:", reason_code)
+            self.connect_error = str(reason_code)
+            return
+        self.connected = True
+        self.connect_error = None
+        # Resubscribe on every (re)connect; the broker keeps no session for us
+        client.subscribe([(topic, 0) for topic in self.topics])
+
+    def handle(self, topic, payload):
+        """Parse and enqueue one message; runs on the network thread"""
+        self.stats['messages'] += 1
+        self.last_message = time.time()
+        update = parse_message(topic, payload)
+        if update is None:
+            self.stats['ignored'] += 1
+            return False
+        update['received'] = self.last_message
+        return self.queue.put(update['id'], update)
+
+    def apply(self, timeout=None):
+        """Apply one batch from the queue; returns (changed, removed)"""
+        batch = self.queue.drain(self.batch_size, timeout=timeout)
+        changed, removed = self.table.update(dict(batch))
+        if batch:
+            self.stats['batches'] += 1
+            self.stats['applied'] += len(batch)
+        if (changed or removed) and self.on_update:
+            self.on_update(changed, removed)
+        return changed, removed
+
+    def _consume(self):
+        while True:
+            try:
+                self.apply(timeout=1.0)
+            except Exception as e:
+                print("MQTT bridge update failed:", e)
+                time.sleep(1)
+
+    def get_stats(self):
+        return dict(self.stats, connected=self.connected, connect_error=self.connect_error,
+                    last_message=self.last_message, assets=len(self.table), topics=self.topics,
+                    queue=self.queue.get_stats())
@@ -0,0 +1,196 @@
+"""
+Node health metrics collection
+
+A single shell invocation dumps everything the dashboard needs from a node
+(uptime, load, memory, disk, temperature, network counters and per-core CPU
+counters) as tagged sections; NodeMetricsParser turns that text into typed
+records shaped like the demo health payload.
+"""
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# One remote round trip; each section is introduced by an @@tag line
+METRICS_SCRIPT = '; '.join([
+    "echo @@uptime", "cat /proc/uptime",
+    "echo @@loadavg", "cat /proc/loadavg",
+    "echo @@meminfo", "cat /proc/meminfo",
+    "echo @@disk", "df -Pk /",
+    "echo @@temp", "cat /sys/class/thermal/thermal_zone0/temp 2>/dev/null",
+    "echo @@net", "cat /proc/net/dev",
+    "echo @@stat", "grep '^cpu' /proc/stat",
+])
+
+
+@dataclass
+class UsageStats:
+    used: int
+    total: int
+    percent: float
+
+
+@dataclass
+class CpuStats:
+    percent: float
+    per_core: List[float]
+
+
+@dataclass
+class InterfaceStats:
+    rx_bytes: int
+    tx_bytes: int
+    rx_bps: Optional[float] = None
+    tx_bps: Optional[float] = None
+
+
+@dataclass
+class NodeMetrics:
+    uptime_seconds: float
+    load: List[float]
+    memory: UsageStats
+    disk: UsageStats
+    temperature: Optional[float]
+    cpu: CpuStats
+    network: Dict[str, InterfaceStats] = field(default_factory=dict)
+    last_check: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    def to_dict(self):
+        """Same shape as the demo health payload, plus cpu/network detail"""
+        data = asdict(self)
+        data['status'] = 'online'
+        data['uptime'] = format_uptime(self.uptime_seconds)
+        return data
+
+
+def format_uptime(seconds):
+    """Render seconds as 'N days HH:MM:SS'"""
+    seconds = int(seconds)
+    days, remainder = divmod(seconds, 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{days} days {hours:02d}:{minutes:02d}:{secs:02d}"
+
+
+def _percent(used, total):
+    return round(used * 100.0 / total, 1) if total else 0.0
+
+
+def split_sections(text):
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith('@@'):
+            current = line[2:].strip()
+            sections[current] = []
+        elif current is not None and line.strip():
+            sections[current].append(line)
+    return sections
+
+
+def parse_meminfo(lines):
+    values = {}
+    for line in lines:
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if parts:
+            values[key] = int(parts[0])
+    total = values.get('MemTotal', 0) // 1024
+    available = values.get('MemAvailable', values.get('MemFree', 0)) // 1024
+    used = total - available
+    return UsageStats(used=used, total=total, percent=_percent(used, total))
+
+
+def parse_df(lines):
+    # Header line, then: Filesystem 1024-blocks Used Available Capacity Mounted
+    if len(lines) < 2:
+        return UsageStats(used=0, total=0, percent=0.0)
+    parts = lines[-1].split()
+    total = int(parts[1]) // 1024
+    used = int(parts[2]) // 1024
+    return UsageStats(used=used, total=total, percent=_percent(used, total))
+
+
+def parse_net_dev(lines):
+    interfaces = {}
+    for line in lines:
+        if ':' not in line:
+            continue
+        name, _, rest = line.partition(':')
+        name = name.strip()
+        parts = rest.split()
+        if name == 'lo' or len(parts) < 9:
+            continue
+        interfaces[name] = InterfaceStats(rx_bytes=int(parts[0]), tx_bytes=int(parts[8]))
+    return interfaces
+
+
+def parse_cpu_counters(lines):
+    """Return {'cpu': (busy, total), 'cpu0': (...), ...} from /proc/stat"""
+    counters = {}
+    for line in lines:
+        parts = line.split()
+        if not parts or not parts[0].startswith('cpu'):
+            continue
+        values = [int(v) for v in parts[1:]]
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        total = sum(values[:8])
+        counters[parts[0]] = (total - idle, total)
+    return counters
+
+
+class NodeMetricsParser:
+    """Parses METRICS_SCRIPT output, keeping the previous sample per node so
+    CPU utilisation and network throughput are rates over the last interval
+    rather than averages since boot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous = {}
+
+    def parse(self, node_id, text):
+        sections = split_sections(text)
+        now = time.monotonic()
+
+        uptime = float(sections.get('uptime', ['0'])[0].split()[0])
+        load = [float(v) for v in sections.get('loadavg', ['0 0 0'])[0].split()[:3]]
+        temp_lines = sections.get('temp')
+        temperature = round(int(temp_lines[0]) / 1000.0, 1) if temp_lines else None
+        network = parse_net_dev(sections.get('net', []))
+        counters = parse_cpu_counters(sections.get('stat', []))
+
+        with self._lock:
+            previous = self._previous.get(node_id)
+            self._previous[node_id] = (now, counters, network)
+
+        def busy_percent(name):
+            busy, total = counters[name]
+            if previous and name in previous[1]:
+                prev_busy, prev_total = previous[1][name]
+                busy, total = busy - prev_busy, total - prev_total
+            return _percent(busy, total)
+
+        cores = sorted((name for name in counters if name != 'cpu'), key=lambda n: int(n[3:]))
+        cpu = CpuStats(
+            percent=busy_percent('cpu') if 'cpu' in counters else 0.0,
+            per_core=[busy_percent(name) for name in cores]
+        )
+
+        if previous:
+            elapsed = now - previous[0]
+            for name, iface in network.items():
+                prev = previous[2].get(name)
+                if prev and elapsed > 0:
+                    iface.rx_bps = round(max(iface.rx_bytes - prev.rx_bytes, 0) * 8 / elapsed, 1)
+                    iface.tx_bps = round(max(iface.tx_bytes - prev.tx_bytes, 0) * 8 / elapsed, 1)
+
+        return NodeMetrics(
+            uptime_seconds=uptime,
+            load=load,
+            memory=parse_meminfo(sections.get('meminfo', [])),
+            disk=parse_df(sections.get('disk', [])),
+            temperature=temperature,
+            cpu=cpu,
+            network=network
+        )
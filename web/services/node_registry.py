@@ -0,0 +1,164 @@
+"""
+Cluster node registry
+
+Node definitions live in a JSON file (config/nodes.json) instead of code.
+Derived fields (flattened tool names, tool counts, categories) and the
+IP, type and tool indexes are computed once per load, so lookups are dict
+hits however many nodes the cluster grows to. The file is re-read when its
+modification time or size changes; a file that fails validation leaves the
+previous definitions in place. version is a digest of the file's content,
+identical in every process that loaded the same file.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+REQUIRED_FIELDS = ('ip', 'name', 'type', 'purpose', 'tools')
+
+
+def _prepare(node_id, raw):
+    """Validated copy of one node definition with derived fields added"""
+    if not isinstance(raw, dict):
+        raise ValueError(f'{node_id}: definition must be an object')
+    missing = [f for f in REQUIRED_FIELDS if f not in raw]
+    if missing:
+        raise ValueError(f"{node_id}: missing {', '.join(missing)}")
+    tools = raw['tools']
+    if not isinstance(tools, dict) or not all(isinstance(t, list) for t in tools.values()):
+        raise ValueError(f'{node_id}: tools must map categories to lists')
+    node = dict(raw)
+    node['tools'] = {category: [t for t in names if t] for category, names in tools.items()}
+    if 'position' in node:
+        lat, lon = node['position']
+        node['position'] = (float(lat), float(lon))
+    node['tool_names'] = [t for names in node['tools'].values() for t in names]
+    node['tool_count'] = len(node['tool_names'])
+    node['categories'] = list(node['tools'])
+    return node
+
+
+class NodeRegistry(Mapping):
+    """Read-only {node_id: definition} mapping backed by a JSON file
+
+    Everything is rebuilt into new objects and swapped in at once on reload,
+    so a request never sees half of an old and half of a new definition set.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._signature = None
+        self._checked = 0
+        self.version = None
+        self.loaded_at = None
+        self.error = None
+        self.reloads = 0
+        self._nodes = {}
+        self._by_ip = {}
+        self._by_type = {}
+        self._by_tool = {}
+        self._load(*self._read())
+
+    def _read(self):
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            return f.read(), (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, content, signature):
+        document = json.loads(content)
+        definitions = document.get('nodes', document)
+        if not isinstance(definitions, dict) or not definitions:
+            raise ValueError('no node definitions')
+        nodes = {node_id: _prepare(node_id, raw) for node_id, raw in definitions.items()}
+        by_ip, by_type, by_tool = {}, {}, {}
+        for node_id, node in nodes.items():
+            if node['ip'] in by_ip:
+                raise ValueError(f"{node_id}: ip {node['ip']} already used by {by_ip[node['ip']]}")
+            by_ip[node['ip']] = node_id
+            by_type.setdefault(node['type'], []).append(node_id)
+            for tool in node['tool_names']:
+                by_tool.setdefault(tool.lower(), []).append(node_id)
+        self._nodes, self._by_ip, self._by_type, self._by_tool = nodes, by_ip, by_type, by_tool
+        self._signature = signature
+        self.version = hashlib.sha1(content).hexdigest()[:12]
+        self.loaded_at = time.time()
+        self.error = None
+
+    def on_reload(self, callback):
+        """Call callback(registry) after every successful reload"""
+        self._listeners.append(callback)
+
+    def refresh(self, force=False):
+        """Reload if the file changed; checks at most once per check_interval
+
+        Returns True if new definitions were loaded.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if not force and signature == self._signature:
+                    return False
+                self._load(*self._read())
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                self._failed(e)
+                return False
+            self.reloads += 1
+        for callback in self._listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                print("Node registry listener failed:", e)
+        return True
+
+    def _failed(self, error):
+        if str(error) != self.error:
+            print(f"Node registry {self.path} not reloaded:", error)
+        self.error = str(error)
+        # Retry once the file changes again rather than on every check
+        try:
+            stat = os.stat(self.path)
+            self._signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            self._signature = None
+
+    def __getitem__(self, node_id):
+        return self._nodes[node_id]
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def by_ip(self, ip):
+        """Node id with this address, or None"""
+        return self._by_ip.get(ip)
+
+    def of_type(self, node_type):
+        """Ids of the nodes of one type, in file order"""
+        return list(self._by_type.get(node_type, ()))
+
+    def with_tool(self, tool):
+        """Ids of the nodes listing tool (case-insensitive)"""
+        return list(self._by_tool.get(tool.lower(), ()))
+
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'error': self.error,
+            'nodes': len(self._nodes),
+            'types': {t: len(ids) for t, ids in self._by_type.items()},
+        }
@@ -0,0 +1,63 @@
+"""
+Resolved user principal cache
+
+get_current_user runs on every template render; caching the resolved
+principal (role, groups, teams, permissions) per user id lets authenticated
+page loads skip SQLite entirely until the entry is invalidated or expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+def resolve_permissions(role, roles):
+    """Permissions for a role name from config.dashboard.ROLES"""
+    return list(roles.get((role or '').strip().lower(), {}).get('permissions', []))
+
+
+class PrincipalCache:
+    """Size-bounded LRU of principals keyed by user id"""
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def put(self, user_id, principal):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, user_id=None):
+        """Drop one user's principal, or every principal when user_id is None"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+            self.stats['invalidations'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._entries)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+            return stats
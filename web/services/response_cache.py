@@ -0,0 +1,106 @@
+"""
+Pre-encoded response cache
+
+Payloads that only change with some version (the node registry, a
+rendered page) are encoded once per version and kept as bytes together
+with gzip and, if the brotli module is installed, brotli variants and an
+ETag. Serving a repeat request is then a dictionary lookup and a copy of
+the matching variant, or a 304 when the client already holds it. JSON is
+encoded with orjson when it is installed.
+"""
+import gzip
+import hashlib
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:  # optional; the standard encoder is used instead
+    orjson = None
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth a compressed variant
+MIN_COMPRESS = 512
+
+
+def encode_json(payload):
+    """Compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(',', ':'), default=str).encode()
+
+
+class Encoded:
+    """One payload's body, compressed variants and ETag"""
+
+    __slots__ = ('version', 'body', 'mimetype', 'etag', 'variants')
+
+    def __init__(self, version, body, mimetype):
+        self.version = version
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()[:16]
+        self.variants = {}
+        if len(body) >= MIN_COMPRESS:
+            self.variants['gzip'] = gzip.compress(body, 9, mtime=0)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body, quality=9)
+
+    def select(self, accepted):
+        """(encoding or None, bytes) for the client's accepted encodings
+
+        accepted(name) returns the client's quality for that coding.
+        """
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accepted(encoding):
+                return encoding, self.variants[encoding]
+        return None, self.body
+
+
+class ResponseCache:
+    """Encoded payloads keyed by name, rebuilt when their version changes"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.stats = {'hits': 0, 'encodes': 0, 'not_modified': 0}
+
+    def get(self, key, version, build, mimetype='application/json'):
+        """Encoded entry for key at version; build() makes the payload on a miss
+
+        build() returns a JSON-serialisable payload, or str/bytes for other
+        mimetypes.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self.stats['hits'] += 1
+                return entry
+        payload = build()
+        if mimetype == 'application/json':
+            body = encode_json(payload)
+        else:
+            body = payload.encode() if isinstance(payload, str) else payload
+        entry = Encoded(version, body, mimetype)
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.maxsize:
+                self._entries.clear()
+            self._entries[key] = entry
+            self.stats['encodes'] += 1
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries),
+                        bytes=sum(len(e.body) + sum(map(len, e.variants.values()))
+                                  for e in self._entries.values()),
+                        encoder='orjson' if orjson else 'json',
+                        encodings=['br', 'gzip'] if brotli else ['gzip'])
@@ -0,0 +1,133 @@
+"""
+State shared between dashboard worker processes
+
+Under a multi-process server each worker would otherwise run its own node
+collector and ADS-B poller, multiplying the load on the Pis. Workers race
+for an exclusive file lock; the holder (the leader) runs the collectors and
+writes their state into a small SQLite table, and every other worker
+follows that table instead of probing. The kernel drops the lock when the
+leader exits, so another worker takes over without coordination.
+"""
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class LeaderLock:
+    """Non-blocking exclusive flock held for the life of the process"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+
+    @property
+    def held(self):
+        return self._fd is not None and self._pid == os.getpid()
+
+    def acquire(self):
+        """Try to become leader; returns True while this process holds the lock"""
+        if self.held:
+            return True
+        # A lock inherited across fork belongs to the parent, not to us
+        self._fd = None
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd, self._pid = fd, os.getpid()
+        return True
+
+
+class SharedState:
+    """Versioned JSON values in SQLite, one row per key"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # Connections must not cross fork(); reopen in each worker process
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute(SCHEMA)
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def put(self, key, value):
+        blob = json.dumps(value, separators=(',', ':'), default=str)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO state (key, value, version, updated) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+                "version = version + 1, updated = excluded.updated",
+                (key, blob, time.time())
+            )
+            conn.commit()
+
+    def bump(self, key):
+        """Increment a generation counter (e.g. to invalidate caches everywhere)"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO state (key, value, version, updated) VALUES (?, 'null', 1, ?) "
+                "ON CONFLICT (key) DO UPDATE SET version = version + 1, updated = excluded.updated",
+                (key, time.time())
+            )
+            conn.commit()
+
+    def versions(self, keys):
+        """{key: version} for the keys that exist"""
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT key, version FROM state WHERE key IN ({','.join('?' * len(keys))})",
+                list(keys)
+            ).fetchall()
+        return dict(rows)
+
+    def get(self, key):
+        """(value, version, updated) or (None, 0, None)"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, version, updated FROM state WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, 0, None
+        return json.loads(row[0]), row[1], row[2]
+
+    def prefixed(self, prefix):
+        """{key: value} for every key starting with prefix"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key, value FROM state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM state WHERE key = ?", (key,))
+            conn.commit()
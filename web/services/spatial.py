@@ -0,0 +1,191 @@
+"""
+Spatial index and server-side filtering for tracked aircraft
+
+GridIndex buckets positions into fixed lat/lon cells so bounding-box and
+radius queries only touch the cells that overlap the query area instead of
+every contact in the sky.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lon, radius_km):
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) around a circle"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    coslat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * coslat)), 180.0)
+    return (max(lat - dlat, -90.0), lon - dlon, min(lat + dlat, 90.0), lon + dlon)
+
+
+class GridIndex:
+    """Uniform lat/lon grid mapping cell -> set of keys"""
+
+    def __init__(self, cell_deg=0.25):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._positions = {}
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg)))
+
+    def update(self, key, lat, lon):
+        if lat is None or lon is None:
+            self.remove(key)
+            return
+        cell = self._cell(lat, lon)
+        previous = self._positions.get(key)
+        if previous and previous[2] != cell:
+            self._discard(key, previous[2])
+        self._positions[key] = (lat, lon, cell)
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        previous = self._positions.pop(key, None)
+        if previous:
+            self._discard(key, previous[2])
+
+    def _discard(self, key, cell):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._cells[cell]
+
+    def query_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Keys whose position lies inside the box (longitudes may wrap)"""
+        if min_lon > max_lon:
+            return (self.query_bbox(min_lat, min_lon, max_lat, 180.0)
+                    | self.query_bbox(min_lat, -180.0, max_lat, max_lon))
+        lo_x, lo_y = self._cell(min_lat, min_lon)
+        hi_x, hi_y = self._cell(max_lat, max_lon)
+        found = set()
+        if (hi_x - lo_x + 1) * (hi_y - lo_y + 1) > len(self._cells):
+            # Query larger than the populated area; walk occupied cells instead
+            cells = [c for c in self._cells if lo_x <= c[0] <= hi_x and lo_y <= c[1] <= hi_y]
+        else:
+            cells = [(x, y) for x in range(lo_x, hi_x + 1) for y in range(lo_y, hi_y + 1)]
+        for cell in cells:
+            for key in self._cells.get(cell, ()):
+                lat, lon, _ = self._positions[key]
+                if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                    found.add(key)
+        return found
+
+    def query_radius(self, lat, lon, radius_km):
+        min_lat, min_lon, max_lat, max_lon = radius_bbox(lat, lon, radius_km)
+        if min_lon < -180.0:
+            min_lon += 360.0
+        if max_lon > 180.0:
+            max_lon -= 360.0
+        return {key for key in self.query_bbox(min_lat, min_lon, max_lat, max_lon)
+                if haversine_km(lat, lon, *self._positions[key][:2]) <= radius_km}
+
+    def __len__(self):
+        return len(self._positions)
+
+
+class AircraftQuery:
+    """Parsed filter/pagination/projection options for an aircraft search"""
+
+    def __init__(self, bbox=None, center=None, radius_km=None, alt_min=None,
+                 alt_max=None, callsign=None, fields=None, offset=0, limit=None):
+        self.bbox = bbox
+        self.center = center
+        self.radius_km = radius_km
+        self.alt_min = alt_min
+        self.alt_max = alt_max
+        self.callsign = callsign.upper() if callsign else None
+        self.fields = fields
+        self.offset = offset
+        self.limit = limit
+
+    @classmethod
+    def from_args(cls, args):
+        """Build from request args; raises ValueError on malformed input"""
+        bbox = center = radius = None
+        if args.get('bbox'):
+            bbox = tuple(float(v) for v in args['bbox'].split(','))
+            if len(bbox) != 4:
+                raise ValueError('bbox must be min_lat,min_lon,max_lat,max_lon')
+        if args.get('radius'):
+            center = (float(args['lat']), float(args['lon']))
+            radius = float(args['radius'])
+        fields = [f for f in args.get('fields', '').split(',') if f] or None
+        offset = int(args.get('offset', 0))
+        limit = int(args['limit']) if args.get('limit') else None
+        if offset < 0:
+            raise ValueError('offset must not be negative')
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be at least 1')
+        return cls(
+            bbox=bbox,
+            center=center,
+            radius_km=radius,
+            alt_min=float(args['alt_min']) if args.get('alt_min') else None,
+            alt_max=float(args['alt_max']) if args.get('alt_max') else None,
+            callsign=args.get('callsign') or None,
+            fields=fields,
+            offset=offset,
+            limit=limit
+        )
+
+    @property
+    def is_filtered(self):
+        return any(v is not None for v in (self.bbox, self.center, self.alt_min,
+                                           self.alt_max, self.callsign, self.fields,
+                                           self.limit)) or self.offset > 0
+
+    def candidates(self, index):
+        """Keys from the spatial index, or None when no spatial filter is set"""
+        keys = None
+        if self.bbox:
+            keys = index.query_bbox(*self.bbox)
+        if self.center:
+            near = index.query_radius(self.center[0], self.center[1], self.radius_km)
+            keys = near if keys is None else keys & near
+        return keys
+
+    def matches(self, aircraft):
+        altitude = aircraft.get('altitude')
+        if self.alt_min is not None and (altitude is None or altitude < self.alt_min):
+            return False
+        if self.alt_max is not None and (altitude is None or altitude >= self.alt_max):
+            return False
+        if self.callsign and not (aircraft.get('callsign') or '').upper().startswith(self.callsign):
+            return False
+        return True
+
+    def contains(self, aircraft):
+        """matches() plus the spatial filters, checked against the record's own position"""
+        if not self.matches(aircraft):
+            return False
+        if not (self.bbox or self.center):
+            return True
+        lat, lon = aircraft.get('latitude'), aircraft.get('longitude')
+        if lat is None or lon is None:
+            return False
+        if self.bbox:
+            min_lat, min_lon, max_lat, max_lon = self.bbox
+            if not min_lat <= lat <= max_lat:
+                return False
+            if (min_lon <= max_lon and not min_lon <= lon <= max_lon) or max_lon < lon < min_lon:
+                return False
+        if self.center and haversine_km(self.center[0], self.center[1], lat, lon) > self.radius_km:
+            return False
+        return True
+
+    def project(self, aircraft):
+        if not self.fields:
+            return aircraft
+        projected = {k: aircraft.get(k) for k in self.fields}
+        projected['icao'] = aircraft['icao']
+        return projected
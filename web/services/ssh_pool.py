@@ -0,0 +1,202 @@
+"""
+Persistent SSH session pool for cluster nodes
+
+Keeps one OpenSSH ControlMaster connection per node so that remote commands
+ride an already-authenticated session instead of paying for a TCP and key
+exchange handshake on every call.
+"""
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+# ssh exits with 255 when the connection itself failed
+SSH_CONNECTION_ERROR = 255
+
+
+class SSHPool:
+    """One multiplexed master session per host, bounded channels per host"""
+
+    def __init__(self, user='pi', control_dir='/tmp/cluster-ssh', persist=600,
+                 keepalive=15, max_channels=4, connect_timeout=5, check_interval=30,
+                 on_spawn=None):
+        self.user = user
+        self.control_dir = control_dir
+        self.persist = persist
+        self.keepalive = keepalive
+        self.max_channels = max_channels
+        self.connect_timeout = connect_timeout
+        self.check_interval = check_interval
+        # Called with 'check', 'master', 'command', 'stream' or 'exit' per ssh started
+        self.on_spawn = on_spawn
+        self._lock = threading.Lock()
+        self._host_locks = {}
+        self._channels = {}
+        self._verified = {}
+        self.stats = {'hits': 0, 'misses': 0, 'reconnects': 0, 'failures': 0}
+
+    def _options(self, host):
+        return [
+            '-o', 'StrictHostKeyChecking=no',
+            '-o', 'BatchMode=yes',
+            '-o', f'ConnectTimeout={self.connect_timeout}',
+            '-o', f'ServerAliveInterval={self.keepalive}',
+            '-o', 'ServerAliveCountMax=3',
+            '-o', f'ControlPath={self._control_path(host)}',
+        ]
+
+    def _control_path(self, host):
+        # Keep the socket path short; unix sockets are limited to ~104 bytes
+        return os.path.join(self.control_dir, f'{self.user}@{host}')
+
+    def _target(self, host):
+        return f'{self.user}@{host}'
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self._host_locks:
+                self._host_locks[host] = threading.Lock()
+                self._channels[host] = threading.BoundedSemaphore(self.max_channels)
+            return self._host_locks[host], self._channels[host]
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _spawned(self, kind):
+        if self.on_spawn:
+            self.on_spawn(kind)
+
+    def _master_alive(self, host):
+        self._spawned('check')
+        result = subprocess.run(
+            ['ssh', '-O', 'check'] + self._options(host) + [self._target(host)],
+            capture_output=True,
+            timeout=self.connect_timeout
+        )
+        return result.returncode == 0
+
+    def _open_master(self, host):
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+        # -f backgrounds the master once authenticated; its stdio must not be
+        # piped or run() would wait on the daemonised process forever
+        self._spawned('master')
+        result = subprocess.run(
+            ['ssh', '-N', '-f', '-o', 'ControlMaster=yes',
+             '-o', f'ControlPersist={self.persist}']
+            + self._options(host) + [self._target(host)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=self.connect_timeout + 5
+        )
+        return result.returncode == 0
+
+    def _ensure_master(self, host, force_check=False):
+        """Make sure a live master exists; returns True on success"""
+        host_lock, _ = self._host_state(host)
+        with host_lock:
+            verified = self._verified.get(host)
+            fresh = verified is not None and time.monotonic() - verified < self.check_interval
+            if fresh and not force_check:
+                self._count('hits')
+                return True
+            if self._master_alive(host):
+                self._verified[host] = time.monotonic()
+                self._count('hits')
+                return True
+            self._count('misses')
+            if verified is not None:
+                # Master went away since it was last seen (node rebooted, link dropped)
+                self._count('reconnects')
+            if self._open_master(host):
+                self._verified[host] = time.monotonic()
+                return True
+            self._verified.pop(host, None)
+            self._count('failures')
+            return False
+
+    def run(self, host, command, timeout=30):
+        """Run a command over the host's shared session
+
+        The master is checked (and reopened if needed) before the command is
+        sent; the command itself is never re-run, since exit 255 may come from
+        the command or from a node that went down while running it.
+
+        Returns a subprocess.CompletedProcess; raises subprocess.TimeoutExpired
+        if no channel frees up or the command overruns the timeout.
+        """
+        _, channels = self._host_state(host)
+        deadline = time.monotonic() + timeout
+        if not channels.acquire(timeout=timeout):
+            raise subprocess.TimeoutExpired(command, timeout)
+        try:
+            if not self._ensure_master(host, force_check=True):
+                return subprocess.CompletedProcess(command, SSH_CONNECTION_ERROR, b'', b'')
+            self._spawned('command')
+            result = subprocess.run(
+                ['ssh', '-o', 'ControlMaster=no'] + self._options(host)
+                + [self._target(host), command],
+                capture_output=True,
+                timeout=max(deadline - time.monotonic(), 1)
+            )
+            if result.returncode == SSH_CONNECTION_ERROR:
+                # Re-check the master before the next command
+                self._verified.pop(host, None)
+            return result
+        finally:
+            channels.release()
+
+    @contextmanager
+    def popen(self, host, command, timeout=30):
+        """Start a command over the host's shared session without waiting
+
+        Yields a Popen whose stdout carries the merged stdout/stderr; the
+        process is killed if still running when the block exits. As with
+        run(), the master is checked before sending and the command is never
+        re-run.
+        """
+        _, channels = self._host_state(host)
+        if not channels.acquire(timeout=timeout):
+            raise subprocess.TimeoutExpired(command, timeout)
+        try:
+            if not self._ensure_master(host, force_check=True):
+                raise ConnectionError(f'no SSH session to {host}')
+            self._spawned('stream')
+            proc = subprocess.Popen(
+                ['ssh', '-o', 'ControlMaster=no'] + self._options(host)
+                + [self._target(host), command],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT
+            )
+            try:
+                yield proc
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+                if proc.wait() == SSH_CONNECTION_ERROR:
+                    # Re-check the master before the next command
+                    self._verified.pop(host, None)
+                proc.stdout.close()
+        finally:
+            channels.release()
+
+    def close(self, host=None):
+        """Tear down one or all master sessions"""
+        hosts = [host] if host else list(self._verified)
+        for h in hosts:
+            self._spawned('exit')
+            subprocess.run(
+                ['ssh', '-O', 'exit'] + self._options(h) + [self._target(h)],
+                capture_output=True,
+                timeout=self.connect_timeout
+            )
+            self._verified.pop(h, None)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['sessions'] = sorted(self._verified)
+            return stats
@@ -0,0 +1,108 @@
+"""
+Server-Sent Events push stream
+
+Producers (node collector, performance store, ADS-B ingest, ...) publish the
+full current state of a topic as {key: value}. The broker diffs it against
+the previous state and fans out only the changed/removed keys. Each frame is
+JSON-encoded once and the same text is queued for every subscriber.
+"""
+import json
+import queue
+import threading
+
+
+def sse_frame(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':'), default=str))
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    def __init__(self, topics, queue_size):
+        self.topics = set(topics)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def offer(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            # Client can't keep up; drop it and let EventSource reconnect,
+            # which re-sends a fresh snapshot instead of a backlog of deltas
+            self.closed = True
+
+    def events(self, heartbeat=15):
+        while not self.closed:
+            try:
+                yield self.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+
+
+class StreamBroker:
+    """Topic state holder and delta fan-out for /api/stream"""
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._state = {}
+        self._subscribers = set()
+        self._seq = 0
+
+    def publish(self, topic, state, partial=False, removed=()):
+        """Publish the current {key: value} state of a topic
+
+        With partial=True only the given keys are updated and only keys
+        listed in removed are dropped; otherwise keys missing from state are
+        reported as removed.
+        """
+        with self._lock:
+            previous = self._state.get(topic, {})
+            changed = {k: v for k, v in state.items() if previous.get(k) != v}
+            if partial:
+                removed = [k for k in removed if k in previous]
+            else:
+                removed = [k for k in previous if k not in state]
+            if not changed and not removed:
+                return None
+            current = dict(previous) if partial else {}
+            current.update(state)
+            for key in removed:
+                current.pop(key, None)
+            self._state[topic] = current
+            self._seq += 1
+            frame = sse_frame('delta', {
+                'topic': topic,
+                'seq': self._seq,
+                'changed': changed,
+                'removed': removed
+            }, event_id=self._seq)
+            subscribers = [s for s in self._subscribers if topic in s.topics]
+        for sub in subscribers:
+            sub.offer(frame)
+        return self._seq
+
+    def subscribe(self, topics):
+        sub = Subscription(topics, self.queue_size)
+        with self._lock:
+            snapshot = {t: self._state.get(t, {}) for t in sub.topics}
+            # Queue the snapshot before registering so it precedes any delta
+            sub.offer(sse_frame('snapshot', snapshot, event_id=self._seq))
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.closed = True
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'seq': self._seq,
+                'topics': {t: len(v) for t, v in self._state.items()}
+            }
@@ -0,0 +1,134 @@
+"""
+Batched tool/service status for cluster nodes
+
+Every tool listed for a node in NODES is checked in one remote shell
+invocation: systemctl is-active plus an installed check (unit file or
+binary on PATH), one tab-separated line per tool. Results are cached per
+node for a short TTL and concurrent requests for the same node share one
+probe, so the dashboard's tool-status polling costs at most one SSH
+exchange per node per TTL.
+"""
+import shlex
+import threading
+import time
+
+# Tool name as listed in NODES -> (systemd units, binaries). Tools not
+# listed here are probed as a unit and binary named after the lowercased tool.
+TOOL_PROBES = {
+    'NTP': ('chrony ntp ntpsec systemd-timesyncd', 'chronyd ntpd'),
+    'NFS': ('nfs-server nfs-kernel-server', 'exportfs'),
+    'DHCP': ('isc-dhcp-server dnsmasq kea-dhcp4-server', 'dhcpd dnsmasq'),
+    'TFTP': ('tftpd-hpa', 'in.tftpd'),
+    'flask': ('cluster-dashboard', 'flask'),
+    'dump1090': ('dump1090-fa dump1090-mutability dump1090', 'dump1090-fa dump1090'),
+    'rtl-sdr': ('', 'rtl_test rtl_sdr'),
+    'pyaware': ('piaware', 'piaware'),
+    'aprs': ('direwolf aprx', 'direwolf aprx'),
+    'Batman-adv': ('batman-adv', 'batctl'),
+    'Reticulm': ('rnsd', 'rnsd'),
+    'freeTAKserver': ('fts freetakserver', 'FreeTAKServer'),
+    'meshtastic': ('meshtasticd', 'meshtastic'),
+    'mosquito': ('mosquitto', 'mosquitto'),
+}
+
+# t NAME UNITS BINARIES -> "NAME<TAB>active|failed|inactive<TAB>1|0"
+PROBE_FUNCTION = r"""t() {
+  a=inactive; i=0
+  for u in $2; do
+    s=$(systemctl is-active "$u" 2>/dev/null)
+    [ "$s" = active ] && a=active
+    [ "$s" = failed ] && [ "$a" != active ] && a=failed
+    systemctl cat "$u" >/dev/null 2>&1 && i=1
+  done
+  for b in $3; do command -v "$b" >/dev/null 2>&1 && i=1; done
+  printf '%s\t%s\t%s\n' "$1" "$a" "$i"
+}
+"""
+
+
+def probe_script(tools):
+    """Shell script checking every tool in one invocation"""
+    lines = [PROBE_FUNCTION]
+    for tool in tools:
+        default = tool.lower()
+        units, binaries = TOOL_PROBES.get(tool, (default, default))
+        lines.append(f't {shlex.quote(tool)} {shlex.quote(units)} {shlex.quote(binaries)}')
+    return '\n'.join(lines) + '\n'
+
+
+def parse_probe(text):
+    """{tool: status dict} from probe_script output"""
+    statuses = {}
+    for line in text.splitlines():
+        parts = line.split('\t')
+        if len(parts) != 3:
+            continue
+        tool, state, installed = parts
+        installed = installed == '1'
+        running = state == 'active'
+        if running:
+            status = 'running'
+        elif not installed:
+            status = 'not_installed'
+        elif state == 'failed':
+            status = 'failed'
+        else:
+            status = 'idle'
+        statuses[tool] = {'installed': installed or running, 'running': running, 'status': status}
+    return statuses
+
+
+class ToolStatusCache:
+    """Per-node batched tool status with a TTL and single-flight probes
+
+    run(node_id, script) must return a subprocess.CompletedProcess.
+    """
+
+    def __init__(self, run, ttl=10):
+        self.run = run
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._node_locks = {}
+        self._entries = {}
+        self.stats = {'hits': 0, 'probes': 0, 'failures': 0}
+
+    def _node_lock(self, node_id):
+        with self._lock:
+            return self._node_locks.setdefault(node_id, threading.Lock())
+
+    def get(self, node_id, tools):
+        """(statuses by tool, age in seconds); statuses is None if the probe failed"""
+        with self._node_lock(node_id):
+            entry = self._entries.get(node_id)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                with self._lock:
+                    self.stats['hits'] += 1
+                return entry[1], round(time.monotonic() - entry[0], 1)
+            statuses = self._probe(node_id, tools)
+            # Failures are cached too, so an offline node is not re-probed on every poll
+            self._entries[node_id] = (time.monotonic(), statuses)
+            return statuses, 0.0
+
+    def _probe(self, node_id, tools):
+        with self._lock:
+            self.stats['probes'] += 1
+        try:
+            result = self.run(node_id, probe_script(tools))
+            if result.returncode == 0:
+                return parse_probe(result.stdout.decode(errors='replace'))
+        except Exception as e:
+            print(f"Tool status probe failed for {node_id}:", e)
+        with self._lock:
+            self.stats['failures'] += 1
+        return None
+
+    def invalidate(self, node_id=None):
+        with self._lock:
+            if node_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(node_id, None)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, nodes=len(self._entries))
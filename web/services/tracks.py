@@ -0,0 +1,185 @@
+"""
+Aircraft track history
+
+Position reports are stored per ICAO address in a columnar layout: one
+typed array per field holding the delta from the previous report, scaled to
+fixed-point integers. Deltas between consecutive reports are small, so
+columns start as 16-bit arrays and are only widened to 32 bits if a gap
+overflows them. Old points are trimmed by folding their deltas into the
+column base, keeping memory bounded by the retention window.
+"""
+import math
+import threading
+import time
+from array import array
+
+# column name -> fixed-point scale applied before delta encoding
+COLUMNS = (
+    ('t', 1),            # seconds
+    ('lat', 100000),     # 1e-5 degrees (~1 m)
+    ('lon', 100000),
+    ('alt', 1),          # feet
+    ('speed', 10),       # 0.1 knots
+    ('heading', 10),     # 0.1 degrees
+)
+# aircraft record keys feeding columns 1.. (column 0 is last_seen)
+RECORD_FIELDS = ('latitude', 'longitude', 'altitude', 'speed', 'heading')
+
+
+class Track:
+    """Delta-encoded columns for one aircraft"""
+
+    __slots__ = ('base', 'last', 'columns')
+
+    def __init__(self, values):
+        self.base = list(values)
+        self.last = list(values)
+        self.columns = [array('h', [0]) for _ in COLUMNS]
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def append(self, values):
+        for i, value in enumerate(values):
+            delta = value - self.last[i]
+            try:
+                self.columns[i].append(delta)
+            except OverflowError:
+                self.columns[i] = array('i', self.columns[i])
+                self.columns[i].append(delta)
+            self.last[i] = value
+
+    def trim_before(self, cutoff):
+        """Drop points with t < cutoff, rebasing every column"""
+        t = self.base[0]
+        times = self.columns[0]
+        k = 0
+        while k + 1 < len(times) and t < cutoff:
+            k += 1
+            t += times[k]
+        if t < cutoff:
+            return False  # every point is older than the cutoff
+        if k:
+            for i, column in enumerate(self.columns):
+                self.base[i] += sum(column[1:k + 1])
+                del column[:k]
+                column[0] = 0
+        return True
+
+    def decode(self, since=None):
+        """Rows of scaled-back values, oldest first"""
+        rows = []
+        current = list(self.base)
+        for j in range(len(self)):
+            if j:
+                for i, column in enumerate(self.columns):
+                    current[i] += column[j]
+            if since is None or current[0] >= since:
+                rows.append([v / scale for v, (_, scale) in zip(current, COLUMNS)])
+        return rows
+
+    def nbytes(self):
+        return sum(c.itemsize * len(c) for c in self.columns)
+
+
+def douglas_peucker(rows, tolerance_m):
+    """Simplify rows on lat/lon (columns 1, 2) to within tolerance metres"""
+    if len(rows) < 3 or tolerance_m <= 0:
+        return rows
+    # Local equirectangular projection is accurate enough at track scales
+    lat0 = math.radians(rows[0][1])
+    kx = 111320.0 * math.cos(lat0)
+    ky = 110540.0
+    xy = [(r[2] * kx, r[1] * ky) for r in rows]
+    keep = [False] * len(rows)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(rows) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        norm = math.hypot(dx, dy)
+        worst, index = 0.0, None
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if norm:
+                dist = abs(dy * px - dx * py + x2 * y1 - y2 * x1) / norm
+            else:
+                dist = math.hypot(px - x1, py - y1)
+            if dist > worst:
+                worst, index = dist, i
+        if index is not None and worst > tolerance_m:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [row for row, kept in zip(rows, keep) if kept]
+
+
+class TrackStore:
+    """Time-bounded track history for all tracked aircraft"""
+
+    def __init__(self, retention=1800, min_interval=5, prune_interval=60):
+        self.retention = retention
+        self.min_interval = min_interval
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._tracks = {}
+        self._last_prune = 0
+
+    def record(self, aircraft, now=None):
+        """Append position reports from normalized aircraft records"""
+        now = now or time.time()
+        with self._lock:
+            for ac in aircraft:
+                if ac.get('latitude') is None or ac.get('longitude') is None:
+                    continue
+                track = self._tracks.get(ac['icao'])
+                t = int(ac.get('last_seen') or now)
+                if track and t - track.last[0] < self.min_interval:
+                    continue
+                values = [t]
+                for i, key in enumerate(RECORD_FIELDS, start=1):
+                    value = ac.get(key)
+                    if value is None:
+                        # Carry the last known value forward (speed/heading often lag)
+                        values.append(track.last[i] if track else 0)
+                    else:
+                        values.append(int(round(value * COLUMNS[i][1])))
+                if track is None:
+                    self._tracks[ac['icao']] = Track(values)
+                else:
+                    track.append(values)
+            if now - self._last_prune >= self.prune_interval:
+                self._prune(now)
+                self._last_prune = now
+
+    def _prune(self, now):
+        cutoff = now - self.retention
+        for icao in list(self._tracks):
+            if not self._tracks[icao].trim_before(cutoff):
+                del self._tracks[icao]
+
+    def query(self, icao, since=None, tolerance_m=None):
+        with self._lock:
+            track = self._tracks.get(icao.upper())
+            if track is None:
+                return None
+            rows = track.decode(since=since)
+        total = len(rows)
+        if tolerance_m:
+            rows = douglas_peucker(rows, tolerance_m)
+        return {
+            'icao': icao.upper(),
+            'count': len(rows),
+            'total': total,
+            'columns': {name: [row[i] for row in rows] for i, (name, _) in enumerate(COLUMNS)},
+        }
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'aircraft': len(self._tracks),
+                'points': sum(len(t) for t in self._tracks.values()),
+                'bytes': sum(t.nbytes() for t in self._tracks.values()),
+                'retention_seconds': self.retention,
+            }
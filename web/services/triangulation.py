@@ -0,0 +1,267 @@
+"""
+RF direction-finding triangulation
+
+Receivers report bearings (degrees clockwise from true north) to the
+emitters they hear. For each emitter the position that best fits all of its
+bearing lines is found by weighted least squares in a local east/north
+plane: each bearing contributes the constraint n . p = n . r, where r is
+the receiver and n the unit normal of its line, weighted by the inverse
+square of the cross-range error (range x angular sigma). Two reweighting
+passes refine the ranges. The normal matrix inverse gives the position
+covariance, from which the confidence ellipse is drawn.
+
+Every emitter is solved in one batch of stacked 2x2 systems, so the cost of
+a tick barely grows with the number of emitters. Requires NumPy.
+"""
+import math
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # optional; the service reports itself unavailable
+    np = None
+
+AVAILABLE = np is not None
+EARTH_RADIUS = 6371008.8
+DEFAULT_SIGMA = 5.0
+OK = 'ok'
+AMBIGUOUS = 'ambiguous'
+INSUFFICIENT = 'insufficient'
+ILL_CONDITIONED = 'ill_conditioned'
+
+
+def _wrap_degrees(a):
+    return (a + 180.0) % 360.0 - 180.0
+
+
+def bearing_to(lat1, lon1, lat2, lon2):
+    """Bearing in degrees from the first point to the second (local plane)"""
+    dy = math.radians(lat2 - lat1)
+    dx = math.radians(lon2 - lon1) * math.cos(math.radians(lat1))
+    return math.degrees(math.atan2(dx, dy)) % 360.0
+
+
+def solve_batch(emitters, confidence=0.95, iterations=2, outline_points=36):
+    """Solve many emitters at once
+
+    emitters maps an emitter id to a list of (lat, lon, bearing_deg,
+    sigma_deg) tuples; returns {emitter_id: solution dict}.
+    """
+    if np is None:
+        raise RuntimeError('triangulation requires numpy')
+    ids = [e for e, obs in emitters.items() if len(obs) >= 2]
+    solutions = {e: {'emitter': e, 'status': INSUFFICIENT, 'receivers': len(obs)}
+                 for e, obs in emitters.items() if len(obs) < 2}
+    if not ids:
+        return solutions
+    width = max(len(emitters[e]) for e in ids)
+    obs = np.zeros((len(ids), width, 4))
+    mask = np.zeros((len(ids), width))
+    for i, e in enumerate(ids):
+        obs[i, :len(emitters[e])] = emitters[e]
+        mask[i, :len(emitters[e])] = 1.0
+
+    # Local tangent plane around the receivers' centroid (metres east/north)
+    lat0 = np.radians((obs[..., 0] * mask).sum() / mask.sum())
+    lon0 = np.radians((obs[..., 1] * mask).sum() / mask.sum())
+    rx = (np.radians(obs[..., 1]) - lon0) * math.cos(lat0) * EARTH_RADIUS
+    ry = (np.radians(obs[..., 0]) - lat0) * EARTH_RADIUS
+    theta = np.radians(obs[..., 2])
+    sigma = np.radians(np.where(obs[..., 3] > 0, obs[..., 3], DEFAULT_SIGMA))
+    # Line normals and right-hand sides of n . p = n . r
+    nx, ny = np.cos(theta), -np.sin(theta)
+    c = nx * rx + ny * ry
+
+    # First pass assumes a 1 km range everywhere; later passes use the fit
+    weight = mask / (1000.0 * sigma) ** 2
+    for _ in range(iterations + 1):
+        m = np.empty((len(ids), 2, 2))
+        m[:, 0, 0] = (weight * nx * nx).sum(axis=1)
+        m[:, 0, 1] = m[:, 1, 0] = (weight * nx * ny).sum(axis=1)
+        m[:, 1, 1] = (weight * ny * ny).sum(axis=1)
+        rhs = np.stack([(weight * nx * c).sum(axis=1), (weight * ny * c).sum(axis=1)], axis=1)
+        det = m[:, 0, 0] * m[:, 1, 1] - m[:, 0, 1] ** 2
+        trace = m[:, 0, 0] + m[:, 1, 1]
+        # Near-parallel bearings: swap in the identity so the batch still solves
+        singular = det <= trace ** 2 * 1e-8
+        m[singular] = np.eye(2)
+        p = np.linalg.solve(m, rhs[..., None])[..., 0]
+        ranges = np.hypot(p[:, None, 0] - rx, p[:, None, 1] - ry)
+        weight = mask / (np.maximum(ranges, 50.0) * sigma) ** 2
+
+    covariance = np.linalg.inv(m)
+    # Observed scatter beyond the stated sigmas widens the ellipse
+    dx, dy = p[:, None, 0] - rx, p[:, None, 1] - ry
+    miss = (nx * p[:, None, 0] + ny * p[:, None, 1] - c) * mask
+    n = mask.sum(axis=1)
+    dof = np.maximum(n - 2, 1)
+    chi2 = (weight * miss ** 2).sum(axis=1)
+    covariance *= np.where(n > 2, np.maximum(chi2 / dof, 1.0), 1.0)[:, None, None]
+    # Bearing from each receiver to the fit, and whether the fit lies behind it
+    predicted = np.degrees(np.arctan2(dx, dy))
+    residual = _wrap_degrees(predicted - obs[..., 2]) * mask
+    behind = ((np.sin(theta) * dx + np.cos(theta) * dy) < 0) & (mask > 0)
+
+    scale = -2.0 * math.log(1.0 - confidence)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    semi_minor = np.sqrt(np.maximum(eigenvalues[:, 0], 0) * scale)
+    semi_major = np.sqrt(np.maximum(eigenvalues[:, 1], 0) * scale)
+    major = eigenvectors[:, :, 1]
+    minor = eigenvectors[:, :, 0]
+    orientation = np.degrees(np.arctan2(major[:, 0], major[:, 1])) % 180.0
+    t = np.linspace(0, 2 * math.pi, outline_points, endpoint=False)
+    ox = (p[:, None, 0] + semi_major[:, None] * np.cos(t) * major[:, None, 0]
+          + semi_minor[:, None] * np.sin(t) * minor[:, None, 0])
+    oy = (p[:, None, 1] + semi_major[:, None] * np.cos(t) * major[:, None, 1]
+          + semi_minor[:, None] * np.sin(t) * minor[:, None, 1])
+
+    def to_lat(y):
+        return np.degrees(lat0 + y / EARTH_RADIUS)
+
+    def to_lon(x):
+        return np.degrees(lon0 + x / (EARTH_RADIUS * math.cos(lat0)))
+
+    lat, lon = to_lat(p[:, 1]), to_lon(p[:, 0])
+    outline_lat, outline_lon = to_lat(oy), to_lon(ox)
+    for i, e in enumerate(ids):
+        count = int(n[i])
+        if singular[i]:
+            solutions[e] = {'emitter': e, 'status': ILL_CONDITIONED, 'receivers': count}
+            continue
+        solutions[e] = {
+            'emitter': e,
+            'status': AMBIGUOUS if behind[i].any() else OK,
+            'receivers': count,
+            'latitude': round(float(lat[i]), 6),
+            'longitude': round(float(lon[i]), 6),
+            'residual_rms_deg': round(float(np.sqrt((residual[i] ** 2).sum() / count)), 2),
+            'ellipse': {
+                'confidence': confidence,
+                'semi_major_m': round(float(semi_major[i]), 1),
+                'semi_minor_m': round(float(semi_minor[i]), 1),
+                'orientation_deg': round(float(orientation[i]), 1),
+                'outline': [[round(float(a), 6), round(float(b), 6)]
+                            for a, b in zip(outline_lat[i], outline_lon[i])],
+            },
+        }
+    return solutions
+
+
+class TriangulationService:
+    """Latest bearing reports per receiver and the solutions derived from them
+
+    Solutions are recomputed at most once per interval, and only when the
+    reports changed or some expired, however many clients ask for them.
+    """
+
+    def __init__(self, positions=None, max_age=30, interval=1.0, confidence=0.95):
+        self.positions = positions or {}
+        self.max_age = max_age
+        self.interval = interval
+        self.confidence = confidence
+        # Set in follower workers, which adopt the leader's solutions
+        self.passive = False
+        self._lock = threading.Lock()
+        self._reports = {}
+        self._dirty = False
+        self._solved = None
+        self._solutions = {}
+        self.generation = 0
+        self.last_report = None
+        self.stats = {'reports': 0, 'solves': 0, 'emitters_solved': 0}
+
+    @property
+    def solved(self):
+        return self._solved
+
+    def report(self, receiver, bearings, position=None, now=None):
+        """Replace receiver's bearings; position (lat, lon) overrides the configured one"""
+        position = position or self.positions.get(receiver)
+        if position is None:
+            raise ValueError(f'no position known for receiver {receiver}')
+        entry = {
+            'position': [float(position[0]), float(position[1])],
+            'received': now or time.time(),
+            'bearings': [{
+                'emitter': str(b['emitter']),
+                'bearing': float(b['bearing']) % 360.0,
+                'sigma': float(b.get('sigma') or DEFAULT_SIGMA),
+                'rssi': b.get('rssi'),
+            } for b in bearings],
+        }
+        with self._lock:
+            self._reports[receiver] = entry
+            self._dirty = True
+            self.last_report = entry['received']
+            self.stats['reports'] += 1
+        return entry
+
+    def load(self, reports):
+        """Replace all reports, e.g. with those gathered from every worker"""
+        with self._lock:
+            self._reports = dict(reports)
+            self._dirty = True
+
+    def _expire(self, now):
+        stale = [r for r, entry in self._reports.items() if now - entry['received'] > self.max_age]
+        for receiver in stale:
+            del self._reports[receiver]
+        return bool(stale)
+
+    def solve(self, now=None):
+        """Recompute if reports changed and the interval has passed; returns True if it did"""
+        now = now or time.time()
+        with self._lock:
+            if self.passive:
+                return False
+            # Remember expiry even when the interval defers the solve
+            self._dirty = self._expire(now) or self._dirty
+            if not self._dirty or (self._solved and now - self._solved < self.interval):
+                return False
+            emitters = {}
+            for entry in self._reports.values():
+                lat, lon = entry['position']
+                for b in entry['bearings']:
+                    emitters.setdefault(b['emitter'], []).append((lat, lon, b['bearing'], b['sigma']))
+            self._dirty = False
+        solutions = solve_batch(emitters, confidence=self.confidence)
+        with self._lock:
+            self._solutions = solutions
+            self._solved = now
+            self.generation += 1
+            self.stats['solves'] += 1
+            self.stats['emitters_solved'] += len(solutions)
+        return True
+
+    def snapshot(self, now=None):
+        now = now or time.time()
+        self.solve(now)
+        with self._lock:
+            receivers = [dict(b, receiver=r, latitude=e['position'][0], longitude=e['position'][1],
+                              age=round(now - e['received'], 1))
+                         for r, e in sorted(self._reports.items()) for b in e['bearings']]
+            return {
+                'solved': self._solved,
+                'emitters': [self._solutions[e] for e in sorted(self._solutions)],
+                'receivers': receivers,
+                'max_age': self.max_age,
+            }
+
+    def export(self):
+        with self._lock:
+            return {'solved': self._solved, 'solutions': self._solutions,
+                    'reports': self._reports}
+
+    def adopt(self, state):
+        """Take over the leader worker's reports and solutions"""
+        with self._lock:
+            self._solved = state['solved']
+            self._solutions = state['solutions']
+            self._reports = state['reports']
+            self.generation += 1
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, receivers=len(self._reports),
+                        emitters=len(self._solutions), solved=self._solved)
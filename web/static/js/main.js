@@ -1,6 +1,49 @@
 // ==========================
 // Tactical Dashboard - main.js
 // ==========================
+// ==========================
+// PUSH STREAM (SSE)
+// ==========================
+// One EventSource per tab; pages register topic handlers and receive the
+// merged {key: value} state after the snapshot and after every delta.
+window.ClusterStream = (function () {
+    const supported = typeof window.EventSource !== 'undefined';
+    const state = {};
+    const handlers = {};
+    let source = null;
+    let connectTimer = null;
+    function emit(topic) {
+        (handlers[topic] || []).forEach(fn => fn(state[topic] || {}));
+    }
+    function connect() {
+        connectTimer = null;
+        if (source) source.close();
+        const topics = Object.keys(handlers).join(',');
+        source = new EventSource(`/api/stream?topics=${topics}`);
+        source.addEventListener('snapshot', e => {
+            const data = JSON.parse(e.data);
+            for (const [topic, items] of Object.entries(data)) {
+                state[topic] = items;
+                emit(topic);
+            }
+        });
+        source.addEventListener('delta', e => {
+            const delta = JSON.parse(e.data);
+            const items = state[delta.topic] = state[delta.topic] || {};
+            Object.assign(items, delta.changed);
+            (delta.removed || []).forEach(key => delete items[key]);
+            emit(delta.topic);
+        });
+    }
+    function on(topic, fn) {
+        const isNew = !handlers[topic];
+        (handlers[topic] = handlers[topic] || []).push(fn);
+        if (state[topic]) fn(state[topic]);
+        // Batch registrations made in the same tick into one connection
+        if (isNew && !connectTimer) connectTimer = setTimeout(connect, 0);
+    }
+    return { supported, on };
+})();
 document.addEventListener("DOMContentLoaded", function () {
     // ==========================
     // ACTIVITY LOG BUFFER
@@ -82,10 +125,20 @@ document.addEventListener("DOMContentLoaded", function () {
     function loadFooter() {
         const container = document.getElementById('footer-embed-container');
         if (!container) return;
+        let served = Date.now();
         fetch('/footer')
-            .then(res => res.ok ? res.text() : Promise.reject(new Error('Footer fetch failed')))
+            .then(res => {
+                if (!res.ok) throw new Error('Footer fetch failed');
+                // Date is refreshed on a 304 revalidation, unlike the cached body
+                served = Date.parse(res.headers.get('Date')) || served;
+                return res.text();
+            })
             .then(html => {
                 container.innerHTML = html;
+                const uptime = document.getElementById('uptime-display');
+                if (uptime && uptime.dataset.started) {
+                    uptime.dataset.seconds = Math.max(0, Math.floor(served / 1000) - Number(uptime.dataset.started));
+                }
                 const waitForFooter = () => {
                     const alertsLog = document.getElementById('alertsLog');
                     if (!alertsLog) {
@@ -355,9 +408,16 @@ async function fetchNodes() {
         logActivity('[Nodes] Fetch error: ' + msg);
     }
 }
-// Start fetching after everything is defined
-fetchNodes();
-setInterval(fetchNodes, 5000);
+// Start after everything is defined; fall back to polling without SSE
+if (window.ClusterStream.supported) {
+    window.ClusterStream.on('nodes', nodes => {
+        nodesData = Object.entries(nodes).map(([id, node]) => ({ id, ...node }));
+        updateNodeCards();
+    });
+} else {
+    fetchNodes();
+    setInterval(fetchNodes, 5000);
+}
     // ==========================
     // TOOL ACTIONS
     // ==========================
@@ -426,20 +486,22 @@ setInterval(fetchNodes, 5000);
     // ==========================
     // PERFORMANCE SUMMARY
     // ==========================
+    function renderPerformance(data) {
+        const perfEl = document.getElementById('performance-summary');
+        if (!perfEl || !data) return;
+        perfEl.innerHTML = `
+            CPU Avg: ${data.cpu_avg}%<br>
+            Memory Avg: ${data.memory_avg}%<br>
+            Disk Usage: ${data.disk_usage}%<br>
+            Network Throughput: ${data.network_throughput_mbps} Mbps<br>
+            Temp Avg: ${data.temperature_avg} °C
+        `;
+    }
     async function refreshPerformance() {
         try {
             const response = await fetch('/api/performance/summary');
             if (!response.ok) throw new Error(`HTTP ${response.status}`);
-            const data = await response.json();
-            const perfEl = document.getElementById('performance-summary');
-            if (!perfEl) return;
-            perfEl.innerHTML = `
-                CPU Avg: ${data.cpu_avg}%<br>
-                Memory Avg: ${data.memory_avg}%<br>
-                Disk Usage: ${data.disk_usage}%<br>
-                Network Throughput: ${data.network_throughput_mbps} Mbps<br>
-                Temp Avg: ${data.temperature_avg} °C
-            `;
+            renderPerformance(await response.json());
             logActivity('Performance summary updated');
         } catch (err) {
             const msg = err?.message || String(err);
@@ -447,8 +509,12 @@ setInterval(fetchNodes, 5000);
             logActivity('[Performance] Refresh failed: ' + msg);
         }
     }
-    setInterval(refreshPerformance, 10000);
-    refreshPerformance();
+    if (window.ClusterStream.supported) {
+        window.ClusterStream.on('performance', perf => renderPerformance(perf.summary));
+    } else {
+        setInterval(refreshPerformance, 10000);
+        refreshPerformance();
+    }
     // ==========================
     // INITIALIZE ALL
     // ==========================
@@ -0,0 +1,192 @@
+import pytest
+
+from services.adsb import ADSBIngestService, AircraftTable, normalize_aircraft
+from services.spatial import AircraftQuery
+
+
+def contact(icao, lat=51.5, lon=-0.12, altitude=30000, seen=0, **extra):
+    return dict({'hex': icao.lower(), 'flight': 'TEST1   ', 'lat': lat, 'lon': lon,
+                 'alt_baro': altitude, 'gs': 420, 'track': 90, 'seen': seen}, **extra)
+
+
+def records(*raw, now=1000):
+    return [normalize_aircraft(ac, now) for ac in raw]
+
+
+def test_normalize_aircraft():
+    record = normalize_aircraft(contact('abc123', alt_baro='ground', seen=2.5), 1000)
+    assert record['icao'] == 'ABC123'
+    assert record['callsign'] == 'TEST1'
+    assert record['altitude'] == 0
+    assert record['last_seen'] == 997.5
+    assert normalize_aircraft({'flight': 'NOHEX'}, 1000) is None
+
+
+def test_since_returns_only_changed_contacts():
+    table = AircraftTable()
+    table.update(records(contact('A1'), contact('A2')), now=1000)
+    seq = table.seq
+    table.update(records(contact('A1', lat=51.6), contact('A2', seen=-1), now=1001), now=1001)
+    delta = table.since(seq)
+    assert delta['full'] is False
+    assert [ac['icao'] for ac in delta['aircraft']] == ['A1']
+    assert delta['removed'] == []
+
+
+def test_last_seen_alone_does_not_bump_seq():
+    table = AircraftTable()
+    table.update(records(contact('A1')), now=1000)
+    seq = table.seq
+    table.update(records(contact('A1'), now=1005), now=1005)
+    assert table.seq == seq
+    assert table.snapshot()['aircraft'][0]['last_seen'] == 1005
+
+
+def test_expired_contacts_are_reported_removed():
+    table = AircraftTable(expiry=60)
+    table.update(records(contact('A1'), contact('A2')), now=1000)
+    seq = table.seq
+    changed, removed = table.update(records(contact('A2'), now=1070), now=1070)
+    assert removed == ['A1']
+    assert table.since(seq)['removed'] == ['A1']
+    assert len(table) == 1
+
+
+def test_seq_older_than_dropped_tombstones_gets_full_snapshot():
+    table = AircraftTable(expiry=60, tombstone_ttl=100)
+    table.update(records(contact('A1'), contact('A2')), now=1000)
+    seq = table.seq
+    table.update(records(contact('A2'), now=1070), now=1070)
+    table.update(records(contact('A2'), now=1200), now=1200)
+    # The A1 tombstone is gone, so a delta from seq could miss its removal
+    delta = table.since(seq)
+    assert delta['full'] is True
+    assert [ac['icao'] for ac in delta['aircraft']] == ['A2']
+    # A seq from the future (exporter restarted) also resets the client
+    assert table.since(table.seq + 10)['full'] is True
+
+
+def test_export_load_keeps_sequence_numbers():
+    leader, follower = AircraftTable(), AircraftTable()
+    leader.update(records(contact('A1'), contact('A2')), now=1000)
+    changed, removed = follower.load(leader.export())
+    assert sorted(changed) == ['A1', 'A2'] and removed == []
+    seq = follower.seq
+    leader.update(records(contact('A1', altitude=31000), contact('A2'), now=1001), now=1001)
+    changed, _ = follower.load(leader.export())
+    assert list(changed) == ['A1']
+    assert [ac['icao'] for ac in follower.since(seq)['aircraft']] == ['A1']
+
+
+def test_ingest_service_with_stand_in_feed():
+    feed = {'now': 1000, 'aircraft': [contact('A1'), {'flight': 'NOHEX'}]}
+    updates = []
+    service = ADSBIngestService('http://isr.invalid/data/aircraft.json', source=lambda: feed,
+                                on_update=lambda changed, removed: updates.append((changed, removed)))
+    assert service.is_stale()
+    service.poll()
+    assert not service.is_stale()
+    assert list(updates[0][0]) == ['A1']
+    service.poll()
+    # Nothing changed, so no update is fanned out
+    assert len(updates) == 1
+
+
+# Sector filters (?bbox=, ?radius=, altitude and callsign) and their deltas
+
+LONDON = AircraftQuery(bbox=(51.0, -1.0, 52.0, 1.0))
+
+
+def test_search_filters_by_sector_and_altitude():
+    table = AircraftTable()
+    table.update(records(contact('IN1'), contact('HIGH', altitude=40000),
+                         contact('OUT', lat=48.8, lon=2.35)), now=1000)
+    result = table.search(LONDON)
+    assert result['full'] is True
+    assert [ac['icao'] for ac in result['aircraft']] == ['HIGH', 'IN1']
+    low = AircraftQuery(bbox=LONDON.bbox, alt_max=35000, fields=['callsign'])
+    assert table.search(low)['aircraft'] == [{'icao': 'IN1', 'callsign': 'TEST1'}]
+    near_paris = AircraftQuery(center=(48.85, 2.35), radius_km=50)
+    assert [ac['icao'] for ac in table.search(near_paris)['aircraft']] == ['OUT']
+
+
+def test_search_pagination():
+    table = AircraftTable()
+    table.update(records(*[contact(f'A{i}') for i in range(5)]), now=1000)
+    page = table.search(AircraftQuery(offset=1, limit=2))
+    assert page['total'] == 5
+    assert [ac['icao'] for ac in page['aircraft']] == ['A1', 'A2']
+
+
+def test_query_rejects_bad_pagination():
+    assert AircraftQuery.from_args({'offset': '2', 'limit': '1'}).limit == 1
+    for args in ({'limit': '-1'}, {'limit': '0'}, {'offset': '-3'}, {'limit': 'x'}):
+        with pytest.raises(ValueError):
+            AircraftQuery.from_args(args)
+
+
+def test_sector_delta_reports_contacts_that_left_it():
+    table = AircraftTable()
+    table.update(records(contact('A1')), now=1000)
+    seq = table.seq
+    table.update(records(contact('A1', lat=48.8, lon=2.35), now=1001), now=1001)
+    delta = table.search(LONDON, since=seq)
+    assert delta['aircraft'] == []
+    assert delta['removed'] == ['A1']
+
+
+def test_sector_delta_ignores_changes_outside_it():
+    table = AircraftTable(expiry=60)
+    table.update(records(contact('IN1'), contact('OUT1', lat=48.8, lon=2.35),
+                         contact('OUT2', lat=40.6, lon=-73.8)), now=1000)
+    seq = table.seq
+    # OUT1 moves, OUT2 expires, NEW appears elsewhere: none were in the sector
+    table.update(records(contact('IN1'), contact('OUT1', lat=48.9, lon=2.35),
+                         contact('NEW', lat=35.5, lon=139.8), now=1070), now=1070)
+    delta = table.search(LONDON, since=seq)
+    assert delta['aircraft'] == []
+    assert delta['removed'] == []
+    # Unfiltered deltas still carry everything
+    assert sorted(ac['icao'] for ac in table.since(seq)['aircraft']) == ['NEW', 'OUT1']
+
+
+def test_sector_delta_reports_expired_contacts_that_were_in_it():
+    table = AircraftTable(expiry=60)
+    table.update(records(contact('IN1'), contact('OUT1', lat=48.8, lon=2.35)), now=1000)
+    seq = table.seq
+    table.update([], now=1070)
+    assert table.search(LONDON, since=seq)['removed'] == ['IN1']
+
+
+def test_sector_delta_uses_state_at_since_across_several_changes():
+    table = AircraftTable()
+    table.update(records(contact('A1', lat=48.8, lon=2.35)), now=1000)
+    seq = table.seq
+    # Passes through the sector and out again between two polls
+    table.update(records(contact('A1'), now=1001), now=1001)
+    table.update(records(contact('A1', lat=53.5, lon=-2.2), now=1002), now=1002)
+    assert table.search(LONDON, since=seq)['removed'] == []
+    # A client that saw it inside is told it left
+    assert table.search(LONDON, since=seq + 1)['removed'] == ['A1']
+
+
+def test_sector_delta_falls_back_to_removed_when_history_is_short():
+    table = AircraftTable(history=2)
+    table.update(records(contact('A1', lat=48.8, lon=2.35)), now=1000)
+    seq = table.seq
+    for i in range(1, 5):
+        table.update(records(contact('A1', lat=48.8 + i / 10, lon=2.35), now=1000 + i),
+                     now=1000 + i)
+    # The version at seq is gone, so the removal is sent to be safe
+    assert table.search(LONDON, since=seq)['removed'] == ['A1']
+
+
+def test_follower_copy_answers_sector_deltas():
+    leader, follower = AircraftTable(), AircraftTable()
+    leader.update(records(contact('IN1'), contact('OUT1', lat=48.8, lon=2.35)), now=1000)
+    follower.load(leader.export())
+    seq = follower.seq
+    leader.update(records(contact('IN1', lat=48.7, lon=2.3),
+                          contact('OUT1', lat=48.9, lon=2.35), now=1001), now=1001)
+    follower.load(leader.export())
+    assert follower.search(LONDON, since=seq)['removed'] == ['IN1']
@@ -0,0 +1,133 @@
+import os
+
+from services.mesh_topology import (MeshTopologyService, TopologyGraph, edge_id,
+                                    parse_batman_originators, parse_meshtastic_info)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'data', 'fixtures', 'mesh')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return f.read()
+
+
+def node(node_id, **fields):
+    return dict({'id': node_id, 'kind': 'test', 'last_seen': 1000}, **fields)
+
+
+def edge(a, b, quality=0.9):
+    return {'id': edge_id(a, b), 'source': a, 'target': b, 'kind': 'test', 'quality': quality}
+
+
+def graph_of(*edges):
+    nodes = {n: node(n) for e in edges for n in (e['source'], e['target'])}
+    return nodes, {e['id']: e for e in edges}
+
+
+def test_parse_batman_fixture():
+    nodes, edges = parse_batman_originators(fixture('batman-originators.txt'), now=1000)
+    own = 'bat:b8:27:eb:30:00:01'
+    assert nodes[own]['local']
+    # Only originators that are their own next hop are direct links
+    assert edge_id(own, 'bat:b8:27:eb:30:00:02') in edges
+    assert edge_id(own, 'bat:b8:27:eb:30:00:05') not in edges
+    assert nodes['bat:b8:27:eb:30:00:05']['next_hop'] == 'bat:b8:27:eb:30:00:02'
+    assert edges[edge_id(own, 'bat:b8:27:eb:30:00:02')]['quality'] == round(241 / 255, 3)
+
+
+def test_parse_meshtastic_fixture():
+    nodes, edges = parse_meshtastic_info(fixture('meshtastic-info.txt'))
+    local = [n for n in nodes.values() if n.get('local')]
+    assert len(local) == 1
+    assert edges
+    for e in edges.values():
+        assert e['source'] == local[0]['id'] or e['target'] == local[0]['id']
+        assert 0 <= e['quality'] <= 1
+
+
+def test_update_versions_only_real_changes():
+    graph = TopologyGraph()
+    assert graph.update('batman', *graph_of(edge('a', 'b'), edge('a', 'c'))) == 5
+    version = graph.version
+    nodes, edges = graph_of(edge('a', 'b', 0.91), edge('a', 'c'))
+    nodes['a']['last_seen'] = 2000
+    # Sub-step quality jitter and a new last-seen time are not changes
+    assert graph.update('batman', nodes, edges) == 0
+    assert graph.version == version
+    assert graph.since(version)['edges'] == []
+
+
+def test_slow_drift_adds_up_to_a_change():
+    graph = TopologyGraph()
+    graph.update('batman', *graph_of(edge('a', 'b', 0.90)))
+    version = graph.version
+    for quality in (0.92, 0.94):
+        graph.update('batman', *graph_of(edge('a', 'b', quality)))
+    delta = graph.since(version)
+    assert [e['quality'] for e in delta['edges']] == [0.94]
+
+
+def test_since_reports_removals_as_tombstones():
+    graph = TopologyGraph()
+    graph.update('batman', *graph_of(edge('a', 'b'), edge('a', 'c')), now=1000)
+    version = graph.version
+    graph.update('batman', *graph_of(edge('a', 'b')), now=1010)
+    delta = graph.since(version)
+    assert delta['full'] is False
+    assert delta['removed_edges'] == [edge_id('a', 'c')]
+    assert delta['removed_nodes'] == ['c']
+    assert graph.neighbours('a') == ['b']
+    assert graph.neighbours('c') == []
+
+
+def test_sources_only_replace_their_own_items():
+    graph = TopologyGraph()
+    graph.update('batman', *graph_of(edge('a', 'b')))
+    graph.update('meshtastic', *graph_of(edge('x', 'y')))
+    graph.update('batman', {}, {})
+    full = graph.since()
+    assert sorted(n['id'] for n in full['nodes']) == ['x', 'y']
+    assert [e['id'] for e in full['edges']] == [edge_id('x', 'y')]
+
+
+def test_expired_tombstones_raise_the_version_floor():
+    graph = TopologyGraph(tombstone_ttl=60)
+    graph.update('batman', *graph_of(edge('a', 'b'), edge('a', 'c')), now=1000)
+    version = graph.version
+    graph.update('batman', *graph_of(edge('a', 'b')), now=1010)
+    assert graph.since(version)['full'] is False
+    graph.update('batman', *graph_of(edge('a', 'b')), now=1100)
+    # The removal of c is forgotten, so a delta from before it is unsafe
+    assert graph.since(version)['full'] is True
+    assert graph.since(graph.version)['full'] is False
+    assert graph.since(graph.version + 1)['full'] is True
+
+
+def test_export_load_round_trip():
+    graph = TopologyGraph()
+    graph.update('batman', *graph_of(edge('a', 'b'), edge('a', 'c')), now=1000)
+    version = graph.version
+    graph.update('batman', *graph_of(edge('a', 'b')), now=1010)
+    copy = TopologyGraph()
+    copy.load(graph.export())
+    assert copy.version == graph.version
+    assert copy.since(version) == graph.since(version)
+    assert copy.neighbours('a') == ['b']
+
+
+def test_failing_source_keeps_last_good_contribution():
+    results = {'batman': graph_of(edge('a', 'b'))}
+
+    def batman():
+        if isinstance(results['batman'], Exception):
+            raise results['batman']
+        return results['batman']
+
+    service = MeshTopologyService({'batman': batman})
+    assert service.is_stale()
+    assert service.poll() == 3
+    results['batman'] = RuntimeError('ssh: connect timed out')
+    assert service.poll() == 0
+    assert service.status['batman']['ok'] is False
+    assert len(service.graph.since()['edges']) == 1
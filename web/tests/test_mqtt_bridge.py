@@ -0,0 +1,176 @@
+import threading
+import time
+
+from services.mqtt_bridge import (BLOCK, DROP_NEWEST, DROP_OLDEST, CoalescingQueue,
+                                  FakeBroker, MQTTBridge, parse_message, topic_matches)
+
+
+def make_bridge(**kwargs):
+    broker = FakeBroker()
+    bridge = MQTTBridge(broker, ['msh/+/2/json/#', 'assets/#'], **kwargs)
+    # Subscribe without starting the consumer thread; tests call apply()
+    for topic in bridge.topics:
+        broker.subscribe(topic, bridge.handle)
+    return broker, bridge
+
+
+def position(sender, lat=515000000, lon=-1200000):
+    return {'from': sender, 'type': 'position', 'snr': 6.5,
+            'payload': {'latitude_i': lat, 'longitude_i': lon, 'altitude': 40}}
+
+
+def test_topic_matches():
+    assert topic_matches('msh/+/2/json/#', 'msh/EU_868/2/json/LongFast/!abcd1234')
+    assert topic_matches('assets/+/position', 'assets/team1/position')
+    assert not topic_matches('assets/+/position', 'assets/team1/telemetry')
+    assert not topic_matches('assets/+', 'assets/team1/position')
+
+
+def test_meshtastic_position_through_fake_broker():
+    broker, bridge = make_bridge()
+    broker.publish('msh/EU_868/2/json/LongFast/!0000abcd', position(0xabcd))
+    changed, removed = bridge.apply()
+    asset = changed['mt:!0000abcd']
+    assert asset['latitude'] == 51.5
+    assert asset['longitude'] == -0.12
+    assert asset['snr'] == 6.5
+    assert removed == []
+
+
+def test_plain_asset_topic_aliases():
+    broker, bridge = make_bridge()
+    broker.publish('assets/team1/position', {'lat': 51.0, 'lng': -1.0, 'callsign': 'T1'})
+    changed, _ = bridge.apply()
+    assert changed['team1']['latitude'] == 51.0
+    assert changed['team1']['longitude'] == -1.0
+    assert changed['team1']['name'] == 'T1'
+
+
+def test_malformed_uplinks_are_ignored_not_raised():
+    broker, bridge = make_bridge()
+    broker.publish('msh/EU_868/2/json/LongFast/!abcd', position('!abcd'))
+    broker.publish('msh/EU_868/2/json/LongFast/!abcd', position(0xabcd, lat='x'))
+    broker.publish('msh/EU_868/2/json/LongFast/!abcd', {'from': [1], 'type': 'position',
+                                                       'payload': {}})
+    broker.publish('assets/team1/position', b'\xff not json')
+    assert bridge.stats['messages'] == 4
+    assert bridge.stats['ignored'] == 4
+    # The bridge keeps working after the bad packets
+    broker.publish('msh/EU_868/2/json/LongFast/!0000abcd', position(0xabcd))
+    changed, _ = bridge.apply()
+    assert list(changed) == ['mt:!0000abcd']
+
+
+def test_parse_message_rejects_non_objects():
+    assert parse_message('assets/a/position', '[1, 2]') is None
+    assert parse_message('assets/a/unknown', '{"lat": 1}') is None
+
+
+def test_unchanged_update_only_refreshes_last_seen():
+    broker, bridge = make_bridge()
+    broker.publish('assets/team1/status', {'status': 'ok'})
+    bridge.apply()
+    seq = bridge.table.seq
+    broker.publish('assets/team1/status', {'status': 'ok'})
+    changed, _ = bridge.apply()
+    assert changed == {}
+    assert bridge.table.seq == seq
+    assert bridge.table.since(seq)['assets'] == []
+
+
+def test_queue_coalesces_per_key():
+    queue = CoalescingQueue(maxsize=4)
+    queue.put('a', {'latitude': 1})
+    queue.put('b', {'latitude': 2})
+    queue.put('a', {'longitude': 3})
+    assert queue.drain() == [('a', {'latitude': 1, 'longitude': 3}), ('b', {'latitude': 2})]
+    assert queue.stats['coalesced'] == 1
+
+
+def test_queue_drop_oldest():
+    queue = CoalescingQueue(maxsize=2, policy=DROP_OLDEST)
+    for key in 'abc':
+        assert queue.put(key, {'n': key})
+    assert [key for key, _ in queue.drain()] == ['b', 'c']
+    assert queue.stats['dropped'] == 1
+
+
+def test_queue_drop_newest():
+    queue = CoalescingQueue(maxsize=2, policy=DROP_NEWEST)
+    assert queue.put('a', {})
+    assert queue.put('b', {})
+    assert not queue.put('c', {})
+    # A key already waiting is still merged when the queue is full
+    assert queue.put('a', {'x': 1})
+    assert queue.drain() == [('a', {'x': 1}), ('b', {})]
+
+
+def test_queue_block_times_out():
+    queue = CoalescingQueue(maxsize=1, policy=BLOCK, block_timeout=0.05)
+    queue.put('a', {})
+    started = time.monotonic()
+    assert not queue.put('b', {})
+    assert time.monotonic() - started >= 0.05
+    assert queue.stats['dropped'] == 1
+
+
+def test_queue_block_resumes_when_drained():
+    queue = CoalescingQueue(maxsize=1, policy=BLOCK, block_timeout=2)
+    queue.put('a', {})
+    result = []
+    producer = threading.Thread(target=lambda: result.append(queue.put('b', {'n': 1})))
+    producer.start()
+    time.sleep(0.05)
+    assert queue.drain() == [('a', {})]
+    producer.join(2)
+    assert result == [True]
+    assert queue.drain() == [('b', {'n': 1})]
+
+
+def test_queue_block_merges_entry_queued_during_wait():
+    queue = CoalescingQueue(maxsize=1, policy=BLOCK, block_timeout=2)
+    queue.put('a', {})
+    waiters = [threading.Thread(target=queue.put, args=('b', {'latitude': 1})),
+               threading.Thread(target=queue.put, args=('b', {'longitude': 2}))]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.05)
+    assert queue.drain(max_items=1) == [('a', {})]
+    for waiter in waiters:
+        waiter.join(2)
+    assert queue.drain() == [('b', {'latitude': 1, 'longitude': 2})]
+    assert queue.stats['coalesced'] == 1
+
+
+class RecordingClient:
+    def __init__(self):
+        self.subscriptions = []
+
+    def subscribe(self, topics):
+        self.subscriptions.append(topics)
+
+
+class ReasonCode:
+    """Stand-in for paho.mqtt.reasoncodes.ReasonCode"""
+
+    def __init__(self, name, is_failure):
+        self.name = name
+        self.is_failure = is_failure
+
+    def __str__(self):
+        return self.name
+
+
+def test_refused_connection_is_not_reported_connected():
+    bridge = MQTTBridge('broker.invalid', ['assets/#'])
+    client = RecordingClient()
+    bridge._on_connect(client, None, {}, ReasonCode('Not authorized', True))
+    assert not bridge.connected
+    assert bridge.get_stats()['connect_error'] == 'Not authorized'
+    assert client.subscriptions == []
+    # paho 1.x passes an integer return code
+    bridge._on_connect(client, None, {}, 5)
+    assert bridge.connect_error == '5'
+    bridge._on_connect(client, None, {}, ReasonCode('Success', False))
+    assert bridge.connected and bridge.connect_error is None
+    assert client.subscriptions == [[('assets/#', 0)]]
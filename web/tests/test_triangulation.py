@@ -0,0 +1,94 @@
+import math
+
+import pytest
+
+from services import triangulation
+from services.triangulation import (AMBIGUOUS, ILL_CONDITIONED, INSUFFICIENT, OK,
+                                    TriangulationService, bearing_to, solve_batch)
+
+pytestmark = pytest.mark.skipif(not triangulation.AVAILABLE, reason='numpy not installed')
+
+TARGET = (51.5000, -0.1200)
+RECEIVERS = {
+    'rx1': (51.5100, -0.1350),
+    'rx2': (51.4920, -0.1050),
+    'rx3': (51.5080, -0.0950),
+}
+
+
+def observations(target=TARGET, receivers=RECEIVERS, sigma=2.0):
+    return [(lat, lon, bearing_to(lat, lon, *target), sigma) for lat, lon in receivers.values()]
+
+
+def distance_m(a, b):
+    dy = math.radians(a[0] - b[0]) * triangulation.EARTH_RADIUS
+    dx = math.radians(a[1] - b[1]) * math.cos(math.radians(a[0])) * triangulation.EARTH_RADIUS
+    return math.hypot(dx, dy)
+
+
+def test_exact_bearings_meet_at_the_target():
+    solution = solve_batch({'tx': observations()})['tx']
+    assert solution['status'] == OK
+    assert solution['receivers'] == 3
+    assert distance_m((solution['latitude'], solution['longitude']), TARGET) < 5
+    assert solution['residual_rms_deg'] < 0.1
+
+
+def test_batch_solves_each_emitter_independently():
+    other = (51.5050, -0.1100)
+    solutions = solve_batch({'a': observations(), 'b': observations(other), 'c': observations()[:1]})
+    assert distance_m((solutions['a']['latitude'], solutions['a']['longitude']), TARGET) < 5
+    assert distance_m((solutions['b']['latitude'], solutions['b']['longitude']), other) < 5
+    assert solutions['c'] == {'emitter': 'c', 'status': INSUFFICIENT, 'receivers': 1}
+
+
+def test_ellipse_grows_with_bearing_sigma():
+    tight = solve_batch({'tx': observations(sigma=1.0)})['tx']['ellipse']
+    loose = solve_batch({'tx': observations(sigma=10.0)})['tx']['ellipse']
+    assert loose['semi_major_m'] > tight['semi_major_m'] * 5
+    assert tight['semi_major_m'] >= tight['semi_minor_m']
+    assert len(tight['outline']) == 36
+
+
+def test_parallel_bearings_are_ill_conditioned():
+    solution = solve_batch({'tx': [(51.50, -0.12, 0.0, 2.0), (51.50, -0.11, 0.0, 2.0)]})['tx']
+    assert solution['status'] == ILL_CONDITIONED
+    assert 'latitude' not in solution
+
+
+def test_fit_behind_a_receiver_is_ambiguous():
+    # Two lines crossing south of both receivers while they point north
+    obs = [(51.50, -0.13, 45.0, 2.0), (51.50, -0.11, 315.0, 2.0)]
+    assert solve_batch({'tx': obs})['tx']['status'] == OK
+    flipped = [(lat, lon, (b + 180.0) % 360.0, s) for lat, lon, b, s in obs]
+    assert solve_batch({'tx': flipped})['tx']['status'] == AMBIGUOUS
+
+
+def report_all(service, now):
+    for receiver, (lat, lon) in RECEIVERS.items():
+        service.report(receiver, [{'emitter': 'tx', 'bearing': bearing_to(lat, lon, *TARGET),
+                                   'sigma': 2.0}], position=(lat, lon), now=now)
+
+
+def test_service_solves_at_most_once_per_interval():
+    service = TriangulationService(max_age=30, interval=5)
+    report_all(service, now=1000)
+    assert service.solve(now=1000)
+    report_all(service, now=1001)
+    assert not service.solve(now=1001)
+    assert service.solve(now=1006)
+    assert not service.solve(now=1007)
+
+
+def test_expiry_inside_the_interval_is_not_lost():
+    service = TriangulationService(max_age=30, interval=5)
+    report_all(service, now=1000)
+    lat, lon = RECEIVERS['rx1']
+    service.report('rx1', [{'emitter': 'tx', 'bearing': bearing_to(lat, lon, *TARGET)}],
+                   position=(lat, lon), now=1020)
+    assert service.solve(now=1029)
+    # rx2 and rx3 expire within the interval of the last solve
+    assert not service.solve(now=1031)
+    snapshot = service.snapshot(now=1035)
+    assert snapshot['emitters'] == [{'emitter': 'tx', 'status': INSUFFICIENT, 'receivers': 1}]
+    assert [r['receiver'] for r in snapshot['receivers']] == ['rx1']
@@ -0,0 +1,20 @@
+"""
+Production entry point for the Cluster Dashboard
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Unlike `python app.py`, demo mode and debug default to off here. Background
+services are started per worker by the post_fork hook in gunicorn.conf.py.
+"""
+import os
+
+os.environ.setdefault('DEMO_MODE', 'False')
+os.environ.setdefault('DEBUG', 'False')
+
+from app import app as application, DB_POOL, DEMO_MODE, seed_demo_users, start_background
+
+DB_POOL.ensure_indexes()
+if DEMO_MODE:
+    seed_demo_users()
+
+__all__ = ['application', 'start_background']